@@ -0,0 +1,76 @@
+"""
+Cache lock contention under concurrent requests.
+
+Each thread runs a mix of lookups and inserts (90% gets, misses followed by
+a set) on a skewed key distribution, like the API's threadpool does on
+cache traffic. Prints the combined throughput of the single-lock
+ResponseCache and the lock-striped ShardedResponseCache at 1-32 threads.
+
+With the GIL only one thread runs Python at a time, so striping mainly
+removes lock hand-offs between threads; on a free-threaded build the
+shards also run in parallel.
+
+Usage:
+    python benchmarks/cache_contention.py [--ops 20000] [--shards 16] [--threads 1 2 4 8 16 32]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.cache import ResponseCache, ShardedResponseCache
+
+
+def workload(ops: int, keys: int = 5000, seed: int = 0) -> List[str]:
+    """Messages for one thread: a few very common, a long tail of rare ones."""
+    rng = random.Random(seed)
+    return [f"message {min(int(rng.paretovariate(1.2)) - 1, keys)}" for _ in range(ops)]
+
+
+def run(cache, threads: int, ops: int) -> float:
+    """Operations per second across `threads` threads."""
+    traces = [workload(ops, seed=i) for i in range(threads)]
+    start_line = threading.Barrier(threads + 1)
+
+    def worker(trace):
+        start_line.wait()
+        for message in trace:
+            if cache.get(message) is None:
+                cache.set(message, {"message": message})
+
+    workers = [threading.Thread(target=worker, args=(trace,)) for trace in traces]
+    for thread in workers:
+        thread.start()
+    start_line.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return threads * ops / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare single-lock and sharded cache throughput")
+    parser.add_argument("--ops", type=int, default=20000, help="Operations per thread")
+    parser.add_argument("--shards", type=int, default=16, help="Shards of the sharded cache")
+    parser.add_argument("--capacity", type=int, default=1000, help="Entries each cache may hold")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"Python {sys.version.split()[0]} (GIL {'enabled' if gil else 'disabled'}), "
+          f"{args.ops} ops per thread, capacity {args.capacity}")
+    print(f"  {'threads':>7s} {'single lock':>14s} {'sharded':>14s} {'speedup':>8s}")
+    for threads in args.threads:
+        single = run(ResponseCache(max_size=args.capacity), threads, args.ops)
+        sharded = run(ShardedResponseCache(max_size=args.capacity, shards=args.shards), threads, args.ops)
+        print(f"  {threads:7d} {single:11.0f}/s {sharded:11.0f}/s {sharded / single:7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Replay recorded traffic against the response cache backends.
+
+Messages from web/data (emma.csv, jamie.csv) are replayed in timestamp
+order, several rounds, with bursts of one-off spam injected between them.
+Prints the hit rate of plain LRU (ResponseCache) and W-TinyLFU
+(TinyLFUCache) at the same entry capacity.
+
+Usage:
+    python benchmarks/cache_replay.py [--capacity 50] [--rounds 5] [--spam 200]
+"""
+
+import os
+import sys
+import csv
+import random
+import argparse
+from typing import Iterator, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.cache import ResponseCache, TinyLFUCache
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "web", "data")
+TRAFFIC_FILES = ("emma.csv", "jamie.csv")
+
+
+def load_traffic(data_dir: str = DATA_DIR) -> List[str]:
+    """Recorded messages in timestamp order."""
+    rows = []
+    for name in TRAFFIC_FILES:
+        with open(os.path.join(data_dir, name), newline="") as f:
+            rows.extend(csv.DictReader(f))
+    rows.sort(key=lambda row: row["timestamp"])
+    return [row["text"] for row in rows]
+
+
+def trace(messages: List[str], rounds: int, spam: int, every: int = 500, seed: int = 0) -> Iterator[str]:
+    """The traffic `rounds` times, with `spam` unique messages every `every` messages."""
+    rng = random.Random(seed)
+    served = 0
+    for _ in range(rounds):
+        for message in messages:
+            if spam and served % every == 0:
+                for _ in range(spam):
+                    yield f"spam {rng.getrandbits(64):x}"
+            served += 1
+            yield message
+
+
+def replay(cache, requests: Iterator[str]) -> float:
+    """Hit rate (%) of a cache on a request stream (miss -> set)."""
+    for message in requests:
+        if cache.get(message) is None:
+            cache.set(message, {"message": message})
+    return cache.get_stats()["hit_rate_percent"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare cache hit rates on recorded traffic")
+    parser.add_argument("--capacity", type=int, default=50, help="Entries each cache may hold")
+    parser.add_argument("--rounds", type=int, default=5, help="Times the traffic is replayed")
+    parser.add_argument("--spam", type=int, default=200, help="Unique messages per spam burst")
+    args = parser.parse_args()
+
+    messages = load_traffic()
+    print(f"{len(messages)} messages ({len(set(messages))} unique), "
+          f"capacity {args.capacity}, {args.rounds} rounds, spam bursts of {args.spam}")
+
+    caches = {
+        "lru": ResponseCache(max_size=args.capacity),
+        "tinylfu": TinyLFUCache(max_size=args.capacity, sweep_interval=0),
+    }
+    for name, cache in caches.items():
+        hit_rate = replay(cache, trace(messages, args.rounds, args.spam))
+        print(f"  {name:8s} hit rate {hit_rate:6.2f}%")
+
+
+if __name__ == "__main__":
+    main()
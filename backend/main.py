@@ -5,6 +5,8 @@ Entry point:
     python main.py                  # Interactive mode (default)
     python main.py --demo           # Run demo
     python main.py --api            # Start API server
+    python main.py --api --workers 4  # Pre-fork workers sharing one model copy
+    python main.py --inference-server # Run the models in their own process
 """
 
 import sys
@@ -87,18 +89,25 @@ def interactive(processor):
                     print(f"   HF LLM: {'✅ Available' if hf_status.get('api_key_configured') else '❌ Not configured'}")
                     if hf_status.get('api_key_configured'):
                         print(f"   HF Model: {hf_status.get('model', 'N/A')}")
+                print(f"   Load mode: {status['load']['mode']}")
                 if status['cache']['enabled']:
-                    print(f"   Cache: {status['cache']['size']}/{status['cache']['max_size']} ({status['cache']['hit_rate_percent']}% hit rate)")
+                    cache = status['cache']
+                    if 'max_bytes' in cache:
+                        usage = f"{cache['size']} entries, {cache['bytes'] // 1024}/{cache['max_bytes'] // 1024} KB"
+                    else:
+                        usage = f"{cache['size']}/{cache['max_size']}"
+                    print(f"   Cache ({cache['backend']}): {usage} ({cache['hit_rate_percent']}% hit rate)")
+                    print(f"   Cache namespace: {cache['namespace']}")
                 print()
                 continue
             
             if msg.lower() == 'cache':
-                if processor.cache:
-                    stats = processor.cache.get_stats()
-                    print(f"\n📦 Cache Stats:")
-                    print(f"   Size: {stats['size']}/{stats['max_size']}")
-                    print(f"   Hits: {stats['hits']}, Misses: {stats['misses']}")
-                    print(f"   Hit Rate: {stats['hit_rate_percent']}%")
+                print(f"\n📦 Cache Stats:")
+                for layer, stats in processor.get_cache_stats().items():
+                    if stats.get('enabled', True):
+                        print(f"   {layer}: {stats['size']} entries, "
+                              f"hits {stats['hits']}, misses {stats['misses']} "
+                              f"({stats['hit_rate_percent']}% hit rate)")
                 print()
                 continue
             
@@ -146,20 +155,51 @@ def interactive(processor):
             break
 
 
-def start_api():
-    """Start the FastAPI server."""
+def start_api(workers=None):
+    """
+    Start the FastAPI server.
+    
+    One worker by default. With more than one (opt-in via --workers or
+    WORKERS), the models are loaded once in a master process and the workers
+    are forked from it, sharing the weights copy-on-write. Everything else is
+    per worker: caches, single-flight, load control and the conversation
+    windows behind child_id tracking.
+    """
     import uvicorn
     from src.config.model_config import ProductionConfig
     
     config = ProductionConfig.from_env()
+    workers = workers or config.workers
+    if workers > 1 and not hasattr(os, "fork"):
+        print("⚠️  Multiple workers need os.fork; starting a single worker")
+        workers = 1
     
     print("=" * 60)
     print("Kid Message Safety API Server")
     print("=" * 60)
     print(f"Starting on http://{config.api_host}:{config.api_port}")
     print(f"API docs: http://{config.api_host}:{config.api_port}/docs")
+    print(f"Workers: {workers}")
+    if workers > 1:
+        print("   Caches and conversation windows are per worker; track child_id")
+        print("   conversations with a single worker (or one worker per gateway replica)")
     print()
     
+    if workers > 1:
+        import logging
+        from src.api.app import app, preload_processor
+        from src.serving import PreforkServer
+        
+        logging.basicConfig(level=logging.INFO)
+        PreforkServer(
+            app,
+            preload=preload_processor,
+            host=config.api_host,
+            port=config.api_port,
+            workers=workers
+        ).run()
+        return
+    
     uvicorn.run(
         "src.api.app:app",
         host=config.api_host,
@@ -169,6 +209,76 @@ def start_api():
     )
 
 
+def start_gateway():
+    """Run the gateway that routes each message to the replica caching it."""
+    import uvicorn
+    from src.config import MODEL_CONFIG
+    from src.config.model_config import ProductionConfig
+    from src.api.gateway import Gateway, create_gateway_app
+    
+    config = ProductionConfig.from_env()
+    gateway = Gateway.from_config(MODEL_CONFIG["gateway"])
+    if not len(gateway.ring):
+        print("⚠️  No replicas configured; set GATEWAY_REPLICAS=http://host1:8000,http://host2:8000")
+        return
+    
+    print("=" * 60)
+    print("Kid Message Safety Gateway")
+    print("=" * 60)
+    print(f"Starting on http://{config.api_host}:{config.api_port}")
+    for replica in gateway.ring.nodes:
+        print(f"   -> {replica}")
+    print()
+    
+    uvicorn.run(create_gateway_app(gateway), host=config.api_host, port=config.api_port)
+
+
+def start_inference_server():
+    """Run the models in a dedicated process that API workers connect to."""
+    import logging
+    from src.config import MODEL_CONFIG
+    from src.config.model_config import ProductionConfig
+    from src.serving import InferenceServer
+    
+    logging.basicConfig(level=logging.INFO)
+    settings = MODEL_CONFIG["inference_server"]
+    socket_path = os.getenv("INFERENCE_SOCKET", settings["socket_path"])
+    
+    print("=" * 60)
+    print("Kid Message Safety Inference Server")
+    print("=" * 60)
+    print(f"Listening on {socket_path}")
+    print(f"Point the API at it with INFERENCE_SOCKET={socket_path}")
+    print()
+    
+    InferenceServer(
+        socket_path,
+        device=ProductionConfig.from_env().device,
+        max_batch=settings["max_batch"],
+        max_wait_ms=settings["max_wait_ms"]
+    ).serve_forever()
+
+
+def cache_report(paths):
+    """Print predicted hit rates for the traffic in classification exports."""
+    from src.cache import CacheAnalytics, cache_key
+    from src.cache.analytics import format_report
+    from src.cache.warm_start import read_traffic
+    from src.config import MODEL_CONFIG
+    
+    config = MODEL_CONFIG["cache_analytics"]
+    requests = read_traffic(paths or MODEL_CONFIG["warm_start"]["paths"])
+    # Offline, so every key is tracked
+    analytics = CacheAnalytics(sample_rate=1.0, sizes=config["sizes"], ttls=config["ttls"])
+    for timestamp, message in requests:
+        analytics.record(cache_key(message), now=timestamp)
+    
+    print(f"\n📈 Cache report ({len(requests)} messages)")
+    for line in format_report(analytics.get_stats()):
+        print(f"   {line}")
+    print()
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Kid Message Safety & Communication Coach System",
@@ -181,6 +291,10 @@ Examples:
   python main.py                     # Interactive mode
   python main.py --demo              # Run demo
   python main.py --api               # Start API server
+  python main.py --api --workers 8   # API server with 8 pre-forked workers
+  python main.py --inference-server  # Shared model process (set INFERENCE_SOCKET for the API)
+  python main.py --gateway           # Route to replicas in GATEWAY_REPLICAS by message hash
+  python main.py --cache-report      # Predicted hit rate by cache size/TTL for exported traffic
         """
     )
     
@@ -194,6 +308,28 @@ Examples:
         action="store_true", 
         help="Start API server"
     )
+    parser.add_argument(
+        "--inference-server",
+        action="store_true",
+        help="Run the ML models in a dedicated process for API workers to share"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="API worker processes (default: WORKERS env var or 1)"
+    )
+    parser.add_argument(
+        "--gateway",
+        action="store_true",
+        help="Run the consistent-hash gateway in front of the API replicas"
+    )
+    parser.add_argument(
+        "--cache-report",
+        nargs="*",
+        metavar="CSV",
+        help="Replay classification exports (default: the warm-start exports) and "
+             "print the predicted cache hit rate by size and TTL"
+    )
     parser.add_argument(
         "--no-cache",
         action="store_true",
@@ -202,8 +338,20 @@ Examples:
     
     args = parser.parse_args()
     
+    if args.inference_server:
+        start_inference_server()
+        return
+    
+    if args.gateway:
+        start_gateway()
+        return
+    
+    if args.cache_report is not None:
+        cache_report(args.cache_report)
+        return
+    
     if args.api:
-        start_api()
+        start_api(args.workers)
         return
     
     # Create processor with HF LLM mode
@@ -8,6 +8,7 @@ from .hate_speech import HateSpeechAnalyzer
 from .sexual_content import SexualContentAnalyzer
 from .self_harm import SelfHarmAnalyzer
 from .bullying import BullyingAnalyzer
+from .conversation import ConversationWindowAnalyzer
 
 __all__ = [
     "ToxicityAnalyzer", 
@@ -18,5 +19,6 @@ __all__ = [
     "SexualContentAnalyzer",
     "SelfHarmAnalyzer",
     "BullyingAnalyzer",
+    "ConversationWindowAnalyzer",
 ]
 
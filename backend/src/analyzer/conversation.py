@@ -0,0 +1,246 @@
+"""
+Conversation Window Analyzer - Detects repetition and escalation across messages.
+
+Every other analyzer looks at one message. This one keeps a small sliding
+window of recent classifications per (child, conversation) so that patterns
+like ten mild "whatever"s in a row become visible.
+"""
+
+import time
+import logging
+from array import array
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Any, List, Optional, Tuple
+
+from ..models import Classification, DetectedIssue, ConversationSignal
+
+logger = logging.getLogger(__name__)
+
+
+SEVERITY = {Classification.GREEN: 0, Classification.YELLOW: 1, Classification.RED: 2}
+
+# One bit per issue type, so a message's issues fit in a 16-bit mask
+ISSUES: List[DetectedIssue] = list(DetectedIssue)
+ISSUE_BITS: Dict[DetectedIssue, int] = {issue: 1 << i for i, issue in enumerate(ISSUES)}
+
+
+def issue_mask(issues: List[DetectedIssue]) -> int:
+    mask = 0
+    for issue in issues:
+        mask |= ISSUE_BITS[issue]
+    return mask
+
+
+class _Window:
+    """
+    Ring buffer of the last N messages in one conversation.
+
+    Per-issue and per-severity counts are maintained incrementally, so each
+    push is O(1) (bounded by the number of issue types). Escalation is read
+    from the slots in the ring, so rises that have left the window no
+    longer count.
+    """
+
+    __slots__ = ("severities", "masks", "pos", "count", "issue_counts",
+                 "severity_counts", "last_seen")
+
+    def __init__(self, size: int):
+        self.severities = bytearray(size)
+        self.masks = array("H", bytes(2 * size))
+        self.pos = 0
+        self.count = 0
+        self.issue_counts = array("H", bytes(2 * len(ISSUES)))
+        self.severity_counts = [0, 0, 0]
+        self.last_seen = 0.0
+
+    def push(self, severity: int, mask: int):
+        size = len(self.severities)
+
+        # Evict the oldest entry once the window is full
+        if self.count == size:
+            self._count(self.severities[self.pos], self.masks[self.pos], -1)
+        else:
+            self.count += 1
+
+        self.severities[self.pos] = severity
+        self.masks[self.pos] = mask
+        self._count(severity, mask, 1)
+        self.pos = (self.pos + 1) % size
+
+    def rising_steps(self) -> int:
+        """
+        Severity increases in the run of non-decreasing messages that ends
+        with the newest one (only messages still in the window).
+        """
+        size = len(self.severities)
+        steps = 0
+        newer = self.severities[(self.pos - 1) % size]
+        for i in range(1, self.count):
+            older = self.severities[(self.pos - 1 - i) % size]
+            if older > newer:
+                break
+            steps += older < newer
+            newer = older
+        return steps
+
+    def _count(self, severity: int, mask: int, delta: int):
+        self.severity_counts[severity] += delta
+        while mask:
+            low = mask & -mask
+            self.issue_counts[low.bit_length() - 1] += delta
+            mask ^= low
+
+    def to_bytes(self) -> bytes:
+        """Compact form for spilled sessions."""
+        header = array("H", [len(self.severities), self.pos, self.count])
+        return header.tobytes() + bytes(self.severities) + self.masks.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "_Window":
+        header = array("H")
+        header.frombytes(data[:6])
+        size, pos, count = header
+        window = cls(size)
+        window.severities[:] = data[6:6 + size]
+        window.masks = array("H")
+        window.masks.frombytes(data[6 + size:6 + 3 * size])
+        window.pos, window.count = pos, count
+
+        # Rebuild the running counts from the live slots
+        for i in range(count):
+            slot = (pos - 1 - i) % size
+            window._count(window.severities[slot], window.masks[slot], 1)
+        return window
+
+
+class ConversationWindowAnalyzer:
+    """
+    Tracks recent messages per (child, conversation) and flags repetition
+    and escalation.
+
+    Memory is bounded: at most `max_sessions` windows are kept live (LRU).
+    Sessions pushed out, or idle for `idle_seconds`, are spilled to a compact
+    byte form (a few dozen bytes each) in a second LRU of `max_spilled`
+    entries, and rehydrated when the child sends another message.
+
+    Thread-safe.
+    """
+
+    def __init__(
+        self,
+        window_size: int = 10,
+        repeat_threshold: int = 3,
+        escalation_steps: int = 2,
+        max_sessions: int = 50000,
+        max_spilled: int = 200000,
+        idle_seconds: float = 900
+    ):
+        """
+        Args:
+            window_size: Messages kept per conversation
+            repeat_threshold: Occurrences of one issue in the window that count as repetition
+            escalation_steps: Consecutive severity increases that count as escalation
+            max_sessions: Live windows kept in memory
+            max_spilled: Spilled (compact) sessions kept before being dropped
+            idle_seconds: Live windows idle this long are spilled
+        """
+        if window_size > 0xFFFF:
+            raise ValueError("window_size must fit in 16 bits")
+        self.window_size = window_size
+        self.repeat_threshold = repeat_threshold
+        self.escalation_steps = escalation_steps
+        self.max_sessions = max_sessions
+        self.max_spilled = max_spilled
+        self.idle_seconds = idle_seconds
+
+        self._live: OrderedDict = OrderedDict()
+        self._spilled: OrderedDict = OrderedDict()
+        self._lock = Lock()
+        self._spills = 0
+        self._rehydrations = 0
+        self._dropped = 0
+
+    def observe(
+        self,
+        child_id: str,
+        conversation_id: Optional[str],
+        classification: Classification,
+        issues: List[DetectedIssue]
+    ) -> ConversationSignal:
+        """Add a message to the child's conversation window and evaluate it."""
+        key = (child_id, conversation_id or "")
+        now = time.monotonic()
+
+        with self._lock:
+            self._spill_idle(now)
+            window = self._get_window(key)
+            window.push(SEVERITY[classification], issue_mask(issues))
+            window.last_seen = now
+            return self._evaluate(window)
+
+    def _get_window(self, key: Tuple[str, str]) -> _Window:
+        window = self._live.get(key)
+        if window is not None:
+            self._live.move_to_end(key)
+            return window
+
+        data = self._spilled.pop(key, None)
+        if data is not None:
+            window = _Window.from_bytes(data)
+            self._rehydrations += 1
+        else:
+            window = _Window(self.window_size)
+
+        self._live[key] = window
+        while len(self._live) > self.max_sessions:
+            self._spill(*self._live.popitem(last=False))
+        return window
+
+    def _spill_idle(self, now: float):
+        # Oldest sessions are at the front; stop at the first active one
+        while self._live:
+            key, window = next(iter(self._live.items()))
+            if now - window.last_seen < self.idle_seconds:
+                break
+            self._spill(*self._live.popitem(last=False))
+
+    def _spill(self, key: Tuple[str, str], window: _Window):
+        self._spilled[key] = window.to_bytes()
+        self._spills += 1
+        while len(self._spilled) > self.max_spilled:
+            self._spilled.popitem(last=False)
+            self._dropped += 1
+
+    def _evaluate(self, window: _Window) -> ConversationSignal:
+        repeated = [
+            ISSUES[i] for i, count in enumerate(window.issue_counts)
+            if count >= self.repeat_threshold
+        ]
+        escalation = window.rising_steps() >= self.escalation_steps
+        return ConversationSignal(
+            window_size=window.count,
+            repetition_detected=bool(repeated),
+            escalation_detected=escalation,
+            repeated_issues=repeated,
+            flagged=bool(repeated) or escalation,
+        )
+
+    def reset(self, child_id: str, conversation_id: Optional[str] = None):
+        """Forget a conversation."""
+        key = (child_id, conversation_id or "")
+        with self._lock:
+            self._live.pop(key, None)
+            self._spilled.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "live_sessions": len(self._live),
+                "spilled_sessions": len(self._spilled),
+                "max_sessions": self.max_sessions,
+                "max_spilled": self.max_spilled,
+                "spills": self._spills,
+                "rehydrations": self._rehydrations,
+                "dropped": self._dropped,
+            }
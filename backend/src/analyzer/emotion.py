@@ -3,6 +3,7 @@ Emotion Analyzer - ML-based emotion detection.
 """
 
 import logging
+from threading import Lock
 from typing import Dict, List
 from ..models import EmotionResult, EmotionType
 
@@ -47,6 +48,8 @@ class EmotionAnalyzer:
         self.device = device
         self.model = None
         self.tokenizer = None
+        # Fast tokenizers are not safe to call from several threads at once
+        self._tokenizer_lock = Lock()
         self.model_loaded = False
         
         if use_model:
@@ -70,45 +73,58 @@ class EmotionAnalyzer:
             logger.warning(f"Failed to load emotion model: {e}")
             self.model_loaded = False
     
-    def analyze(self, text: str) -> EmotionResult:
-        if self.model_loaded:
+    def analyze(self, text: str, use_model: bool = True) -> EmotionResult:
+        if self.model_loaded and use_model:
             return self._analyze_with_model(text)
         return self._analyze_with_rules(text)
     
+    def analyze_batch(self, texts: List[str], use_model: bool = True) -> List[EmotionResult]:
+        """Analyze several texts with one model call."""
+        if self.model_loaded and use_model:
+            return self._analyze_batch_with_model(texts)
+        return [self._analyze_with_rules(text) for text in texts]
+    
     def _analyze_with_model(self, text: str) -> EmotionResult:
+        return self._analyze_batch_with_model([text])[0]
+    
+    def _analyze_batch_with_model(self, texts: List[str]) -> List[EmotionResult]:
         try:
             import torch
             import torch.nn.functional as F
             
-            inputs = self.tokenizer(text, return_tensors="pt", truncation=True, 
-                                    max_length=512, padding=True)
+            with self._tokenizer_lock:
+                inputs = self.tokenizer(texts, return_tensors="pt", truncation=True, 
+                                        max_length=512, padding=True)
             inputs = {k: v.to(self.device) for k, v in inputs.items()}
             
             with torch.no_grad():
                 outputs = self.model(**inputs)
                 probs = F.softmax(outputs.logits, dim=-1)
             
-            labels = self.model.config.id2label
-            scores = {}
-            for idx, prob in enumerate(probs[0]):
-                label = labels[idx]
-                emotion_type = self.LABEL_MAP.get(label, EmotionType.NEUTRAL)
-                scores[emotion_type.value] = prob.item()
-            
-            max_idx = probs[0].argmax().item()
-            max_label = labels[max_idx]
-            primary_emotion = self.LABEL_MAP.get(max_label, EmotionType.NEUTRAL)
-            intensity = probs[0].max().item()
-            
-            return EmotionResult(
-                primary_emotion=primary_emotion,
-                scores=scores,
-                intensity=intensity
-            )
+            return [self._result_from_probs(row) for row in probs]
             
         except Exception as e:
             logger.error(f"Model analysis failed: {e}")
-            return self._analyze_with_rules(text)
+            return [self._analyze_with_rules(text) for text in texts]
+    
+    def _result_from_probs(self, probs) -> EmotionResult:
+        labels = self.model.config.id2label
+        scores = {}
+        for idx, prob in enumerate(probs):
+            label = labels[idx]
+            emotion_type = self.LABEL_MAP.get(label, EmotionType.NEUTRAL)
+            scores[emotion_type.value] = prob.item()
+        
+        max_idx = probs.argmax().item()
+        max_label = labels[max_idx]
+        primary_emotion = self.LABEL_MAP.get(max_label, EmotionType.NEUTRAL)
+        intensity = probs.max().item()
+        
+        return EmotionResult(
+            primary_emotion=primary_emotion,
+            scores=scores,
+            intensity=intensity
+        )
     
     def _analyze_with_rules(self, text: str) -> EmotionResult:
         text_lower = text.lower()
@@ -0,0 +1,173 @@
+"""
+Analysis Graph - Demand-driven evaluation of analyzers.
+
+Each analyzer is a node that declares the nodes it depends on. Callers ask for
+the outputs they need and only those nodes (and their dependencies) run.
+Results are memoized per message so a later request for more outputs reuses
+earlier work.
+"""
+
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..serving.deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class AnalysisNode:
+    """
+    One step of the analysis.
+
+    `compute` is called as compute(text, deadline, **inputs) where inputs are
+    the values of the nodes named in `inputs`.
+    """
+    name: str
+    inputs: Tuple[str, ...]
+    compute: Callable[..., Any]
+
+
+class AnalysisMemo:
+    """
+    Per-message memo of computed node values.
+
+    LRU over messages; each entry maps node name -> value. Values are shared
+    between requests and must be treated as read-only. Thread-safe.
+    """
+
+    def __init__(self, max_entries: int = 2000):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def lookup(self, text: str, names: Iterable[str]) -> Dict[str, Any]:
+        """Get the already-computed subset of the requested nodes."""
+        with self._lock:
+            entry = self._entries.get(text)
+            if entry is None:
+                self._misses += 1
+                return {}
+            self._entries.move_to_end(text)
+            found = {name: entry[name] for name in names if name in entry}
+            if found:
+                self._hits += 1
+            else:
+                self._misses += 1
+            return found
+
+    def store(self, text: str, values: Dict[str, Any]):
+        """Add computed node values for a message."""
+        if not values:
+            return
+        with self._lock:
+            entry = self._entries.get(text)
+            if entry is None:
+                if len(self._entries) >= self.max_entries:
+                    self._entries.popitem(last=False)
+                entry = self._entries[text] = {}
+            else:
+                self._entries.move_to_end(text)
+            entry.update(values)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate_percent": round(self._hits / total * 100, 2) if total else 0,
+            }
+
+
+class AnalysisGraph:
+    """DAG of analysis nodes with lazy, memoized evaluation."""
+
+    def __init__(self, nodes: List[AnalysisNode], memo: Optional[AnalysisMemo] = None):
+        self.nodes: Dict[str, AnalysisNode] = {node.name: node for node in nodes}
+        self.memo = memo
+        self._order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        order: List[str] = []
+        state: Dict[str, str] = {}
+
+        def visit(name: str):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Cycle in analysis graph at '{name}'")
+            if name not in self.nodes:
+                raise ValueError(f"Unknown analysis node '{name}'")
+            state[name] = "visiting"
+            for dep in self.nodes[name].inputs:
+                visit(dep)
+            state[name] = "done"
+            order.append(name)
+
+        for name in self.nodes:
+            visit(name)
+        return order
+
+    def required(self, outputs: Iterable[str]) -> List[str]:
+        """All nodes needed for the outputs, in evaluation order."""
+        needed = set()
+        stack = list(outputs)
+        while stack:
+            name = stack.pop()
+            if name not in self.nodes:
+                raise ValueError(f"Unknown analysis output '{name}'")
+            if name not in needed:
+                needed.add(name)
+                stack.extend(self.nodes[name].inputs)
+        return [name for name in self._order if name in needed]
+
+    def evaluate(
+        self,
+        text: str,
+        outputs: Iterable[str],
+        deadline: Optional[Deadline] = None
+    ) -> Dict[str, Any]:
+        """
+        Compute the requested outputs for a message.
+
+        Nodes that had to degrade (e.g. skipped a model because of the
+        deadline) are not memoized, and neither is anything computed from them.
+        """
+        outputs = list(outputs)
+        deadline = deadline or Deadline()
+        plan = self.required(outputs)
+
+        values = self.memo.lookup(text, plan) if self.memo else {}
+        fresh: Dict[str, Any] = {}
+        tainted = set()
+
+        for name in plan:
+            if name in values:
+                continue
+            node = self.nodes[name]
+            degraded_before = len(deadline.degraded)
+            values[name] = node.compute(text, deadline, **{dep: values[dep] for dep in node.inputs})
+
+            if len(deadline.degraded) > degraded_before or tainted.intersection(node.inputs):
+                tainted.add(name)
+            else:
+                fresh[name] = values[name]
+
+        if self.memo:
+            self.memo.store(text, fresh)
+
+        return {name: values[name] for name in outputs}
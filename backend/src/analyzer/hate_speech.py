@@ -4,6 +4,7 @@ Hate Speech Analyzer - Proper hate speech detection using ML models and patterns
 
 import logging
 import re
+from threading import Lock
 from typing import Dict, List, Optional
 from ..models import ToxicityResult
 
@@ -56,6 +57,8 @@ class HateSpeechAnalyzer:
         self.device = device
         self.model = None
         self.tokenizer = None
+        # Fast tokenizers are not safe to call from several threads at once
+        self._tokenizer_lock = Lock()
         self.model_loaded = False
         self._use_model = use_model
         
@@ -91,32 +94,39 @@ class HateSpeechAnalyzer:
             logger.warning(f"Failed to load hate speech models: {e}")
             self.model_loaded = False
     
-    def analyze(self, text: str) -> Dict[str, any]:
+    def analyze(self, text: str, use_model: bool = True) -> Dict[str, any]:
         """
         Analyze text for hate speech.
         
+        Args:
+            text: Text to analyze
+            use_model: Set False to use patterns only (e.g. when out of latency budget)
+        
         Returns:
             Dict with hate_speech_detected, confidence, and matched_patterns
         """
+        return self.analyze_batch([text], use_model=use_model)[0]
+    
+    def analyze_batch(self, texts: List[str], use_model: bool = True) -> List[Dict[str, any]]:
+        """Analyze several texts with one model call."""
         # Always check patterns first (fast and reliable for explicit content)
-        pattern_result = self._analyze_with_patterns(text)
+        pattern_results = [self._analyze_with_patterns(text) for text in texts]
         
-        if not self.model_loaded:
-            return pattern_result
+        if not (self.model_loaded and use_model):
+            return pattern_results
         
         # Use ML model for more nuanced detection
-        ml_result = self._analyze_with_model(text)
+        ml_results = self._analyze_batch_with_model(texts)
         
         # Combine results: if either detects hate speech, flag it
-        hate_speech_detected = pattern_result["hate_speech_detected"] or ml_result["hate_speech_detected"]
-        confidence = max(pattern_result["confidence"], ml_result["confidence"])
-        matched_patterns = pattern_result["matched_patterns"] + ml_result.get("matched_patterns", [])
-        
-        return {
-            "hate_speech_detected": hate_speech_detected,
-            "confidence": confidence,
-            "matched_patterns": matched_patterns
-        }
+        return [
+            {
+                "hate_speech_detected": pattern_result["hate_speech_detected"] or ml_result["hate_speech_detected"],
+                "confidence": max(pattern_result["confidence"], ml_result["confidence"]),
+                "matched_patterns": pattern_result["matched_patterns"] + ml_result.get("matched_patterns", [])
+            }
+            for pattern_result, ml_result in zip(pattern_results, ml_results)
+        ]
     
     def _analyze_with_patterns(self, text: str) -> Dict[str, any]:
         """Analyze using regex patterns."""
@@ -135,52 +145,63 @@ class HateSpeechAnalyzer:
     
     def _analyze_with_model(self, text: str) -> Dict[str, any]:
         """Analyze using ML model."""
+        return self._analyze_batch_with_model([text])[0]
+    
+    def _analyze_batch_with_model(self, texts: List[str]) -> List[Dict[str, any]]:
+        """Analyze several texts with one forward pass."""
         try:
             import torch
             import torch.nn.functional as F
             
-            inputs = self.tokenizer(
-                text,
-                return_tensors="pt",
-                truncation=True,
-                max_length=512,
-                padding=True
-            )
+            with self._tokenizer_lock:
+                inputs = self.tokenizer(
+                    texts,
+                    return_tensors="pt",
+                    truncation=True,
+                    max_length=512,
+                    padding=True
+                )
             inputs = {k: v.to(self.device) for k, v in inputs.items()}
             
             with torch.no_grad():
                 outputs = self.model(**inputs)
                 probs = F.softmax(outputs.logits, dim=-1)
             
-            # Get model labels
-            labels = self.model.config.id2label
-            max_idx = probs[0].argmax().item()
-            max_label = labels[max_idx].lower()
-            max_prob = probs[0][max_idx].item()
-            
-            # Check if it's hate speech
-            # Model outputs: hate, offensive, or neither
-            is_hate = max_label in ["hate", "hateful", "hate_speech"]
-            is_offensive = max_label in ["offensive", "toxic"]
-            
-            # Consider it hate speech if:
-            # 1. Label is explicitly "hate"
-            # 2. Or label is "offensive" with high confidence (>0.7)
-            hate_speech_detected = is_hate or (is_offensive and max_prob > 0.7)
-            
-            return {
-                "hate_speech_detected": hate_speech_detected,
-                "confidence": max_prob,
-                "matched_patterns": [f"model:{max_label}"]
-            }
+            return [self._result_from_probs(row) for row in probs]
             
         except Exception as e:
             logger.error(f"Model analysis failed: {e}")
-            return {
-                "hate_speech_detected": False,
-                "confidence": 0.0,
-                "matched_patterns": []
-            }
+            return [
+                {
+                    "hate_speech_detected": False,
+                    "confidence": 0.0,
+                    "matched_patterns": []
+                }
+                for _ in texts
+            ]
+    
+    def _result_from_probs(self, probs) -> Dict[str, any]:
+        # Get model labels
+        labels = self.model.config.id2label
+        max_idx = probs.argmax().item()
+        max_label = labels[max_idx].lower()
+        max_prob = probs[max_idx].item()
+        
+        # Check if it's hate speech
+        # Model outputs: hate, offensive, or neither
+        is_hate = max_label in ["hate", "hateful", "hate_speech"]
+        is_offensive = max_label in ["offensive", "toxic"]
+        
+        # Consider it hate speech if:
+        # 1. Label is explicitly "hate"
+        # 2. Or label is "offensive" with high confidence (>0.7)
+        hate_speech_detected = is_hate or (is_offensive and max_prob > 0.7)
+        
+        return {
+            "hate_speech_detected": hate_speech_detected,
+            "confidence": max_prob,
+            "matched_patterns": [f"model:{max_label}"]
+        }
     
     def get_model_info(self) -> Dict[str, any]:
         """Get model information."""
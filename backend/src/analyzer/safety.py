@@ -2,11 +2,15 @@
 Safety Analyzer - Combines all analysis components.
 """
 
+import time
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Iterable
 from ..models import (
     AnalysisResult, DetectedIssue, IntentType, EmotionType, PatternResult
 )
+from ..config import MODEL_CONFIG
+from ..serving.deadline import Deadline, StageCostModel
+from ..serving.inference_server import RemoteInferenceClient, InferenceUnavailable
 from .toxicity import ToxicityAnalyzer
 from .emotion import EmotionAnalyzer
 from .patterns import PatternAnalyzer
@@ -14,55 +18,168 @@ from .hate_speech import HateSpeechAnalyzer
 from .sexual_content import SexualContentAnalyzer
 from .self_harm import SelfHarmAnalyzer
 from .bullying import BullyingAnalyzer
+from .graph import AnalysisGraph, AnalysisNode, AnalysisMemo
 
 logger = logging.getLogger(__name__)
 
 
 class SafetyAnalyzer:
-    """Multi-model ensemble for comprehensive message analysis."""
+    """
+    Multi-model ensemble for comprehensive message analysis.
     
-    def __init__(self, use_models: bool = True, device: str = "cpu"):
-        logger.info(f"Initializing SafetyAnalyzer (use_models={use_models})")
+    The analyzers form a small DAG (see `_build_graph`). `evaluate()` computes
+    only the nodes the requested outputs depend on; `analyze()` computes
+    everything. Node values are memoized per message.
+    
+    With an `inference_client`, the ML stages run in a separate inference
+    process instead of loading the models here; if it is slow or down the
+    rule-based paths are used.
+    """
+    
+    # Fields of AnalysisResult, each backed by a graph node of the same name
+    OUTPUTS = ("toxicity", "emotion", "patterns", "detected_issues", "intent")
+    # Stages with an ML model (and a rule-based fallback)
+    MODEL_STAGES = ("toxicity", "emotion", "hate_speech")
+    
+    def __init__(
+        self,
+        use_models: bool = True,
+        device: str = "cpu",
+        inference_client: Optional[RemoteInferenceClient] = None
+    ):
+        logger.info(f"Initializing SafetyAnalyzer (use_models={use_models}, remote={inference_client is not None})")
         
-        self.toxicity_analyzer = ToxicityAnalyzer(use_model=use_models, device=device)
-        self.emotion_analyzer = EmotionAnalyzer(use_model=use_models, device=device)
+        # Models live in the inference process when a client is given
+        load_local = use_models and inference_client is None
+        self.toxicity_analyzer = ToxicityAnalyzer(use_model=load_local, device=device)
+        self.emotion_analyzer = EmotionAnalyzer(use_model=load_local, device=device)
         self.pattern_analyzer = PatternAnalyzer()
-        self.hate_speech_analyzer = HateSpeechAnalyzer(use_model=use_models, device=device)
+        self.hate_speech_analyzer = HateSpeechAnalyzer(use_model=load_local, device=device)
         self.sexual_content_analyzer = SexualContentAnalyzer()
         self.self_harm_analyzer = SelfHarmAnalyzer()
         self.bullying_analyzer = BullyingAnalyzer()
         
         self._use_models = use_models
+        self.inference_client = inference_client if use_models else None
+        self.stage_costs = StageCostModel(
+            MODEL_CONFIG["deadlines"]["stage_cost_ms"],
+            half_life_s=MODEL_CONFIG["deadlines"]["cost_half_life_s"]
+        )
+        self.graph = AnalysisGraph(
+            self._build_graph(),
+            memo=AnalysisMemo(**MODEL_CONFIG["analysis_memo"])
+        )
+    
+    def _build_graph(self) -> List[AnalysisNode]:
+        """Declare each analyzer's inputs and outputs."""
+        return [
+            AnalysisNode("toxicity", (), lambda text, deadline: self._run_model_stage(
+                "toxicity", self.toxicity_analyzer, text, deadline)),
+            AnalysisNode("emotion", (), lambda text, deadline: self._run_model_stage(
+                "emotion", self.emotion_analyzer, text, deadline)),
+            AnalysisNode("hate_speech", (), lambda text, deadline: self._run_model_stage(
+                "hate_speech", self.hate_speech_analyzer, text, deadline)),
+            AnalysisNode("base_patterns", (), lambda text, deadline: self.pattern_analyzer.analyze(text)),
+            AnalysisNode("self_harm", (), lambda text, deadline: self.self_harm_analyzer.analyze(text)),
+            AnalysisNode("sexual_content", (), lambda text, deadline: self.sexual_content_analyzer.analyze(text)),
+            AnalysisNode("bullying", (), lambda text, deadline: self.bullying_analyzer.analyze(text)),
+            AnalysisNode(
+                "patterns",
+                ("base_patterns", "hate_speech", "sexual_content", "self_harm", "bullying"),
+                lambda text, deadline, base_patterns, hate_speech, sexual_content, self_harm, bullying:
+                    self._merge_pattern_results(
+                        base_patterns, hate_speech, sexual_content, self_harm, bullying
+                    )
+            ),
+            AnalysisNode(
+                "detected_issues", ("toxicity", "patterns"),
+                lambda text, deadline, toxicity, patterns: self._aggregate_issues(toxicity, patterns)
+            ),
+            AnalysisNode(
+                "intent", ("toxicity", "emotion", "patterns"),
+                lambda text, deadline, toxicity, emotion, patterns:
+                    self._determine_intent(text, toxicity, emotion, patterns)
+            ),
+        ]
     
-    def analyze(self, text: str) -> AnalysisResult:
+    def analyze(self, text: str, deadline: Optional[Deadline] = None) -> AnalysisResult:
+        """
+        Analyze text with all analyzers.
+        
+        Args:
+            text: Preprocessed text
+            deadline: Optional latency budget. Model stages that no longer fit
+                use their rule-based path and are recorded on the deadline.
+        """
         logger.debug(f"Analyzing: {text[:50]}...")
+        return AnalysisResult(**self.evaluate(text, self.OUTPUTS, deadline))
+    
+    def evaluate(
+        self,
+        text: str,
+        outputs: Iterable[str],
+        deadline: Optional[Deadline] = None
+    ) -> Dict[str, Any]:
+        """
+        Compute only the requested outputs (and what they depend on).
         
-        toxicity = self.toxicity_analyzer.analyze(text)
-        emotion = self.emotion_analyzer.analyze(text)
-        patterns = self.pattern_analyzer.analyze(text)
+        Args:
+            text: Preprocessed text
+            outputs: Graph node names, e.g. ["emotion"] or ["toxicity", "detected_issues"]
+            deadline: Optional latency budget
         
-        # Run new analyzers (order matters - self-harm before threat patterns)
-        self_harm_result = self.self_harm_analyzer.analyze(text)
-        hate_speech_result = self.hate_speech_analyzer.analyze(text)
-        sexual_content_result = self.sexual_content_analyzer.analyze(text)
-        bullying_result = self.bullying_analyzer.analyze(text)
+        Returns:
+            Dict of node name -> value (shared with the memo, do not mutate)
+        """
+        return self.graph.evaluate(text, outputs, deadline)
+    
+    def is_critical(self, text: str) -> bool:
+        """
+        Cheap rule pre-pass for safety-critical content (self-harm, threats).
         
-        # Merge results into PatternResult
-        enhanced_patterns = self._merge_pattern_results(
-            patterns, hate_speech_result, sexual_content_result,
-            self_harm_result, bullying_result
+        Used to route messages into the priority lane before the models run.
+        """
+        if self.self_harm_analyzer.analyze(text)["self_harm_detected"]:
+            return True
+        return any(p.search(text) for p in self.pattern_analyzer.threat_re)
+    
+    def models_loaded(self) -> bool:
+        """Check if any ML model is loaded (locally or in the inference process)."""
+        return (
+            self.inference_client is not None
+            or self.toxicity_analyzer.model_loaded
+            or self.emotion_analyzer.model_loaded
+            or self.hate_speech_analyzer.model_loaded
         )
+    
+    def stage_uses_model(self, stage: str) -> bool:
+        """Check if an ML stage ("toxicity", "emotion", "hate_speech") has a model."""
+        if self.inference_client is not None:
+            return True
+        return getattr(self, f"{stage}_analyzer").model_loaded
+    
+    def _run_model_stage(self, stage: str, analyzer, text: str, deadline: Deadline):
+        """Run an ML-backed analyzer, falling back to rules if over budget."""
+        if not self.stage_uses_model(stage):
+            return analyzer.analyze(text, use_model=False)
         
-        issues = self._aggregate_issues(toxicity, enhanced_patterns)
-        intent = self._determine_intent(text, toxicity, emotion, enhanced_patterns)
+        if not deadline.permits(stage, self.stage_costs.estimate(stage)):
+            return analyzer.analyze(text, use_model=False)
         
-        return AnalysisResult(
-            toxicity=toxicity,
-            emotion=emotion,
-            patterns=enhanced_patterns,
-            detected_issues=issues,
-            intent=intent
-        )
+        start = time.perf_counter()
+        if self.inference_client is not None:
+            try:
+                result = self.inference_client.infer(
+                    stage, text, timeout=deadline.timeout_s(self.inference_client.timeout)
+                )
+            except InferenceUnavailable as e:
+                logger.debug(f"Remote {stage} unavailable, using rules: {e}")
+                deadline.degrade(stage)
+                return analyzer.analyze(text, use_model=False)
+        else:
+            result = analyzer.analyze(text)
+        self.stage_costs.observe(stage, (time.perf_counter() - start) * 1000)
+        return result
     
     def _merge_pattern_results(
         self, 
@@ -73,6 +190,9 @@ class SafetyAnalyzer:
         bullying_result: Dict
     ) -> PatternResult:
         """Merge all analyzer results into PatternResult."""
+        # Work on a copy - the base result is memoized
+        base_patterns = base_patterns.model_copy()
+        
         # Update base patterns with new detections
         base_patterns.hate_speech_detected = base_patterns.hate_speech_detected or hate_speech_result.get("hate_speech_detected", False)
         base_patterns.sexual_content_detected = sexual_content_result.get("sexual_content_detected", False)
@@ -172,6 +292,9 @@ class SafetyAnalyzer:
             "emotion": self.emotion_analyzer.get_model_info(),
             "hate_speech": self.hate_speech_analyzer.get_model_info(),
             "use_models": self._use_models,
+            "inference_server": self.inference_client.get_stats() if self.inference_client else None,
+            "stage_cost_ms": self.stage_costs.get_stats(),
+            "memo": self.graph.memo.get_stats(),
         }
     
     def is_ready(self) -> bool:
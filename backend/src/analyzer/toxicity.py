@@ -4,7 +4,8 @@ Toxicity Analyzer - ML-based with robust fallback.
 
 import logging
 import re
-from typing import Dict, Any
+from threading import Lock
+from typing import Dict, Any, List
 from ..models import ToxicityResult
 
 logger = logging.getLogger(__name__)
@@ -61,6 +62,8 @@ class ToxicityAnalyzer:
         self.device = device
         self.model = None
         self.tokenizer = None
+        # Fast tokenizers are not safe to call from several threads at once
+        self._tokenizer_lock = Lock()
         self.model_loaded = False
         
         if use_model:
@@ -84,74 +87,91 @@ class ToxicityAnalyzer:
             logger.warning(f"Failed to load toxicity model: {e}")
             self.model_loaded = False
     
-    def analyze(self, text: str) -> ToxicityResult:
+    def analyze(self, text: str, use_model: bool = True) -> ToxicityResult:
+        return self.analyze_batch([text], use_model=use_model)[0]
+    
+    def analyze_batch(self, texts: List[str], use_model: bool = True) -> List[ToxicityResult]:
+        """Analyze several texts, running the model once for all that need it."""
         # Always check rules first for profanity (ML models sometimes miss explicit words)
-        rule_result = self._analyze_with_rules(text)
+        results = [self._analyze_with_rules(text) for text in texts]
+        
+        if not (self.model_loaded and use_model):
+            return results
         
         # If rule-based says it's safe (score 0.0 with high confidence), trust it over ML
-        # This handles whitelisted friendly phrases that ML models might misclassify
-        if rule_result.score == 0.0 and rule_result.confidence >= 0.9:
-            return rule_result
-        
-        if self.model_loaded:
-            ml_result = self._analyze_with_model(text)
-            # Take the higher toxicity score between rule-based and ML
-            # But if rule-based found explicit profanity/threats, prioritize that
-            if rule_result.score > 0.3:  # Rule-based found something significant
-                return rule_result
+        # This handles whitelisted friendly phrases that ML models might misclassify.
+        # If rule-based found explicit profanity/threats (> 0.3), that wins anyway.
+        pending = [
+            i for i, rule_result in enumerate(results)
+            if not (rule_result.score == 0.0 and rule_result.confidence >= 0.9)
+            and rule_result.score <= 0.3
+        ]
+        if not pending:
+            return results
+        
+        ml_results = self._analyze_batch_with_model([texts[i] for i in pending])
+        for i, ml_result in zip(pending, ml_results):
+            rule_result = results[i]
             # Otherwise, use ML but cap it if rule-based says it's safe
             if rule_result.score == 0.0:
                 # ML might give false positives, so use lower of the two
-                return rule_result if rule_result.score < ml_result.score else ml_result
-            return ml_result if ml_result.score > rule_result.score else rule_result
-        
-        return rule_result
+                results[i] = rule_result if rule_result.score < ml_result.score else ml_result
+            else:
+                results[i] = ml_result if ml_result.score > rule_result.score else rule_result
+        return results
     
     def _analyze_with_model(self, text: str) -> ToxicityResult:
+        return self._analyze_batch_with_model([text])[0]
+    
+    def _analyze_batch_with_model(self, texts: List[str]) -> List[ToxicityResult]:
         try:
             import torch
             import torch.nn.functional as F
             
-            inputs = self.tokenizer(
-                text, 
-                return_tensors="pt", 
-                truncation=True, 
-                max_length=512,
-                padding=True
-            )
+            with self._tokenizer_lock:
+                inputs = self.tokenizer(
+                    texts, 
+                    return_tensors="pt", 
+                    truncation=True, 
+                    max_length=512,
+                    padding=True
+                )
             inputs = {k: v.to(self.device) for k, v in inputs.items()}
             
             with torch.no_grad():
                 outputs = self.model(**inputs)
                 probs = F.softmax(outputs.logits, dim=-1)
             
-            # Handle different model output formats
-            # toxic-bert outputs: [non-toxic, toxic]
-            # Some models output multiple toxicity types
-            if probs.shape[1] == 2:
-                toxic_prob = probs[0][1].item()
-            else:
-                # For multi-label models, take max toxicity score
-                toxic_prob = probs[0].max().item()
-            
-            non_toxic_prob = 1 - toxic_prob
-            
-            if toxic_prob > 0.6:
-                label = "hate"
-            elif toxic_prob > 0.3:
-                label = "offensive"
-            else:
-                label = "neither"
-            
-            return ToxicityResult(
-                score=toxic_prob,
-                confidence=max(toxic_prob, non_toxic_prob),
-                label=label
-            )
+            return [self._result_from_probs(row) for row in probs]
             
         except Exception as e:
             logger.error(f"Model analysis failed: {e}")
-            return self._analyze_with_rules(text)
+            return [self._analyze_with_rules(text) for text in texts]
+    
+    def _result_from_probs(self, probs) -> ToxicityResult:
+        # Handle different model output formats
+        # toxic-bert outputs: [non-toxic, toxic]
+        # Some models output multiple toxicity types
+        if probs.shape[0] == 2:
+            toxic_prob = probs[1].item()
+        else:
+            # For multi-label models, take max toxicity score
+            toxic_prob = probs.max().item()
+        
+        non_toxic_prob = 1 - toxic_prob
+        
+        if toxic_prob > 0.6:
+            label = "hate"
+        elif toxic_prob > 0.3:
+            label = "offensive"
+        else:
+            label = "neither"
+        
+        return ToxicityResult(
+            score=toxic_prob,
+            confidence=max(toxic_prob, non_toxic_prob),
+            label=label
+        )
     
     def _analyze_with_rules(self, text: str) -> ToxicityResult:
         """Comprehensive rule-based toxicity detection."""
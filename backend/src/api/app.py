@@ -2,16 +2,22 @@
 FastAPI REST API for Kid Message Safety System.
 """
 
+import os
+import time
+import asyncio
 import logging
-from typing import Optional
+from typing import Optional, List
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 
 from ..pipeline import MessageProcessor
 from ..models import ProcessingResult, Classification
+from ..config import MODEL_CONFIG
+from ..feedback.http_client import shared_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +29,15 @@ class AnalyzeRequest(BaseModel):
     """Request for message analysis."""
     message: str = Field(..., max_length=500)
     age_range: str = Field(default="8-10")
+    budget_ms: Optional[float] = Field(
+        default=None, gt=0,
+        description="Latency budget; slow stages fall back to rules/templates"
+    )
+    child_id: Optional[str] = Field(
+        default=None, max_length=128,
+        description="Sender; enables repetition/escalation tracking across messages"
+    )
+    conversation_id: Optional[str] = Field(default=None, max_length=128)
     
     model_config = {
         "json_schema_extra": {
@@ -33,39 +48,106 @@ class AnalyzeRequest(BaseModel):
 
 class QuickClassifyRequest(BaseModel):
     message: str = Field(..., max_length=500)
+    budget_ms: Optional[float] = Field(default=None, gt=0)
 
 
 class QuickClassifyResponse(BaseModel):
     classification: str
 
 
+class AnalyzeFieldsRequest(BaseModel):
+    """Request for a subset of the analysis."""
+    message: str = Field(..., max_length=500)
+    fields: List[str] = Field(
+        ..., min_length=1,
+        description="toxicity, emotion, patterns, detected_issues, intent, classification"
+    )
+    budget_ms: Optional[float] = Field(default=None, gt=0)
+
+
 class HealthResponse(BaseModel):
     status: str
     ready: bool
+    mode: Optional[str] = None
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Initialize processor on startup."""
+def build_processor() -> MessageProcessor:
+    """Create the production processor (models + HF LLM feedback)."""
     import os
     from dotenv import load_dotenv
     
-    global _processor
-    logger.info("Starting Kid Message Safety API...")
-    
     load_dotenv()
-    hf_api_key = os.getenv("HF_API_KEY")
-    hf_model_id = os.getenv("HF_MODEL_ID")
-    
-    _processor = MessageProcessor(
+    return MessageProcessor(
         use_models=True,
         feedback_mode="hf_llm",
-        hf_api_key=hf_api_key,
-        hf_model_id=hf_model_id
+        hf_api_key=os.getenv("HF_API_KEY"),
+        hf_model_id=os.getenv("HF_MODEL_ID"),
+        # Set when models run in a separate process (main.py --inference-server)
+        inference_socket=os.getenv("INFERENCE_SOCKET")
+    )
+
+
+def warm_start(processor: MessageProcessor):
+    """
+    Fill the caches: first from the last cache snapshot, then from
+    classification exports (WARM_START_PATHS overrides the config).
+    """
+    processor.restore_cache_snapshot()
+    if not MODEL_CONFIG["warm_start"]["enabled"]:
+        return
+    paths = os.getenv("WARM_START_PATHS")
+    processor.warm_start(paths.split(os.pathsep) if paths else None)
+
+
+async def snapshot_periodically(processor: MessageProcessor, interval_s: float):
+    """Write a cache snapshot every `interval_s` seconds (off the event loop)."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval_s)
+        try:
+            await loop.run_in_executor(None, processor.save_cache_snapshot)
+        except Exception as e:
+            logger.warning(f"Periodic cache snapshot failed: {e}")
+
+
+def preload_processor() -> MessageProcessor:
+    """
+    Build the processor ahead of startup.
+    
+    Used by the pre-fork master: the processor is created before the workers
+    are forked, and each worker's lifespan reuses it instead of loading the
+    models again.
+    """
+    global _processor
+    processor = build_processor()
+    processor.warm_up()
+    warm_start(processor)
+    _processor = processor
+    return _processor
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize processor on startup (unless it was preloaded)."""
+    global _processor
+    logger.info("Starting Kid Message Safety API...")
+    
+    preloaded = _processor is not None
+    if not preloaded:
+        processor = build_processor()
+        warm_start(processor)  # Before _processor is set, i.e. before ready
+        _processor = processor
+    logger.info(f"API ready (pid {os.getpid()}, preloaded={preloaded})")
+    snapshots = asyncio.create_task(
+        snapshot_periodically(_processor, MODEL_CONFIG["cache_snapshot"]["interval_s"])
     )
-    logger.info("API ready")
     yield
-    _processor = None
+    snapshots.cancel()
+    _processor.save_green_set()
+    _processor.save_cache_snapshot()
+    await shared_http_client().aclose()
+    if not preloaded:
+        _processor = None
 
 
 def create_app() -> FastAPI:
@@ -85,6 +167,12 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
     
+    @app.middleware("http")
+    async def stamp_arrival(request: Request, call_next):
+        # Lets the processor measure queue wait and count budgets from arrival
+        request.state.received_at = time.perf_counter()
+        return await call_next(request)
+    
     return app
 
 
@@ -108,14 +196,31 @@ async def root():
 
 @app.get("/health", response_model=HealthResponse, tags=["General"])
 async def health():
-    return HealthResponse(status="healthy", ready=_processor is not None)
+    mode = _processor.load_controller.get_status()["mode"] if _processor else None
+    return HealthResponse(status="healthy", ready=_processor is not None, mode=mode)
 
 
+# Endpoints that run the pipeline are plain `def`: FastAPI runs them in its
+# threadpool so slow model/LLM calls don't block the event loop.
 @app.post("/analyze", response_model=ProcessingResult, tags=["Analysis"])
-async def analyze(request: AnalyzeRequest):
+def analyze(request: AnalyzeRequest, http_request: Request):
     """Analyze a message and get feedback."""
     processor = get_processor()
-    result = processor.process(request.message, request.age_range)
+    
+    # Cache hits go out as stored bytes (conversation tracking needs the full path)
+    if request.child_id is None:
+        cached = processor.cached_response(request.message, request.age_range)
+        if cached is not None:
+            return Response(content=cached, media_type="application/json")
+    
+    result = processor.process(
+        request.message, request.age_range,
+        skip_cache=request.child_id is None,  # Already looked up above
+        budget_ms=request.budget_ms,
+        received_at=http_request.state.received_at,
+        child_id=request.child_id,
+        conversation_id=request.conversation_id
+    )
     
     if not result.success:
         raise HTTPException(status_code=400, detail=result.error_message)
@@ -123,26 +228,95 @@ async def analyze(request: AnalyzeRequest):
     return result
 
 
+@app.post("/analyze/stream", tags=["Analysis"])
+async def analyze_stream(request: AnalyzeRequest, http_request: Request):
+    """
+    Analyze a message as server-sent events.
+    
+    `result` carries the response as /analyze returns it. With speculative
+    feedback (metadata.feedback_source == "template_speculative") a
+    `feedback` event follows with the LLM feedback once it is ready. The
+    stream ends with `done`.
+    """
+    processor = get_processor()
+    result = await processor.process_async(
+        request.message, request.age_range,
+        budget_ms=request.budget_ms,
+        received_at=http_request.state.received_at,
+        child_id=request.child_id,
+        conversation_id=request.conversation_id
+    )
+    if not result.success:
+        raise HTTPException(status_code=400, detail=result.error_message)
+    
+    async def events():
+        yield f"event: result\ndata: {result.model_dump_json()}\n\n"
+        upgrade = await processor.upgraded_feedback(
+            request.message, result, request.age_range,
+            timeout=MODEL_CONFIG["feedback"]["speculative"]["stream_timeout_s"]
+        )
+        if upgrade is not None:
+            yield f"event: feedback\ndata: {upgrade.model_dump_json()}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
 @app.post("/classify", response_model=QuickClassifyResponse, tags=["Analysis"])
-async def classify(request: QuickClassifyRequest):
+def classify(request: QuickClassifyRequest, http_request: Request):
     """Quick classification without feedback."""
     processor = get_processor()
-    classification = processor.quick_classify(request.message)
+    classification = processor.quick_classify(
+        request.message,
+        budget_ms=request.budget_ms,
+        received_at=http_request.state.received_at
+    )
     return QuickClassifyResponse(classification=classification.value)
 
 
+@app.post("/analyze/fields", tags=["Analysis"])
+def analyze_fields(request: AnalyzeFieldsRequest, http_request: Request):
+    """Compute only the requested analysis fields (pay for what you use)."""
+    processor = get_processor()
+    try:
+        values = processor.analyze_fields(
+            request.message,
+            request.fields,
+            budget_ms=request.budget_ms,
+            received_at=http_request.state.received_at
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        field: value.model_dump(mode="json") if isinstance(value, BaseModel) else value
+        for field, value in values.items()
+    }
+
+
 @app.post("/batch", tags=["Analysis"])
-async def batch(messages: list[str], age_range: str = "8-10"):
+def batch(messages: list[str], age_range: str = "8-10"):
     """Analyze multiple messages."""
     if len(messages) > 100:
         raise HTTPException(status_code=400, detail="Max 100 messages per batch")
     
     processor = get_processor()
-    results = [processor.process(msg, age_range) for msg in messages]
+    results = processor.batch_process(messages, age_range)
     
     return {"count": len(results), "results": [r.model_dump() for r in results]}
 
 
+@app.get("/cache/stats", tags=["General"])
+def cache_stats():
+    """Stats per cache layer, plus predicted hit rates by size and TTL if analytics are on."""
+    processor = get_processor()
+    analytics = processor.cache_analytics
+    return {
+        "layers": processor.get_cache_stats(),
+        "analytics": analytics.get_stats() if analytics else {"enabled": False},
+    }
+
+
 @app.get("/examples", tags=["Examples"])
 async def examples():
     """Example messages for each classification."""
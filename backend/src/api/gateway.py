@@ -0,0 +1,312 @@
+"""
+Cache-affinity gateway in front of several API replicas.
+
+A round-robin balancer spreads each message over every replica, so each
+replica caches the same hot messages and the total cache is no bigger than
+one replica's. The gateway instead sends a message to the replica chosen by
+consistent hashing of its normalized text, so each replica caches its own
+slice of traffic and cache capacity grows with the number of replicas.
+
+Requests with a `child_id` are routed by the child instead: conversation
+windows live in each replica's memory, so all of a child's messages must
+reach the same replica. Their cache hits then come from that replica only.
+
+Routed: /analyze, /analyze/fields, /classify. A replica that fails
+(connection error, timeout or 5xx) is skipped for `retry_interval` seconds.
+Only a request that never reached its replica (the connection could not be
+opened) goes on to the next replica on the ring: one that timed out or
+failed may have run the pipeline already, including a paid LLM call, so it
+is answered with the error instead of being sent again.
+
+The read timeout covers a replica's worst case (an LLM call at its full
+timeout), or the request's own `budget_ms` when it has one.
+
+Replicas can join or leave at runtime through /gateway/replicas only when an
+admin token is configured (GATEWAY_ADMIN_TOKEN); callers must send it as a
+bearer token. Without one the replica set is fixed at startup.
+"""
+
+import os
+import time
+import secrets
+import logging
+import threading
+from typing import Optional, List, Dict, Any
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request, Response, Header
+
+from ..config import MODEL_CONFIG
+from ..serving import HashRing
+
+logger = logging.getLogger(__name__)
+
+ROUTED_PATHS = ("/analyze", "/analyze/fields", "/classify")
+
+
+def routing_key(message: str, child_id: Optional[str] = None) -> str:
+    """
+    Key a request is routed by: the child when given (their conversation
+    window is kept by one replica), else the message (same normalization as
+    the cache key).
+    """
+    if child_id:
+        return f"child:{child_id}"
+    return message.lower().strip()
+
+
+class Gateway:
+    """
+    Routes requests to replicas by consistent hashing, with failover.
+
+    Safe to share between concurrent requests.
+    """
+
+    # Allowance on top of a request's budget_ms for the network and the replica's own overhead
+    BUDGET_SLACK_S = 1.0
+
+    def __init__(
+        self,
+        replicas: List[str],
+        virtual_nodes: int = 100,
+        connect_timeout_s: float = 2.0,
+        read_timeout_s: float = 40.0,
+        retry_interval: float = 5.0,
+        admin_token: Optional[str] = None,
+        client: Optional[httpx.AsyncClient] = None
+    ):
+        """
+        Args:
+            replicas: Replica base URLs, e.g. http://10.0.0.5:8000
+            virtual_nodes: Ring points per replica
+            connect_timeout_s: Timeout for opening a connection to a replica
+            read_timeout_s: Timeout for a replica's response (must cover its
+                slowest path, e.g. the LLM read timeout)
+            retry_interval: Seconds a failed replica is skipped
+            admin_token: Bearer token for changing replicas over HTTP
+                (None = no runtime changes)
+            client: HTTP client to use (default: a pooled client owned by the gateway)
+        """
+        self.ring = HashRing(replicas, vnodes=virtual_nodes)
+        self.connect_timeout_s = connect_timeout_s
+        self.read_timeout_s = read_timeout_s
+        self.retry_interval = retry_interval
+        self.admin_token = admin_token
+        self._client = client
+        self._owns_client = client is None
+
+        self._lock = threading.Lock()
+        self._down_until: Dict[str, float] = {}
+        self._requests: Dict[str, int] = {}
+        self._failures: Dict[str, int] = {}
+        self._failovers = 0
+        self._unavailable = 0
+        self._errors = 0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "Gateway":
+        """
+        Create from MODEL_CONFIG["gateway"] (GATEWAY_REPLICAS overrides the
+        replicas, GATEWAY_ADMIN_TOKEN the admin token).
+        """
+        replicas = os.getenv("GATEWAY_REPLICAS")
+        return cls(
+            replicas=replicas.split(",") if replicas else config["replicas"],
+            virtual_nodes=config["virtual_nodes"],
+            connect_timeout_s=config["connect_timeout_s"],
+            read_timeout_s=config["read_timeout_s"],
+            retry_interval=config["retry_interval"],
+            admin_token=os.getenv("GATEWAY_ADMIN_TOKEN") or config["admin_token"]
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout())
+        return self._client
+
+    def timeout(self, budget_ms: Optional[float] = None) -> httpx.Timeout:
+        """
+        Per-attempt timeouts. A request with a budget is answered (degraded
+        if need be) within it, so its read timeout is the budget plus slack.
+        """
+        read = self.read_timeout_s
+        if budget_ms is not None:
+            read = min(read, budget_ms / 1000 + self.BUDGET_SLACK_S)
+        return httpx.Timeout(read, connect=self.connect_timeout_s)
+
+    async def close(self):
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def add_replica(self, replica: str):
+        """A replica joins; it takes over about 1/n of the keys."""
+        self.ring.add(replica)
+        logger.info(f"Replica joined: {replica} ({len(self.ring)} replicas)")
+
+    def remove_replica(self, replica: str):
+        """A replica leaves; only its keys move to other replicas."""
+        self.ring.remove(replica)
+        with self._lock:
+            self._down_until.pop(replica, None)
+        logger.info(f"Replica left: {replica} ({len(self.ring)} replicas)")
+
+    def _candidates(self, key: str) -> List[str]:
+        """Replicas in ring order, ones that recently failed last."""
+        replicas = self.ring.preference_list(key)
+        now = time.monotonic()
+        with self._lock:
+            up = [r for r in replicas if self._down_until.get(r, 0) <= now]
+        return up + [r for r in replicas if r not in up]
+
+    def _record(self, replica: str, failed: bool):
+        with self._lock:
+            self._requests[replica] = self._requests.get(replica, 0) + 1
+            if failed:
+                self._failures[replica] = self._failures.get(replica, 0) + 1
+                self._down_until[replica] = time.monotonic() + self.retry_interval
+            else:
+                self._down_until.pop(replica, None)
+
+    async def forward(
+        self,
+        path: str,
+        body: bytes,
+        message: str,
+        headers: Dict[str, str],
+        budget_ms: Optional[float] = None,
+        child_id: Optional[str] = None
+    ) -> Response:
+        """
+        Send a request to the message's replica, failing over along the ring
+        while replicas refuse connections.
+
+        Raises:
+            HTTPException(503): No replica could be reached
+            HTTPException(504): The replica did not answer in time
+            HTTPException(502): The request failed after reaching the replica
+        """
+        timeout = self.timeout(budget_ms)
+        for attempt, replica in enumerate(self._candidates(routing_key(message, child_id))):
+            try:
+                upstream = await self.client.post(
+                    replica.rstrip("/") + path, content=body, headers=headers, timeout=timeout
+                )
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                # Never reached the replica: safe to send elsewhere
+                logger.warning(f"Replica {replica} unreachable: {e!r}")
+                self._record(replica, failed=True)
+                continue
+            except httpx.HTTPError as e:
+                logger.warning(f"Replica {replica} failed: {e!r}")
+                self._record(replica, failed=True)
+                with self._lock:
+                    self._errors += 1
+                timed_out = isinstance(e, httpx.TimeoutException)
+                raise HTTPException(
+                    status_code=504 if timed_out else 502,
+                    detail="Replica timed out" if timed_out else "Replica failed"
+                )
+
+            self._record(replica, failed=upstream.status_code >= 500)
+            if attempt:
+                with self._lock:
+                    self._failovers += 1
+            return Response(
+                content=upstream.content,
+                status_code=upstream.status_code,
+                media_type=upstream.headers.get("content-type"),
+                headers={"X-Replica": replica}
+            )
+
+        with self._lock:
+            self._unavailable += 1
+        raise HTTPException(status_code=503, detail="No replica available")
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "replicas": {
+                    replica: {
+                        "requests": self._requests.get(replica, 0),
+                        "failures": self._failures.get(replica, 0),
+                        "available": self._down_until.get(replica, 0) <= now,
+                    }
+                    for replica in self.ring.nodes
+                },
+                "virtual_nodes": self.ring.vnodes,
+                "failovers": self._failovers,
+                "unavailable": self._unavailable,
+                "errors": self._errors,
+            }
+
+
+def create_gateway_app(gateway: Optional[Gateway] = None) -> FastAPI:
+    """
+    Create the gateway application.
+
+    Args:
+        gateway: Gateway to use (default: from MODEL_CONFIG["gateway"])
+    """
+    gateway = gateway or Gateway.from_config(MODEL_CONFIG["gateway"])
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        logger.info(f"Gateway routing to {len(gateway.ring)} replicas")
+        yield
+        await gateway.close()
+
+    app = FastAPI(title="Kid Message Safety Gateway", lifespan=lifespan)
+    app.state.gateway = gateway
+
+    async def route(request: Request) -> Response:
+        body = await request.body()
+        try:
+            payload = await request.json()
+            message = payload["message"]
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=422, detail="Request body needs a message")
+        if not isinstance(message, str):
+            raise HTTPException(status_code=422, detail="message must be a string")
+        budget_ms, child_id = payload.get("budget_ms"), payload.get("child_id")
+        return await gateway.forward(
+            request.url.path, body, message, {"content-type": "application/json"},
+            budget_ms=budget_ms if isinstance(budget_ms, (int, float)) else None,
+            child_id=child_id if isinstance(child_id, str) else None
+        )
+
+    for path in ROUTED_PATHS:
+        app.add_api_route(path, route, methods=["POST"], tags=["Routing"])
+
+    @app.get("/health", tags=["General"])
+    async def health():
+        return {"status": "healthy", "ready": len(gateway.ring) > 0}
+
+    @app.get("/gateway/stats", tags=["General"])
+    async def stats():
+        return gateway.get_stats()
+
+    if not gateway.admin_token:
+        return app
+
+    def require_admin(authorization: Optional[str]):
+        expected = f"Bearer {gateway.admin_token}"
+        if authorization is None or not secrets.compare_digest(authorization.encode(), expected.encode()):
+            raise HTTPException(status_code=401, detail="Admin token required")
+
+    @app.post("/gateway/replicas", tags=["Settings"])
+    async def add_replica(url: str, authorization: Optional[str] = Header(None)):
+        require_admin(authorization)
+        gateway.add_replica(url)
+        return {"replicas": gateway.ring.nodes}
+
+    @app.delete("/gateway/replicas", tags=["Settings"])
+    async def remove_replica(url: str, authorization: Optional[str] = Header(None)):
+        require_admin(authorization)
+        gateway.remove_replica(url)
+        return {"replicas": gateway.ring.nodes}
+
+    return app
@@ -1,4 +1,17 @@
 """Caching Module"""
-from .response_cache import ResponseCache
-__all__ = ["ResponseCache"]
-
+from .response_cache import ResponseCache, cache_key
+from .cached_response import CachedResponse
+from .sqlite_cache import SQLiteResponseCache
+from .tinylfu_cache import TinyLFUCache, CountMinSketch
+from .sharded_cache import ShardedResponseCache
+from .feedback_cache import FeedbackCache, LLMFeedbackCache
+from .green_set import GreenFingerprintSet
+from .remote_cache import InMemoryL2, RedisL2
+from .tiered_cache import TieredCache
+from .factory import create_cache
+from .analytics import CacheAnalytics
+__all__ = [
+    "ResponseCache", "CachedResponse", "SQLiteResponseCache", "TinyLFUCache", "CountMinSketch",
+    "FeedbackCache", "GreenFingerprintSet", "InMemoryL2", "RedisL2", "TieredCache", "create_cache", "cache_key",
+    "CacheAnalytics", "ShardedResponseCache", "LLMFeedbackCache",
+]
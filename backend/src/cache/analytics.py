@@ -0,0 +1,207 @@
+"""
+Cache sizing analytics.
+
+Hit/miss counters say how the cache does at its current size, not whether a
+bigger one (or a longer TTL) would help. CacheAnalytics measures the reuse
+distance of lookups: the number of distinct other keys requested since the
+same key was last requested. An LRU cache of N entries hits exactly the
+lookups with a reuse distance below N, so one histogram predicts the hit
+rate at every size. Recording the time since the last request as well
+gives the effect of the TTL.
+
+Keys are sampled by hash (a sampled key is tracked on every request), and
+distances are scaled by the sampling rate, so the overhead is a fraction of
+the sample rate per lookup.
+"""
+
+import time
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Sequence
+
+# Sampling is decided on the last 32 bits of the (md5 hex) cache key
+_HASH_SPACE = 1 << 32
+
+
+class _Fenwick:
+    """Prefix sums over access slots (1 = the latest access of some key)."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._tree = [0] * (size + 1)
+
+    def add(self, index: int, delta: int):
+        while index <= self.size:
+            self._tree[index] += delta
+            index += index & -index
+
+    def prefix(self, index: int) -> int:
+        total = 0
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+
+class CacheAnalytics:
+    """
+    Sampled reuse-distance histogram with predicted hit rates per size and TTL.
+
+    Thread-safe.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = 0.01,
+        max_tracked: int = 100_000,
+        sizes: Sequence[int] = (100, 1000, 10_000, 50_000, 100_000),
+        ttls: Sequence[float] = (60, 300, 900, 3600, 86_400)
+    ):
+        """
+        Args:
+            sample_rate: Share of keys tracked (0-1]
+            max_tracked: Sampled keys remembered; older ones count as new
+            sizes: Cache sizes (entries) to predict hit rates for
+            ttls: TTLs (seconds) to predict hit rates for
+        """
+        self.sample_rate = sample_rate
+        self.max_tracked = max_tracked
+        self.sizes = sorted(sizes)
+        self.ttls = sorted(ttls)
+        self._threshold = int(sample_rate * _HASH_SPACE)
+
+        self._lock = threading.Lock()
+        self._reset()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "CacheAnalytics":
+        """Create from MODEL_CONFIG["cache_analytics"]."""
+        return cls(
+            sample_rate=config["sample_rate"],
+            max_tracked=config["max_tracked"],
+            sizes=config["sizes"],
+            ttls=config["ttls"]
+        )
+
+    def _reset(self):
+        self._slots = _Fenwick(2 * self.max_tracked)
+        self._clock = 0
+        self._last: OrderedDict = OrderedDict()  # key -> slot of its latest access, oldest first
+        self._seen: Dict[str, float] = {}  # key -> time of its latest access
+        # reuses[i][j]: reuses needing a cache of sizes[i] and a TTL of ttls[j]
+        # (index len(...) = beyond the largest)
+        self._reuses = [[0] * (len(self.ttls) + 1) for _ in range(len(self.sizes) + 1)]
+        self._sampled = 0
+
+    def sampled(self, key: str) -> bool:
+        """Whether a key (md5 hex cache key, possibly namespaced) is tracked."""
+        return int(key[-8:], 16) < self._threshold
+
+    def record(self, key: str, now: Optional[float] = None):
+        """Record a cache lookup (hit or miss) for `key`."""
+        if not self.sampled(key):
+            return
+        now = time.time() if now is None else now
+
+        with self._lock:
+            self._sampled += 1
+            slot = self._last.get(key)
+            if slot is not None:
+                # Distinct keys accessed after this key's previous access
+                distance = (self._slots.prefix(self._clock) - self._slots.prefix(slot)) / self.sample_rate
+                age = now - self._seen[key]
+                self._reuses[bisect_right(self.sizes, distance)][self._ttl_index(age)] += 1
+                self._slots.add(slot, -1)
+            elif len(self._last) >= self.max_tracked:
+                self._forget_oldest()
+
+            if self._clock == self._slots.size:
+                self._compact()
+            self._clock += 1
+            self._slots.add(self._clock, 1)
+            self._last[key] = self._clock
+            self._last.move_to_end(key)
+            self._seen[key] = now
+
+    def _ttl_index(self, age: float) -> int:
+        for i, ttl in enumerate(self.ttls):
+            if age <= ttl:
+                return i
+        return len(self.ttls)
+
+    def _forget_oldest(self):
+        key, slot = self._last.popitem(last=False)
+        self._slots.add(slot, -1)
+        del self._seen[key]
+
+    def _compact(self):
+        """Renumber slots 1..n in access order once the slot space is used up."""
+        self._slots = _Fenwick(self._slots.size)
+        for slot, key in enumerate(self._last, 1):
+            self._last[key] = slot
+            self._slots.add(slot, 1)
+        self._clock = len(self._last)
+
+    def predicted_hit_rates(self) -> Dict[str, Dict[str, float]]:
+        """
+        Predicted LRU hit rate (%) per cache size and TTL.
+
+        Returns:
+            {str(size): {str(ttl): hit rate}}
+        """
+        with self._lock:
+            reuses = [row[:] for row in self._reuses]
+            sampled = self._sampled
+
+        curve = {}
+        for i, size in enumerate(self.sizes):
+            curve[str(size)] = {
+                str(ttl): round(
+                    sum(reuses[a][b] for a in range(i + 1) for b in range(j + 1)) / sampled * 100, 2
+                ) if sampled else 0.0
+                for j, ttl in enumerate(self.ttls)
+            }
+        return curve
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sampled = self._sampled
+            reused = sum(map(sum, self._reuses))
+            histogram = {
+                f"<{size}": sum(self._reuses[i]) for i, size in enumerate(self.sizes)
+            }
+            histogram[f">={self.sizes[-1]}"] = sum(self._reuses[-1])
+            tracked = len(self._last)
+
+        return {
+            "enabled": True,
+            "sample_rate": self.sample_rate,
+            "sampled_lookups": sampled,
+            "tracked_keys": tracked,
+            # Reuses by (scaled) reuse distance; the rest of the lookups were first seen
+            "reuse_distance_histogram": histogram,
+            "first_seen": sampled - reused,
+            "predicted_hit_rate_percent": self.predicted_hit_rates(),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+
+def format_report(stats: Dict[str, Any]) -> List[str]:
+    """Text table of predicted hit rates (sizes down, TTLs across)."""
+    curve = stats["predicted_hit_rate_percent"]
+    if not curve:
+        return ["No cache sizes configured"]
+    ttls = list(next(iter(curve.values())))
+    lines = [
+        f"Sampled lookups: {stats['sampled_lookups']} "
+        f"(sample rate {stats['sample_rate']}, {stats['first_seen']} first seen)",
+        "Predicted LRU hit rate (%) by cache size (rows) and TTL in seconds (columns):",
+        "  " + "size".rjust(8) + "".join(" " + ttl.rjust(8) for ttl in ttls),
+    ]
+    for size, row in curve.items():
+        lines.append("  " + size.rjust(8) + "".join(f"{row[ttl]:9.2f}" for ttl in ttls))
+    return lines
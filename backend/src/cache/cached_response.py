@@ -0,0 +1,83 @@
+"""
+Pre-serialized cache entries.
+
+A cached ProcessingResult is stored as JSON bytes with the per-hit metadata
+fields (processing time, timestamp, cache_hit) left out. A hit splices those
+fields back in, so serving it needs no pydantic validation or serialization.
+"""
+
+import json
+import struct
+from datetime import datetime
+from typing import Any
+
+from ..models import ProcessingResult
+
+# Metadata fields that differ on every hit
+DYNAMIC_METADATA = {"processing_time_ms", "timestamp", "cache_hit"}
+
+_HEAD_LENGTH = struct.Struct("!I")
+
+# Value encodings for out-of-process caches (first byte of the blob)
+_RESPONSE = b"R"
+_JSON = b"J"
+
+
+class CachedResponse:
+    """
+    Immutable, pre-serialized ProcessingResult.
+
+    `head` is the result JSON without metadata and without its closing brace;
+    `meta` is the static metadata fields without braces. Safe to share
+    between threads.
+    """
+
+    __slots__ = ("head", "meta")
+
+    def __init__(self, head: bytes, meta: bytes):
+        self.head = head
+        self.meta = meta
+
+    @classmethod
+    def from_result(cls, result: ProcessingResult) -> "CachedResponse":
+        head = result.model_dump_json(exclude={"metadata"}).encode()
+        meta = result.metadata.model_dump_json(exclude=DYNAMIC_METADATA).encode()
+        return cls(head[:-1], meta[1:-1])
+
+    def render(self, processing_time_ms: float, timestamp: datetime) -> bytes:
+        """Full response JSON for one hit."""
+        dynamic = (
+            f'"processing_time_ms":{processing_time_ms:.3f},'
+            f'"timestamp":"{timestamp.isoformat()}","cache_hit":true'
+        ).encode()
+        separator = b"," if self.meta else b""
+        return b"".join((self.head, b',"metadata":{', self.meta, separator, dynamic, b"}}"))
+
+    def to_result(self, processing_time_ms: float, timestamp: datetime) -> ProcessingResult:
+        """Rebuild a ProcessingResult (for Python callers of the pipeline)."""
+        return ProcessingResult.model_validate_json(self.render(processing_time_ms, timestamp))
+
+    def to_bytes(self) -> bytes:
+        return _HEAD_LENGTH.pack(len(self.head)) + self.head + self.meta
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CachedResponse":
+        (length,) = _HEAD_LENGTH.unpack_from(data)
+        start = _HEAD_LENGTH.size
+        return cls(bytes(data[start:start + length]), bytes(data[start + length:]))
+
+    def __len__(self) -> int:
+        return len(self.head) + len(self.meta)
+
+
+def encode_value(value: Any) -> bytes:
+    """Serialize a cache value (CachedResponse or JSON data) for shared storage."""
+    if isinstance(value, CachedResponse):
+        return _RESPONSE + value.to_bytes()
+    return _JSON + json.dumps(value).encode()
+
+
+def decode_value(blob: bytes) -> Any:
+    if blob[:1] == _RESPONSE:
+        return CachedResponse.from_bytes(blob[1:])
+    return json.loads(blob[1:])
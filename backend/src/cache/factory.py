@@ -0,0 +1,84 @@
+"""
+Cache backend selection.
+"""
+
+import os
+import logging
+from typing import Any, Dict, Optional
+
+from .response_cache import ResponseCache
+from .sqlite_cache import SQLiteResponseCache
+from .tinylfu_cache import TinyLFUCache
+from .sharded_cache import ShardedResponseCache
+from .remote_cache import InMemoryL2, RedisL2
+from .tiered_cache import TieredCache
+
+logger = logging.getLogger(__name__)
+
+
+def create_cache(config: Dict[str, Any], max_size: Optional[int] = None):
+    """
+    Create the response cache configured in MODEL_CONFIG["cache"].
+    
+    Args:
+        config: Cache config ("backend": "tinylfu", "memory", "sharded" or "sqlite";
+            optional "l2" section for a second tier)
+        max_size: Override for config["max_size"]. The tinylfu backend is
+            sized in bytes and only caps the entry count if this is given.
+    
+    CACHE_BACKEND / CACHE_PATH / CACHE_L2 / CACHE_L2_URL environment
+    variables override the config.
+    """
+    backend = os.getenv("CACHE_BACKEND", config.get("backend", "memory"))
+    path = os.getenv("CACHE_PATH", config.get("path"))
+    
+    if backend == "tinylfu":
+        cache = TinyLFUCache(
+            max_bytes=config["max_bytes"],
+            max_size=max_size,
+            ttl_seconds=config["ttl_seconds"],
+            sweep_interval=config.get("sweep_interval", 60)
+        )
+    elif backend == "memory":
+        cache = ResponseCache(max_size=max_size or config["max_size"], ttl_seconds=config["ttl_seconds"])
+    elif backend == "sharded":
+        cache = ShardedResponseCache(
+            max_size=max_size or config["max_size"],
+            ttl_seconds=config["ttl_seconds"],
+            shards=config.get("shards", 16)
+        )
+    elif backend == "sqlite":
+        cache = SQLiteResponseCache(
+            path, max_size=max_size or config["max_size"], ttl_seconds=config["ttl_seconds"]
+        )
+    else:
+        raise ValueError(f"Unknown cache backend '{backend}'")
+    
+    l2 = _create_l2(config.get("l2", {}))
+    if l2 is None:
+        return cache
+    return TieredCache(
+        cache, l2,
+        ttl_seconds=config["ttl_seconds"],
+        retry_interval=config.get("l2", {}).get("retry_interval", 5)
+    )
+
+
+def _create_l2(config: Dict[str, Any]):
+    """Second-tier store, or None for an L1-only cache."""
+    backend = os.getenv("CACHE_L2", config.get("backend")) or None
+    if backend is None:
+        return None
+    if backend == "memory":
+        return InMemoryL2(max_size=config.get("max_size", 10000))
+    if backend == "redis":
+        try:
+            return RedisL2(
+                os.getenv("CACHE_L2_URL", config.get("url", "redis://localhost:6379/0")),
+                prefix=config.get("prefix", "kid-safety:"),
+                timeout_ms=config.get("timeout_ms", 50)
+            )
+        except ImportError as e:
+            logger.warning(f"{e}; running without an L2 cache")
+            return None
+    raise ValueError(f"Unknown L2 cache backend '{backend}'")
@@ -0,0 +1,205 @@
+"""
+Feedback Cache
+
+Template feedback depends only on a small signature of the message
+(classification, primary issue, emotion, age range, detected topic), not on
+its wording. Caching by that signature lets differently worded messages
+share one feedback entry.
+
+LLM feedback is cached the same way (by the signature that drives the
+prompt) but keeps a few variants per signature, so children sending
+similar messages don't all read identical text.
+"""
+
+import time
+import random
+import logging
+from typing import Optional, Dict, Any, Hashable, List, Tuple
+from collections import OrderedDict
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+
+class FeedbackCache:
+    """
+    LRU cache of feedback keyed by a signature tuple.
+
+    Entries are shared between requests and must be treated as read-only.
+    Thread-safe.
+    """
+
+    def __init__(self, max_size: int = 500):
+        """
+        Args:
+            max_size: Maximum number of cached signatures
+        """
+        self.max_size = max_size
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, signature: Hashable) -> Optional[Any]:
+        """Get the entry for a signature, or None."""
+        with self._lock:
+            entry = self._cache.get(signature)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._cache.move_to_end(signature)
+            self._hits += 1
+            return entry
+
+    def set(self, signature: Hashable, entry: Any):
+        """Cache an entry for a signature."""
+        with self._lock:
+            if signature not in self._cache and len(self._cache) >= self.max_size:
+                self._cache.popitem(last=False)
+            self._cache[signature] = entry
+            self._cache.move_to_end(signature)
+
+    def clear(self):
+        """Clear all cached entries."""
+        with self._lock:
+            self._cache.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "enabled": True,
+                "size": len(self._cache),
+                "max_size": self.max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate_percent": round(self._hits / total * 100, 2) if total else 0,
+            }
+
+
+class LLMFeedbackCache:
+    """
+    LRU cache of LLM feedback variants keyed by a prompt signature.
+
+    A signature is served from the cache once it holds `variants` LLM
+    samples; until then callers should ask the LLM and add() the result.
+    Variants expire individually after `ttl_seconds`, after which the
+    signature is refilled. Variants are shared and must be treated as
+    read-only. Thread-safe.
+    """
+
+    def __init__(self, max_size: int = 1000, variants: int = 3, ttl_seconds: float = 24 * 3600):
+        """
+        Args:
+            max_size: Maximum number of cached signatures
+            variants: Variants collected per signature before it is served
+            ttl_seconds: Lifetime of each variant
+        """
+        self.max_size = max_size
+        self.variants = variants
+        self.ttl = ttl_seconds
+        # signature -> [(created, variant), ...]
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+        self._rejected = 0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "LLMFeedbackCache":
+        """Create from MODEL_CONFIG["llm_feedback_cache"]."""
+        return cls(
+            max_size=config["max_size"],
+            variants=config["variants"],
+            ttl_seconds=config["ttl_seconds"]
+        )
+
+    def _live(self, signature: Hashable) -> List[Tuple[float, Any]]:
+        """Unexpired variants of a signature (expired ones are dropped)."""
+        entries = self._cache.get(signature)
+        if not entries:
+            return []
+        cutoff = time.time() - self.ttl
+        live = [(created, variant) for created, variant in entries if created > cutoff]
+        if len(live) < len(entries):
+            if live:
+                self._cache[signature] = live
+            else:
+                del self._cache[signature]
+        return live
+
+    def get(self, signature: Hashable, partial: bool = False) -> List[Any]:
+        """
+        Variants for a signature in random order, or [] if it still needs
+        more variants (counted as a miss).
+
+        Args:
+            signature: Prompt signature
+            partial: Return the variants collected so far, even if fewer than `variants`
+        """
+        with self._lock:
+            live = self._live(signature)
+            if not live or (len(live) < self.variants and not partial):
+                self._misses += 1
+                return []
+            self._cache.move_to_end(signature)
+            self._hits += 1
+        variants = [variant for _, variant in live]
+        random.shuffle(variants)
+        return variants
+
+    def needs_variants(self, signature: Hashable) -> bool:
+        """Whether a signature has fewer than `variants` live variants."""
+        with self._lock:
+            return len(self._live(signature)) < self.variants
+
+    def reject(self):
+        """Count a hit whose variants all failed the caller's checks."""
+        with self._lock:
+            self._hits -= 1
+            self._misses += 1
+            self._rejected += 1
+
+    def add(self, signature: Hashable, variant: Any) -> bool:
+        """
+        Add a variant to a signature.
+
+        Returns:
+            False if the signature already has all its variants
+        """
+        with self._lock:
+            live = self._live(signature)
+            if len(live) >= self.variants:
+                return False
+            if signature not in self._cache and len(self._cache) >= self.max_size:
+                self._cache.popitem(last=False)
+            self._cache[signature] = live + [(time.time(), variant)]
+            self._cache.move_to_end(signature)
+            return True
+
+    def clear(self):
+        """Clear all cached variants."""
+        with self._lock:
+            self._cache.clear()
+            self._hits = 0
+            self._misses = 0
+            self._rejected = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "enabled": True,
+                "size": len(self._cache),
+                "max_size": self.max_size,
+                "variants": self.variants,
+                "ttl_seconds": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "rejected": self._rejected,
+                "hit_rate_percent": round(self._hits / total * 100, 2) if total else 0,
+            }
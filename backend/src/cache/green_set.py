@@ -0,0 +1,200 @@
+"""
+Known-GREEN fingerprint set.
+
+Much of the traffic is short, harmless and repeated ("hello!", "gg", "lol").
+Instead of a full cached result per message, this keeps a 64-bit
+fingerprint of each normalized message that was classified GREEN with high
+confidence: ~9 bytes per message (8-byte sorted array entry plus Bloom
+filter bits), so a million messages take about 9 MB.
+
+Fingerprints are 64 bits so that a false match (which would let a harmful
+message through as GREEN) is practically impossible; the Bloom filter only
+speeds up the common "not in the set" answer.
+"""
+
+import os
+import struct
+import hashlib
+import logging
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Dict, Any, Set
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"KSGS1"
+_HEADER = struct.Struct("!IQI")  # version length, fingerprint count, bloom bytes
+_BLOOM_HASHES = 4
+
+
+def normalize(message: str) -> str:
+    """Normalization used for fingerprints (case and whitespace insensitive)."""
+    return " ".join(message.lower().split())
+
+
+def fingerprint(message: str) -> int:
+    """64-bit fingerprint of a normalized message."""
+    digest = hashlib.blake2b(normalize(message).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class GreenFingerprintSet:
+    """
+    Set of 64-bit message fingerprints: sorted array('Q') + Bloom filter.
+
+    New fingerprints go to a small pending set and are merged into the
+    sorted array in bulk. The set is tied to a version string (models and
+    rules); switching version empties it. Thread-safe.
+    """
+
+    def __init__(self, capacity: int = 1_000_000, bits_per_entry: int = 10, version: str = ""):
+        """
+        Args:
+            capacity: Entries the Bloom filter is sized for (more still work,
+                with more Bloom false positives)
+            bits_per_entry: Bloom filter bits per entry
+            version: Model/rule version the fingerprints are valid for
+        """
+        self.capacity = capacity
+        self.version = version
+        self._bloom_bits = max(64, capacity * bits_per_entry)
+        self._bloom = bytearray(self._bloom_bits // 8 + 1)
+        self._sorted = array("Q")
+        self._pending: Set[int] = set()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _bloom_positions(self, fp: int):
+        # Double hashing over the two 32-bit halves
+        h1, h2 = fp >> 32, (fp & 0xFFFFFFFF) | 1
+        return [(h1 + i * h2) % self._bloom_bits for i in range(_BLOOM_HASHES)]
+
+    def _in_bloom(self, fp: int) -> bool:
+        bloom = self._bloom
+        return all(bloom[p >> 3] & (1 << (p & 7)) for p in self._bloom_positions(fp))
+
+    def __contains__(self, message: str) -> bool:
+        fp = fingerprint(message)
+        found = self._in_bloom(fp)
+        if found:
+            with self._lock:
+                found = fp in self._pending
+                if not found:
+                    i = bisect_left(self._sorted, fp)
+                    found = i < len(self._sorted) and self._sorted[i] == fp
+        # Counters are approximate under concurrency (no lock on the fast path)
+        if found:
+            self._hits += 1
+        else:
+            self._misses += 1
+        return found
+
+    def add(self, message: str):
+        """Record a message as known GREEN."""
+        fp = fingerprint(message)
+        with self._lock:
+            if self._in_bloom(fp) and (fp in self._pending or self._contains_sorted(fp)):
+                return
+            for p in self._bloom_positions(fp):
+                self._bloom[p >> 3] |= 1 << (p & 7)
+            self._pending.add(fp)
+            if len(self._pending) >= max(4096, len(self._sorted) // 8):
+                self._merge()
+
+    def _contains_sorted(self, fp: int) -> bool:
+        i = bisect_left(self._sorted, fp)
+        return i < len(self._sorted) and self._sorted[i] == fp
+
+    def _merge(self):
+        """Fold pending fingerprints into the sorted array. Caller holds the lock."""
+        if self._pending:
+            self._sorted = array("Q", sorted(self._sorted.tolist() + list(self._pending)))
+            self._pending = set()
+
+    def set_version(self, version: str):
+        """Switch to a new model/rule version; fingerprints of the old one are dropped."""
+        with self._lock:
+            if version != self.version:
+                logger.info("Known-GREEN set invalidated by version change")
+                self.version = version
+                self._clear()
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._bloom = bytearray(len(self._bloom))
+        self._sorted = array("Q")
+        self._pending = set()
+        self._hits = 0
+        self._misses = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sorted) + len(self._pending)
+
+    def save(self, path: str):
+        """Write the set to disk (atomically replacing `path`)."""
+        with self._lock:
+            self._merge()
+            version = self.version.encode()
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(_MAGIC)
+                f.write(_HEADER.pack(len(version), len(self._sorted), len(self._bloom)))
+                f.write(version)
+                f.write(self._bloom)
+                f.write(self._sorted.tobytes())  # Native byte order
+            os.replace(tmp, path)
+
+    def load(self, path: str) -> bool:
+        """
+        Load a saved set if it exists and matches the current version.
+
+        Returns:
+            True if loaded; False if missing, unreadable or for another version
+        """
+        try:
+            with open(path, "rb") as f:
+                if f.read(len(_MAGIC)) != _MAGIC:
+                    raise ValueError("not a known-GREEN set file")
+                version_len, count, bloom_len = _HEADER.unpack(f.read(_HEADER.size))
+                version = f.read(version_len).decode()
+                if version != self.version:
+                    logger.info(f"Ignoring known-GREEN set {path}: saved for another version")
+                    return False
+                bloom = bytearray(f.read(bloom_len))
+                fingerprints = array("Q")
+                fingerprints.frombytes(f.read(count * 8))
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning(f"Could not load known-GREEN set {path}: {e}")
+            return False
+
+        if len(fingerprints) != count or bloom_len != len(self._bloom):
+            logger.warning(f"Ignoring known-GREEN set {path}: truncated or sized differently")
+            return False
+        with self._lock:
+            self._bloom = bloom
+            self._sorted = fingerprints
+            self._pending = set()
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._sorted) + len(self._pending)
+            memory = len(self._bloom) + self._sorted.itemsize * len(self._sorted) + 8 * len(self._pending)
+        total = self._hits + self._misses
+        return {
+            "enabled": True,
+            "size": size,
+            "capacity": self.capacity,
+            "memory_bytes": memory,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate_percent": round(self._hits / total * 100, 2) if total else 0,
+        }
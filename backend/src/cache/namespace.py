@@ -0,0 +1,32 @@
+"""
+Cache version namespaces.
+
+Cached results are only valid for the models, rules and feedback mode that
+produced them. The namespace is a short hash of all three; when any of
+them changes, the caches switch to a new namespace (see VersionNamespace).
+"""
+
+import sys
+import json
+import hashlib
+from typing import Dict, Iterable
+
+
+def rules_version(classes: Iterable[type]) -> str:
+    """
+    Version of the rule packs: a hash of the source files defining `classes`.
+
+    Keyword lists, patterns and decision rules live in module and class
+    constants (and some in method bodies), so the whole source is hashed.
+    """
+    digest = hashlib.sha1()
+    for path in sorted({sys.modules[cls.__module__].__file__ for cls in classes}):
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def cache_namespace(model_versions: Dict[str, str], feedback_mode: str) -> str:
+    """Namespace for results produced with these versions and feedback mode."""
+    content = json.dumps({"versions": model_versions, "feedback_mode": feedback_mode}, sort_keys=True)
+    return hashlib.sha1(content.encode()).hexdigest()[:12]
@@ -0,0 +1,136 @@
+"""
+Second-tier (L2) cache stores.
+
+An L2 store maps string keys to opaque bytes with a TTL and works on
+batches, so a whole /batch request costs one round trip each way.
+RedisL2 shares entries across nodes; InMemoryL2 is an in-process stand-in
+for tests and single-node deployments.
+"""
+
+import time
+import logging
+import threading
+from typing import Optional, Dict, Any, List, Tuple
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit
+
+try:
+    import redis
+    HAS_REDIS = True
+except ImportError:
+    HAS_REDIS = False
+
+logger = logging.getLogger(__name__)
+
+
+def redact_url(url: str) -> str:
+    """A server URL without its credentials (userinfo or query options), safe to show in stats."""
+    parts = urlsplit(url)
+    if parts.username is None and parts.password is None and not parts.query:
+        return url
+    host = parts.hostname or ""
+    if parts.port is not None:
+        host = f"{host}:{parts.port}"
+    return urlunsplit((parts.scheme, host, parts.path, "", ""))
+
+
+class InMemoryL2:
+    """
+    In-process L2 store with the same interface as RedisL2.
+
+    Bounded (LRU) with per-entry TTL. Thread-safe.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_size: int = 10000):
+        """
+        Args:
+            max_size: Maximum number of stored entries
+        """
+        self.max_size = max_size
+        self._store: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        now = time.time()
+        values = []
+        with self._lock:
+            for key in keys:
+                item = self._store.get(key)
+                if item is None or item[1] <= now:
+                    values.append(None)
+                    continue
+                self._store.move_to_end(key)
+                values.append(item[0])
+        return values
+
+    def set_many(self, items: List[Tuple[str, bytes]], ttl_seconds: int):
+        expires = time.time() + ttl_seconds
+        with self._lock:
+            for key, value in items:
+                self._store[key] = (value, expires)
+                self._store.move_to_end(key)
+            while len(self._store) > self.max_size:
+                self._store.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._store.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"backend": self.name, "size": len(self._store), "max_size": self.max_size}
+
+
+class RedisL2:
+    """
+    L2 store on a Redis server (anything speaking the Redis protocol).
+
+    Batch gets are one MGET; batch sets are one pipelined round of SET EX.
+    Keys are namespaced with `prefix` so the server can be shared.
+    Requires the `redis` package.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "kid-safety:", timeout_ms: float = 50):
+        """
+        Args:
+            url: Server URL, e.g. redis://localhost:6379/0
+            prefix: Namespace for this service's keys
+            timeout_ms: Connect and per-command socket timeout
+        """
+        if not HAS_REDIS:
+            raise ImportError("The redis package is required for the Redis L2 cache")
+        self.url = url
+        self.prefix = prefix
+        # redis-py pools reconnect per process, so this is fork-safe
+        self._client = redis.Redis.from_url(
+            url,
+            socket_timeout=timeout_ms / 1000,
+            socket_connect_timeout=timeout_ms / 1000
+        )
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        return self._client.mget([self.prefix + key for key in keys])
+
+    def set_many(self, items: List[Tuple[str, bytes]], ttl_seconds: int):
+        if not items:
+            return
+        pipe = self._client.pipeline(transaction=False)
+        for key, value in items:
+            pipe.set(self.prefix + key, value, ex=int(ttl_seconds))
+        pipe.execute()
+
+    def clear(self):
+        """Delete this service's keys (not the whole database)."""
+        keys = list(self._client.scan_iter(match=self.prefix + "*", count=1000))
+        for start in range(0, len(keys), 1000):
+            self._client.delete(*keys[start:start + 1000])
+
+    def get_stats(self) -> Dict[str, Any]:
+        # The URL usually carries the password, and stats are served unauthenticated
+        return {"backend": self.name, "url": redact_url(self.url), "prefix": self.prefix}
@@ -7,14 +7,113 @@ Caches analysis results for repeated messages to reduce latency.
 import hashlib
 import time
 import logging
-from typing import Optional, Dict, Any
+import weakref
+import threading
+from typing import Optional, Dict, Any, List, Tuple
 from collections import OrderedDict
 from threading import Lock
 
 logger = logging.getLogger(__name__)
 
 
-class ResponseCache:
+def cache_key(message: str, age_range: str = "8-10", namespace: str = "") -> str:
+    """
+    Cache key for a message and parameters (shared by all cache backends).
+    
+    Keys in a namespace (see VersionNamespace) are prefixed with it.
+    """
+    content = f"{message.lower().strip()}:{age_range}"
+    digest = hashlib.md5(content.encode()).hexdigest()
+    return f"{namespace}:{digest}" if namespace else digest
+
+
+def key_namespace(key: str) -> str:
+    """Namespace part of a cache key ("" for keys without one)."""
+    return key.rpartition(":")[0]
+
+
+def _evict_stale_loop(cache_ref):
+    """Background eviction after a namespace switch; holds only a weak reference."""
+    cache = cache_ref()
+    if cache is not None:
+        removed = cache.evict_stale()
+        logger.info(f"Evicted {removed} cache entries from old namespaces")
+
+
+class BatchOperations:
+    """
+    get_many/set_many for caches without a native batch API.
+    
+    Backends with a remote store override these to use one round trip.
+    """
+    
+    def get_many(self, messages: List[str], age_range: str = "8-10") -> List[Optional[Any]]:
+        """Look up several messages; None for each miss."""
+        return [self.get(message, age_range) for message in messages]
+    
+    def set_many(self, items: List[Tuple[str, Any]], age_range: str = "8-10"):
+        """Cache several (message, result) pairs."""
+        for message, result in items:
+            self.set(message, result, age_range)
+
+
+class VersionNamespace:
+    """
+    Cache keys scoped to a version namespace (models, rules, feedback mode).
+    
+    set_namespace() takes effect at once: entries from other namespaces are
+    no longer found. They are removed by a background thread in small
+    batches, so the cache stays available meanwhile (no stop-the-world
+    clear). Backends provide _snapshot_keys() and _discard(keys).
+    """
+    
+    namespace = ""
+    _stale_evicted = 0
+    
+    # Entries removed per lock acquisition by evict_stale()
+    EVICTION_BATCH = 256
+    
+    def _make_key(self, message: str, age_range: str = "8-10") -> str:
+        """Create cache key from message and parameters."""
+        return cache_key(message, age_range, self.namespace)
+    
+    def set_namespace(self, namespace: str, background: bool = True):
+        """
+        Switch to a namespace and evict entries from other namespaces.
+        
+        Args:
+            namespace: New namespace
+            background: Evict in a background thread (False: before returning)
+        """
+        if namespace == self.namespace:
+            return
+        logger.info(f"Cache namespace switched to {namespace or '(none)'}")
+        self.namespace = namespace
+        if not background:
+            self.evict_stale()
+            return
+        threading.Thread(
+            target=_evict_stale_loop,
+            args=(weakref.ref(self),),
+            name="cache-namespace-eviction",
+            daemon=True
+        ).start()
+    
+    def evict_stale(self) -> int:
+        """Remove entries from other namespaces. Returns how many were removed."""
+        stale = [key for key in self._snapshot_keys() if key_namespace(key) != self.namespace]
+        removed = 0
+        for start in range(0, len(stale), self.EVICTION_BATCH):
+            removed += self._discard(stale[start:start + self.EVICTION_BATCH])
+            time.sleep(0)  # Let request threads take the lock between batches
+        self._stale_evicted += removed
+        return removed
+    
+    def _namespace_stats(self) -> Dict[str, Any]:
+        return {"namespace": self.namespace, "stale_evicted": self._stale_evicted}
+
+
+class ResponseCache(BatchOperations, VersionNamespace):
     """
     LRU cache for message analysis results.
     
@@ -36,11 +135,6 @@ class ResponseCache:
         self._hits = 0
         self._misses = 0
     
-    def _make_key(self, message: str, age_range: str = "8-10") -> str:
-        """Create cache key from message and parameters."""
-        content = f"{message.lower().strip()}:{age_range}"
-        return hashlib.md5(content.encode()).hexdigest()
-    
     def get(self, message: str, age_range: str = "8-10") -> Optional[Dict[str, Any]]:
         """
         Get cached result if exists and not expired.
@@ -48,8 +142,9 @@ class ResponseCache:
         Returns:
             Cached result dict or None if not found/expired
         """
-        key = self._make_key(message, age_range)
-        
+        return self._get_key(self._make_key(message, age_range))
+    
+    def _get_key(self, key: str) -> Optional[Dict[str, Any]]:
         with self._lock:
             if key not in self._cache:
                 self._misses += 1
@@ -78,8 +173,9 @@ class ResponseCache:
             result: ProcessingResult as dict
             age_range: Age range used
         """
-        key = self._make_key(message, age_range)
-        
+        self._set_key(self._make_key(message, age_range), result)
+    
+    def _set_key(self, key: str, result: Dict[str, Any]):
         with self._lock:
             # Remove oldest if at capacity
             if len(self._cache) >= self.max_size:
@@ -90,6 +186,39 @@ class ResponseCache:
                 "timestamp": time.time()
             }
     
+    def _snapshot_keys(self) -> List[str]:
+        with self._lock:
+            return list(self._cache)
+    
+    def snapshot_entries(self) -> List[Tuple[str, Any, float, int]]:
+        """(key, value, created, frequency) for every entry, most recent first (no frequencies)."""
+        with self._lock:
+            return [
+                (key, entry["result"], entry["timestamp"], 0)
+                for key, entry in reversed(self._cache.items())
+            ]
+    
+    def restore_entry(self, key: str, value: Any, created: float, frequency: int) -> bool:
+        """
+        Insert an entry from a snapshot (given hottest first) at the LRU end.
+        Live entries take precedence.
+        
+        Returns:
+            False once the cache is full
+        """
+        with self._lock:
+            if key in self._cache:
+                return True
+            if len(self._cache) >= self.max_size:
+                return False
+            self._cache[key] = {"result": value, "timestamp": created}
+            self._cache.move_to_end(key, last=False)
+            return True
+    
+    def _discard(self, keys: List[str]) -> int:
+        with self._lock:
+            return sum(self._cache.pop(key, None) is not None for key in keys)
+    
     def clear(self):
         """Clear all cached entries."""
         with self._lock:
@@ -105,12 +234,14 @@ class ResponseCache:
             
             return {
                 "enabled": True,
+                "backend": "memory",
                 "size": len(self._cache),
                 "max_size": self.max_size,
                 "hits": self._hits,
                 "misses": self._misses,
                 "hit_rate_percent": round(hit_rate, 2),
-                "ttl_seconds": self.ttl
+                "ttl_seconds": self.ttl,
+                **self._namespace_stats()
             }
 
 
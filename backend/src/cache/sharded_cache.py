@@ -0,0 +1,120 @@
+"""
+Lock-striped Response Cache
+
+ResponseCache guards everything with one lock, so concurrent requests queue
+on it. ShardedResponseCache splits the entries over N independent LRU
+segments picked by key hash, each with its own lock: requests for
+different keys rarely wait for each other, and stats are summed shard by
+shard without ever locking the whole cache.
+
+Drop-in for ResponseCache (LRU is per shard, so eviction order is
+approximate across shards).
+"""
+
+import math
+import logging
+from itertools import zip_longest
+from typing import Optional, Dict, Any, List, Tuple
+
+from .response_cache import ResponseCache, BatchOperations, VersionNamespace
+
+logger = logging.getLogger(__name__)
+
+
+class ShardedResponseCache(BatchOperations, VersionNamespace):
+    """
+    ResponseCache split into independently locked shards.
+
+    Thread-safe.
+    """
+
+    def __init__(self, max_size: int = 1000, ttl_seconds: int = 3600, shards: int = 16):
+        """
+        Initialize cache.
+
+        Args:
+            max_size: Maximum number of cached entries (split evenly over the shards)
+            ttl_seconds: Time-to-live for entries (1 hour default)
+            shards: Number of independently locked segments
+        """
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        per_shard = max(1, math.ceil(max_size / shards))
+        self._shards = [ResponseCache(max_size=per_shard, ttl_seconds=ttl_seconds) for _ in range(shards)]
+
+    def _shard_index(self, key: str) -> int:
+        # Keys end in an md5 hex digest
+        return int(key[-8:], 16) % len(self._shards)
+
+    def _shard(self, key: str) -> ResponseCache:
+        return self._shards[self._shard_index(key)]
+
+    def get(self, message: str, age_range: str = "8-10") -> Optional[Any]:
+        """
+        Get cached result if exists and not expired.
+
+        Returns:
+            Cached value or None if not found/expired
+        """
+        key = self._make_key(message, age_range)
+        return self._shard(key)._get_key(key)
+
+    def set(self, message: str, result: Any, age_range: str = "8-10"):
+        """
+        Cache a result.
+
+        Args:
+            message: Original message
+            result: CachedResponse or JSON-serializable value
+            age_range: Age range used
+        """
+        key = self._make_key(message, age_range)
+        self._shard(key)._set_key(key, result)
+
+    def _snapshot_keys(self) -> List[str]:
+        return [key for shard in self._shards for key in shard._snapshot_keys()]
+
+    def _discard(self, keys: List[str]) -> int:
+        by_shard: Dict[int, List[str]] = {}
+        for key in keys:
+            by_shard.setdefault(self._shard_index(key), []).append(key)
+        return sum(self._shards[i]._discard(shard_keys) for i, shard_keys in by_shard.items())
+
+    def snapshot_entries(self) -> List[Tuple[str, Any, float, int]]:
+        """Entries of all shards, most recent first within each, interleaved."""
+        per_shard = [shard.snapshot_entries() for shard in self._shards]
+        return [entry for row in zip_longest(*per_shard) for entry in row if entry is not None]
+
+    def restore_entry(self, key: str, value: Any, created: float, frequency: int) -> bool:
+        """
+        Insert a snapshot entry into its shard. False if that shard is full
+        (snapshots interleave shards, so the others are nearly full too).
+        """
+        return self._shard(key).restore_entry(key, value, created, frequency)
+
+    def clear(self):
+        """Clear all cached entries (shard by shard)."""
+        for shard in self._shards:
+            shard.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics, summed over shards (each locked only briefly)."""
+        shard_stats = [shard.get_stats() for shard in self._shards]
+        hits = sum(s["hits"] for s in shard_stats)
+        misses = sum(s["misses"] for s in shard_stats)
+        total = hits + misses
+        sizes = [s["size"] for s in shard_stats]
+
+        return {
+            "enabled": True,
+            "backend": "sharded",
+            "size": sum(sizes),
+            "max_size": self.max_size,
+            "shards": len(self._shards),
+            "largest_shard": max(sizes),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate_percent": round(hits / total * 100, 2) if total else 0,
+            "ttl_seconds": self.ttl,
+            **self._namespace_stats()
+        }
@@ -0,0 +1,122 @@
+"""
+Response cache snapshots.
+
+On shutdown (and periodically) the hottest entries of the in-process cache
+are written to a binary file; on startup they are restored, so a restart
+or rolling deploy does not begin with an empty cache.
+
+File layout: magic, header (namespace length, entry count), namespace,
+then per entry (created, frequency, key length, value length), key, value.
+Entries are written hottest first, so a restore cut short by its time
+budget still gets the most useful ones.
+"""
+
+import os
+import time
+import struct
+import logging
+from typing import Dict, Any, Optional
+
+from .cached_response import encode_value, decode_value
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"KSCS1"
+_HEADER = struct.Struct("!HI")  # namespace length, entry count
+_ENTRY = struct.Struct("!dBHI")  # created, frequency, key length, value length
+
+# Entries restored between time budget checks
+_BUDGET_CHECK_EVERY = 64
+
+
+def supports_snapshots(cache) -> bool:
+    """Whether a cache can be snapshotted (persistent backends need not be)."""
+    return hasattr(cache, "snapshot_entries")
+
+
+def save_snapshot(cache, path: str, max_entries: Optional[int] = None) -> int:
+    """
+    Write the hottest entries of `cache` to `path` (atomically replaced).
+
+    Args:
+        cache: Cache with snapshot_entries() and a namespace
+        path: Snapshot file
+        max_entries: Most entries to write (None: all)
+
+    Returns:
+        Number of entries written
+    """
+    entries = cache.snapshot_entries()[:max_entries]
+    namespace = cache.namespace.encode()
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_MAGIC)
+        f.write(_HEADER.pack(len(namespace), len(entries)))
+        f.write(namespace)
+        for key, value, created, frequency in entries:
+            key_bytes, blob = key.encode(), encode_value(value)
+            f.write(_ENTRY.pack(created, min(frequency, 255), len(key_bytes), len(blob)))
+            f.write(key_bytes)
+            f.write(blob)
+    os.replace(tmp, path)
+    return len(entries)
+
+
+def restore_snapshot(cache, path: str, time_budget_s: float, max_entries: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Stream entries from a snapshot into `cache` until the time budget runs out.
+
+    The snapshot is skipped if it was written for another namespace (models,
+    rules or feedback mode changed); expired entries are skipped one by one.
+
+    Returns:
+        Restore stats
+    """
+    start = time.perf_counter()
+    stats = {
+        "entries": 0,
+        "restored": 0,
+        "expired": 0,
+        "version_mismatch": False,
+        "budget_exhausted": False,
+        "duration_ms": 0.0,
+    }
+
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError("not a cache snapshot")
+            namespace_len, count = _HEADER.unpack(f.read(_HEADER.size))
+            stats["entries"] = count
+            if f.read(namespace_len).decode() != cache.namespace:
+                logger.info(f"Ignoring cache snapshot {path}: written for another version")
+                stats["version_mismatch"] = True
+                return stats
+
+            cutoff = time.time() - cache.ttl
+            for i in range(count if max_entries is None else min(count, max_entries)):
+                if i % _BUDGET_CHECK_EVERY == 0 and time.perf_counter() - start >= time_budget_s:
+                    stats["budget_exhausted"] = True
+                    break
+                created, frequency, key_len, value_len = _ENTRY.unpack(f.read(_ENTRY.size))
+                key = f.read(key_len).decode()
+                blob = f.read(value_len)
+                if len(blob) != value_len:
+                    raise ValueError("truncated")
+                if created <= cutoff:
+                    stats["expired"] += 1
+                    continue
+                if not cache.restore_entry(key, decode_value(blob), created, frequency):
+                    break  # Cache full
+                stats["restored"] += 1
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning(f"Stopped restoring cache snapshot {path}: {e}")
+
+    stats["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return stats
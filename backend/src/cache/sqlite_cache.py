@@ -0,0 +1,224 @@
+"""
+Shared Response Cache backed by SQLite
+
+One database file (in WAL mode) is shared by every worker process on the
+host, so a message cached by one worker is a hit for all of them, and the
+cache survives restarts. Drop-in for ResponseCache.
+
+Reads are plain SELECTs: hit/miss counters live in process memory, and the
+LRU `accessed` times of hits are written in batches (at the latest with the
+next set(), which is when eviction looks at them), so a cache hit never
+takes the database write lock.
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Optional, Dict, Any, List
+
+from .response_cache import BatchOperations, VersionNamespace
+from .cached_response import encode_value, decode_value
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+"""
+
+
+class SQLiteResponseCache(BatchOperations, VersionNamespace):
+    """
+    LRU cache with TTL in a SQLite database shared across processes.
+
+    Size and TTL limits apply to the whole database, whichever process
+    writes. Hit/miss counters are per process. Values are CachedResponse
+    entries or JSON-serializable data. A database error (e.g. "database is
+    locked" under contention, or a full disk) never fails the caller: on
+    read it is a miss, on write the entry is dropped.
+
+    Thread-safe and fork-safe (one connection per thread per process).
+    """
+
+    def __init__(self, path: str, max_size: int = 1000, ttl_seconds: int = 3600, touch_batch: int = 64):
+        """
+        Initialize cache.
+
+        Args:
+            path: Database file (created if missing)
+            max_size: Maximum number of cached entries (across all processes)
+            ttl_seconds: Time-to-live for entries (1 hour default)
+            touch_batch: Hits buffered before their access times are written
+        """
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self.touch_batch = touch_batch
+        self._local = threading.local()
+
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}  # key -> last access, not yet written
+        self._hits = 0
+        self._misses = 0
+        self._read_errors = 0
+        self._write_errors = 0
+
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        """Connection for the current thread (reopened after a fork)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, message: str, age_range: str = "8-10") -> Optional[Any]:
+        """
+        Get cached result if exists and not expired.
+
+        Returns:
+            Cached value or None if not found/expired
+        """
+        key = self._make_key(message, age_range)
+        now = time.time()
+
+        try:
+            row = self._conn().execute(
+                "SELECT value FROM entries WHERE key = ? AND created > ?",
+                (key, now - self.ttl)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.debug(f"SQLite cache read failed, treating as a miss: {e}")
+            row = None
+            with self._lock:
+                self._read_errors += 1
+
+        with self._lock:
+            if row is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._touched[key] = now
+            flush = len(self._touched) >= self.touch_batch
+
+        if flush:
+            try:
+                with self._conn() as conn:
+                    self._write_touched(conn)
+            except sqlite3.Error as e:
+                logger.debug(f"SQLite cache access times not written: {e}")
+        return decode_value(row[0])
+
+    def _write_touched(self, conn: sqlite3.Connection):
+        """Write buffered access times (inside the caller's transaction)."""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        if touched:
+            conn.executemany(
+                "UPDATE entries SET accessed = max(accessed, ?) WHERE key = ?",
+                [(accessed, key) for key, accessed in touched.items()]
+            )
+
+    def set(self, message: str, result: Any, age_range: str = "8-10"):
+        """
+        Cache a result.
+
+        Args:
+            message: Original message
+            result: CachedResponse or JSON-serializable value
+            age_range: Age range used
+        """
+        key = self._make_key(message, age_range)
+        now = time.time()
+
+        try:
+            with self._conn() as conn:
+                self._write_touched(conn)
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, encode_value(result), now, now)
+                )
+                # Expired entries first, then least recently used beyond max_size
+                conn.execute("DELETE FROM entries WHERE created <= ?", (now - self.ttl,))
+                conn.execute(
+                    "DELETE FROM entries WHERE key IN ("
+                    "  SELECT key FROM entries ORDER BY accessed"
+                    "  LIMIT max(0, (SELECT COUNT(*) FROM entries) - ?))",
+                    (self.max_size,)
+                )
+        except sqlite3.Error as e:
+            self._write_failed("set", e)
+
+    def _write_failed(self, operation: str, error: sqlite3.Error):
+        logger.warning(f"SQLite cache {operation} failed, dropping the write: {error}")
+        with self._lock:
+            self._write_errors += 1
+
+    def _snapshot_keys(self) -> List[str]:
+        try:
+            return [row[0] for row in self._conn().execute("SELECT key FROM entries")]
+        except sqlite3.Error as e:
+            logger.warning(f"SQLite cache key scan failed: {e}")
+            with self._lock:
+                self._read_errors += 1
+            return []
+
+    def _discard(self, keys: List[str]) -> int:
+        # Every process on the host runs the same version, so entries from
+        # other namespaces are stale for all of them
+        try:
+            with self._conn() as conn:
+                return conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in keys]).rowcount
+        except sqlite3.Error as e:
+            self._write_failed("eviction", e)
+            return 0
+
+    def clear(self):
+        """Clear all cached entries."""
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM entries")
+        with self._lock:
+            self._touched.clear()
+            self._hits = self._misses = self._read_errors = self._write_errors = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics (size for the shared database, counters for this process)."""
+        size = self._conn().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        with self._lock:
+            hits, misses = self._hits, self._misses
+            read_errors, write_errors = self._read_errors, self._write_errors
+        total = hits + misses
+        hit_rate = (hits / total * 100) if total > 0 else 0
+
+        return {
+            "enabled": True,
+            "backend": "sqlite",
+            "path": self.path,
+            "size": size,
+            "max_size": self.max_size,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate_percent": round(hit_rate, 2),
+            "read_errors": read_errors,
+            "write_errors": write_errors,
+            "ttl_seconds": self.ttl,
+            **self._namespace_stats()
+        }
@@ -0,0 +1,169 @@
+"""
+Two-tier Response Cache
+
+L1 is the per-process cache; L2 is a store shared across nodes (Redis, or
+InMemoryL2 on a single node). An L1 miss falls through to L2 and an L2 hit
+is copied into L1. If L2 fails the cache keeps working from L1 alone and
+retries L2 after `retry_interval` seconds.
+
+L2 keys carry the version namespace too. Entries from old namespaces are
+not deleted from L2 (nodes still on the old version may be using them);
+they expire with their TTL.
+
+Drop-in for ResponseCache.
+"""
+
+import time
+import logging
+import threading
+from typing import Optional, Dict, Any, List, Tuple
+
+from .response_cache import cache_key
+from .cached_response import encode_value, decode_value
+
+logger = logging.getLogger(__name__)
+
+
+class TieredCache:
+    """
+    L1 (in-process) in front of an L2 store.
+
+    Thread-safe if L1 and L2 are. Never raises on L2 errors.
+    """
+
+    def __init__(self, l1, l2, ttl_seconds: int = 3600, retry_interval: float = 5.0):
+        """
+        Initialize cache.
+
+        Args:
+            l1: In-process cache (ResponseCache, TinyLFUCache, ...)
+            l2: L2 store (RedisL2 or InMemoryL2)
+            ttl_seconds: Time-to-live for L2 entries
+            retry_interval: Seconds L2 is skipped after a failure
+        """
+        self.l1 = l1
+        self.l2 = l2
+        self.ttl = ttl_seconds
+        self.retry_interval = retry_interval
+        self.namespace = l1.namespace
+
+        self._lock = threading.Lock()
+        self._down_until = 0.0
+        self._l2_hits = 0
+        self._l2_misses = 0
+        self._l2_failures = 0
+
+    def set_namespace(self, namespace: str, background: bool = True):
+        """Switch namespace; L1 evicts old entries, L2 lets them expire."""
+        self.namespace = namespace
+        self.l1.set_namespace(namespace, background)
+
+    def snapshot_entries(self) -> List[Tuple[str, Any, float, int]]:
+        """Snapshot L1 (L2 outlives restarts anyway)."""
+        return self.l1.snapshot_entries()
+
+    def restore_entry(self, key: str, value: Any, created: float, frequency: int) -> bool:
+        return self.l1.restore_entry(key, value, created, frequency)
+
+    def _call_l2(self, operation: str, *args) -> Optional[Any]:
+        """Run an L2 operation; None if L2 is down or the call fails."""
+        if time.monotonic() < self._down_until:
+            return None
+        try:
+            return getattr(self.l2, operation)(*args)
+        except Exception as e:
+            with self._lock:
+                self._l2_failures += 1
+                self._down_until = time.monotonic() + self.retry_interval
+            logger.warning(f"L2 cache {operation} failed, using L1 only for {self.retry_interval}s: {e}")
+            return None
+
+    def get(self, message: str, age_range: str = "8-10") -> Optional[Any]:
+        """
+        Get cached result from L1, then L2.
+
+        Returns:
+            Cached value or None if not found/expired
+        """
+        return self.get_many([message], age_range)[0]
+
+    def set(self, message: str, result: Any, age_range: str = "8-10"):
+        """
+        Cache a result in both tiers.
+
+        Args:
+            message: Original message
+            result: CachedResponse or JSON-serializable value
+            age_range: Age range used
+        """
+        self.set_many([(message, result)], age_range)
+
+    def get_many(self, messages: List[str], age_range: str = "8-10") -> List[Optional[Any]]:
+        """Look up several messages; L1 misses go to L2 in one round trip."""
+        values = self.l1.get_many(messages, age_range)
+        missing = [i for i, value in enumerate(values) if value is None]
+        if not missing:
+            return values
+
+        blobs = self._call_l2("get_many", [cache_key(messages[i], age_range, self.namespace) for i in missing])
+        if blobs is None:
+            return values
+
+        found = []
+        for i, blob in zip(missing, blobs):
+            if blob is not None:
+                values[i] = decode_value(blob)
+                found.append((messages[i], values[i]))
+        if found:
+            self.l1.set_many(found, age_range)
+
+        with self._lock:
+            self._l2_hits += len(found)
+            self._l2_misses += len(missing) - len(found)
+        return values
+
+    def set_many(self, items: List[Tuple[str, Any]], age_range: str = "8-10"):
+        """Cache several (message, result) pairs; one L2 round trip."""
+        self.l1.set_many(items, age_range)
+        self._call_l2(
+            "set_many",
+            [(cache_key(message, age_range, self.namespace), encode_value(result))
+             for message, result in items],
+            self.ttl
+        )
+
+    def clear(self):
+        """Clear both tiers."""
+        self.l1.clear()
+        self._call_l2("clear")
+        with self._lock:
+            self._l2_hits = self._l2_misses = self._l2_failures = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """L1 stats, with hits/misses for the tiers combined and an "l2" section."""
+        l1_stats = self.l1.get_stats()
+        with self._lock:
+            l2_hits, l2_misses, failures = self._l2_hits, self._l2_misses, self._l2_failures
+            available = time.monotonic() >= self._down_until
+
+        # Every L1 miss is either an L2 hit, an L2 miss, or was not looked up (L2 down)
+        hits = l1_stats["hits"] + l2_hits
+        misses = l1_stats["misses"] - l2_hits
+        total = hits + misses
+        l2_stats = self._call_l2("get_stats") or {"backend": self.l2.name}
+
+        return {
+            **l1_stats,
+            "backend": f"{l1_stats['backend']}+{self.l2.name}",
+            "hits": hits,
+            "misses": misses,
+            "hit_rate_percent": round(hits / total * 100, 2) if total else 0,
+            "l1": l1_stats,
+            "l2": {
+                **l2_stats,
+                "available": available,
+                "hits": l2_hits,
+                "misses": l2_misses,
+                "failures": failures,
+            },
+        }
@@ -0,0 +1,455 @@
+"""
+Memory-budgeted Response Cache with W-TinyLFU admission
+
+Plain LRU admits every new message, so a burst of one-off spam flushes the
+phrases children send over and over. Here new entries land in a small LRU
+window; when they fall out of it they only enter the main cache if a
+count-min sketch says they are requested more often than the entry they
+would evict. Capacity is in bytes, since a RED result with LLM feedback is
+many times the size of a GREEN one.
+
+Drop-in for ResponseCache.
+"""
+
+import os
+import json
+import time
+import weakref
+import logging
+import threading
+from typing import Optional, Dict, Any, List, Tuple
+from collections import OrderedDict
+
+from .response_cache import BatchOperations, VersionNamespace
+from .cached_response import CachedResponse
+
+logger = logging.getLogger(__name__)
+
+# Rough per-entry bookkeeping overhead (key, entry object, dict slots)
+ENTRY_OVERHEAD = 200
+
+# bytearray.translate table halving every counter
+_HALVE = bytes(i >> 1 for i in range(256))
+
+
+def entry_size(value: Any) -> int:
+    """Approximate memory used by a cached value, in bytes."""
+    if isinstance(value, CachedResponse):
+        size = len(value)
+    elif isinstance(value, (bytes, bytearray, str)):
+        size = len(value)
+    else:
+        size = len(json.dumps(value, default=str))
+    return size + ENTRY_OVERHEAD
+
+
+class CountMinSketch:
+    """
+    Approximate access frequencies in a few bytes per entry.
+
+    `depth` rows of `width` saturating counters (max 15). After
+    `sample_size` increments every counter is halved, so old popularity
+    fades and the sketch follows the current traffic.
+    """
+
+    MAX_COUNT = 15
+
+    def __init__(self, width: int = 1024, depth: int = 4):
+        """
+        Args:
+            width: Counters per row (rounded up to a power of two)
+            depth: Number of rows (independent hashes)
+        """
+        self.width = 1 << max(4, (width - 1).bit_length())
+        self.depth = depth
+        self.sample_size = 10 * self.width
+        self._mask = self.width - 1
+        self._rows = [bytearray(self.width) for _ in range(depth)]
+        self._additions = 0
+
+    def _indexes(self, key: str) -> List[int]:
+        # Keys are md5 hex digests (after any namespace): take 32
+        # independent bits per row. Frequencies carry over namespace switches.
+        h = int(key.rpartition(":")[2], 16)
+        return [(h >> (32 * row)) & self._mask for row in range(self.depth)]
+
+    def increment(self, key: str):
+        indexes = self._indexes(key)
+        minimum = min(row[i] for row, i in zip(self._rows, indexes))
+        if minimum >= self.MAX_COUNT:
+            return
+        # Conservative update: only raise the counters at the minimum
+        for row, i in zip(self._rows, indexes):
+            if row[i] == minimum:
+                row[i] = minimum + 1
+
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            self._rows = [row.translate(_HALVE) for row in self._rows]
+            self._additions //= 2
+
+    def frequency(self, key: str) -> int:
+        return min(row[i] for row, i in zip(self._rows, self._indexes(key)))
+
+    def clear(self):
+        self._rows = [bytearray(self.width) for _ in range(self.depth)]
+        self._additions = 0
+
+
+class _Entry:
+    __slots__ = ("value", "size", "created", "segment")
+
+    def __init__(self, value: Any, size: int, created: float, segment: str):
+        self.value = value
+        self.size = size
+        self.created = created
+        self.segment = segment
+
+
+def _sweep_loop(cache_ref, interval: float, stop: threading.Event):
+    """Sweeper thread; holds only a weak reference so the cache can be freed."""
+    while not stop.wait(interval):
+        cache = cache_ref()
+        if cache is None:
+            return
+        cache.sweep()
+        del cache
+
+
+class TinyLFUCache(BatchOperations, VersionNamespace):
+    """
+    W-TinyLFU cache with a byte budget and TTL.
+
+    Layout (by bytes): a 1% LRU admission window, then a segmented LRU main
+    area split into probation (20%) and protected (80%). Entries hit while
+    in probation are promoted to protected. An entry leaving the window
+    replaces probation/protected victims only if the sketch estimates it is
+    more popular than each of them; otherwise it is dropped.
+
+    Expired entries are removed by a background sweeper every
+    `sweep_interval` seconds, not only when looked up.
+
+    Thread-safe and fork-safe (a forked worker starts its own sweeper).
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 16 * 1024 * 1024,
+        max_size: Optional[int] = None,
+        ttl_seconds: int = 3600,
+        window_percent: float = 1.0,
+        sweep_interval: float = 60.0
+    ):
+        """
+        Initialize cache.
+
+        Args:
+            max_bytes: Memory budget for cached entries
+            max_size: Optional cap on the number of entries
+            ttl_seconds: Time-to-live for entries (1 hour default)
+            window_percent: Share of the budget used by the admission window
+            sweep_interval: Seconds between expiry sweeps (0 disables the sweeper)
+        """
+        self.max_bytes = max_bytes
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self.sweep_interval = sweep_interval
+
+        self._window_bytes = max(1, int(max_bytes * window_percent / 100))
+        self._window_size = max(1, int(max_size * window_percent / 100)) if max_size else None
+        self._main_bytes = max_bytes - self._window_bytes
+        self._protected_bytes = int(self._main_bytes * 0.8)
+
+        expected_entries = max_size or max_bytes // 2048
+        self.sketch = CountMinSketch(width=max(1024, expected_entries))
+
+        self._entries: Dict[str, _Entry] = {}
+        self._segments = {
+            "window": OrderedDict(),
+            "probation": OrderedDict(),
+            "protected": OrderedDict(),
+        }
+        self._bytes = {"window": 0, "probation": 0, "protected": 0}
+        # Keys in creation order (TTL is fixed, so also expiry order)
+        self._expiry: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._admitted = 0
+        self._rejected = 0
+        self._evicted = 0
+        self._expired = 0
+
+        self._sweeper_pid = None
+        self._sweeper_stop = threading.Event()
+
+    def get(self, message: str, age_range: str = "8-10") -> Optional[Any]:
+        """
+        Get cached result if exists and not expired.
+
+        Every lookup, hit or miss, counts towards the key's frequency.
+
+        Returns:
+            Cached value or None if not found/expired
+        """
+        self._ensure_sweeper()
+        key = self._make_key(message, age_range)
+
+        with self._lock:
+            self.sketch.increment(key)
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            if time.time() - entry.created > self.ttl:
+                self._remove(key)
+                self._expired += 1
+                self._misses += 1
+                return None
+
+            self._hits += 1
+            if entry.segment == "probation":
+                self._move(key, entry, "protected")
+                self._rebalance_protected()
+            else:
+                self._segments[entry.segment].move_to_end(key)
+            return entry.value
+
+    def set(self, message: str, result: Any, age_range: str = "8-10"):
+        """
+        Cache a result.
+
+        Args:
+            message: Original message
+            result: CachedResponse or JSON-serializable value
+            age_range: Age range used
+        """
+        self._ensure_sweeper()
+        key = self._make_key(message, age_range)
+        size = entry_size(result)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._bytes[entry.segment] += size - entry.size
+                entry.value, entry.size, entry.created = result, size, now
+                self._segments[entry.segment].move_to_end(key)
+                self._expiry.move_to_end(key)
+                self._expiry[key] = now
+            else:
+                entry = _Entry(result, size, now, "window")
+                self._entries[key] = entry
+                self._segments["window"][key] = entry
+                self._bytes["window"] += size
+                self._expiry[key] = now
+
+            self._drain_window()
+            self._enforce_limits()
+
+    def _drain_window(self):
+        """Offer entries that overflow the window to the main area."""
+        window = self._segments["window"]
+        while len(window) > 1 and (
+            self._bytes["window"] > self._window_bytes
+            or (self._window_size is not None and len(window) > self._window_size)
+        ):
+            key, candidate = next(iter(window.items()))
+            self._admit(key, candidate)
+
+    def _main_has_room(self, size: int, freed: int = 0, freed_count: int = 0) -> bool:
+        main_bytes = self._bytes["probation"] + self._bytes["protected"]
+        if main_bytes - freed + size > self._main_bytes:
+            return False
+        if self.max_size is not None:
+            main_count = len(self._segments["probation"]) + len(self._segments["protected"])
+            window_count = len(self._segments["window"]) - 1
+            if window_count + main_count - freed_count + 1 > self.max_size:
+                return False
+        return True
+
+    def _admit(self, key: str, candidate: _Entry):
+        """Move a window entry to probation if it wins against the victims."""
+        if candidate.size > self._main_bytes:
+            self._remove(key)
+            self._rejected += 1
+            return
+
+        # Victims in eviction order, only as many as needed to make room
+        victims = []
+        freed = 0
+        frequency = self.sketch.frequency(key)
+        for segment in ("probation", "protected"):
+            for victim_key, victim in self._segments[segment].items():
+                if self._main_has_room(candidate.size, freed, len(victims)):
+                    break
+                if self.sketch.frequency(victim_key) >= frequency:
+                    self._remove(key)
+                    self._rejected += 1
+                    return
+                victims.append(victim_key)
+                freed += victim.size
+
+        for victim_key in victims:
+            self._remove(victim_key)
+            self._evicted += 1
+        self._move(key, candidate, "probation")
+        self._admitted += 1
+
+    def _enforce_limits(self):
+        """Final guard for limits the window cannot satisfy (e.g. max_size=1)."""
+        while self._entries and (
+            sum(self._bytes.values()) > self.max_bytes
+            or (self.max_size is not None and len(self._entries) > self.max_size)
+        ):
+            for segment in ("probation", "protected", "window"):
+                if self._segments[segment]:
+                    self._remove(next(iter(self._segments[segment])))
+                    self._evicted += 1
+                    break
+
+    def _rebalance_protected(self):
+        """Demote least recent protected entries back to probation."""
+        protected = self._segments["protected"]
+        while self._bytes["protected"] > self._protected_bytes and len(protected) > 1:
+            key, entry = next(iter(protected.items()))
+            self._move(key, entry, "probation")
+
+    def _move(self, key: str, entry: _Entry, segment: str):
+        del self._segments[entry.segment][key]
+        self._bytes[entry.segment] -= entry.size
+        entry.segment = segment
+        self._segments[segment][key] = entry
+        self._bytes[segment] += entry.size
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        del self._segments[entry.segment][key]
+        self._bytes[entry.segment] -= entry.size
+        self._expiry.pop(key, None)
+
+    def sweep(self) -> int:
+        """Remove expired entries now. Returns how many were removed."""
+        cutoff = time.time() - self.ttl
+        removed = 0
+        with self._lock:
+            while self._expiry:
+                key, created = next(iter(self._expiry.items()))
+                if created > cutoff:
+                    break
+                self._remove(key)
+                removed += 1
+            self._expired += removed
+        if removed:
+            logger.debug(f"Swept {removed} expired cache entries")
+        return removed
+
+    def _snapshot_keys(self) -> List[str]:
+        with self._lock:
+            return list(self._entries)
+
+    def _discard(self, keys: List[str]) -> int:
+        with self._lock:
+            stale = [key for key in keys if key in self._entries]
+            for key in stale:
+                self._remove(key)
+            return len(stale)
+
+    def snapshot_entries(self) -> List[Tuple[str, Any, float, int]]:
+        """(key, value, created, frequency) for every entry, hottest first."""
+        with self._lock:
+            return [
+                (key, entry.value, entry.created, self.sketch.frequency(key))
+                for segment in ("protected", "probation", "window")
+                for key, entry in reversed(self._segments[segment].items())
+            ]
+
+    def restore_entry(self, key: str, value: Any, created: float, frequency: int) -> bool:
+        """
+        Insert an entry from a snapshot (given hottest first) at the cold end
+        of probation, skipping admission. Live entries take precedence.
+
+        Returns:
+            False once the main area is full
+        """
+        size = entry_size(value)
+        with self._lock:
+            if key in self._entries:
+                return True
+            if (self._bytes["probation"] + self._bytes["protected"] + size > self._main_bytes
+                    or (self.max_size is not None and len(self._entries) >= self.max_size)):
+                return False
+            for _ in range(min(frequency, 15)):
+                self.sketch.increment(key)
+            entry = _Entry(value, size, created, "probation")
+            self._entries[key] = entry
+            self._segments["probation"][key] = entry
+            self._segments["probation"].move_to_end(key, last=False)
+            self._bytes["probation"] += size
+            # Older than anything set since startup; the sweeper may see
+            # restored entries slightly out of order (get() still checks TTL)
+            self._expiry[key] = created
+            self._expiry.move_to_end(key, last=False)
+            return True
+
+    def _ensure_sweeper(self):
+        """Start the sweeper thread (again, after a fork)."""
+        if self._sweeper_pid == os.getpid() or self.sweep_interval <= 0:
+            return
+        with self._lock:
+            if self._sweeper_pid == os.getpid():
+                return
+            self._sweeper_pid = os.getpid()
+            self._sweeper_stop = threading.Event()
+            threading.Thread(
+                target=_sweep_loop,
+                args=(weakref.ref(self), self.sweep_interval, self._sweeper_stop),
+                name="cache-sweeper",
+                daemon=True
+            ).start()
+
+    def close(self):
+        """Stop the sweeper thread."""
+        self._sweeper_stop.set()
+
+    def clear(self):
+        """Clear all cached entries."""
+        with self._lock:
+            self._entries.clear()
+            for segment in self._segments.values():
+                segment.clear()
+            self._bytes = dict.fromkeys(self._bytes, 0)
+            self._expiry.clear()
+            self.sketch.clear()
+            self._hits = self._misses = 0
+            self._admitted = self._rejected = self._evicted = self._expired = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        with self._lock:
+            total = self._hits + self._misses
+            hit_rate = (self._hits / total * 100) if total > 0 else 0
+
+            return {
+                "enabled": True,
+                "backend": "tinylfu",
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "bytes": sum(self._bytes.values()),
+                "max_bytes": self.max_bytes,
+                "segments": {
+                    name: {"entries": len(segment), "bytes": self._bytes[name]}
+                    for name, segment in self._segments.items()
+                },
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate_percent": round(hit_rate, 2),
+                "admitted": self._admitted,
+                "rejected": self._rejected,
+                "evicted": self._evicted,
+                "expired": self._expired,
+                "ttl_seconds": self.ttl,
+                **self._namespace_stats()
+            }
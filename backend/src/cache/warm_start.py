@@ -0,0 +1,78 @@
+"""
+Cache warm-start sources.
+
+Classification exports (web/data/*Classification.csv) record which messages
+children actually send. Their frequencies decide which messages are run
+through the pipeline at startup so the first real requests hit the cache.
+In timestamp order they are also a traffic trace for cache sizing.
+"""
+
+import os
+import csv
+import glob
+import logging
+from datetime import datetime
+from collections import Counter
+from typing import Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def read_exports(patterns: Iterable[str]) -> Counter:
+    """
+    Count messages in classification exports.
+
+    Only the message text is used: warm start runs every message through
+    the current pipeline, so the exported verdicts (and the models that
+    made them) don't matter.
+
+    Args:
+        patterns: CSV paths or glob patterns. Files need a `text` column.
+
+    Returns:
+        message -> occurrences
+    """
+    counts: Counter = Counter()
+
+    for pattern in patterns:
+        for path in sorted(glob.glob(os.path.expanduser(pattern))):
+            try:
+                with open(path, newline="", encoding="utf-8") as f:
+                    for row in csv.DictReader(f):
+                        text = (row.get("text") or "").strip()
+                        if text:
+                            counts[text] += 1
+            except (OSError, csv.Error) as e:
+                logger.warning(f"Skipping warm-start export {path}: {e}")
+
+    return counts
+
+
+def read_traffic(patterns: Iterable[str]) -> List[Tuple[float, str]]:
+    """
+    Exported messages as a trace, oldest first.
+
+    Args:
+        patterns: CSV paths or glob patterns. Files need `text` and
+            `timestamp` columns; rows without a valid timestamp are skipped.
+
+    Returns:
+        (unix timestamp, message) pairs
+    """
+    requests = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(os.path.expanduser(pattern))):
+            try:
+                with open(path, newline="", encoding="utf-8") as f:
+                    for row in csv.DictReader(f):
+                        text = (row.get("text") or "").strip()
+                        try:
+                            timestamp = datetime.fromisoformat(row.get("timestamp") or "").timestamp()
+                        except ValueError:
+                            continue
+                        if text:
+                            requests.append((timestamp, text))
+            except (OSError, csv.Error) as e:
+                logger.warning(f"Skipping export {path}: {e}")
+    requests.sort()
+    return requests
@@ -5,7 +5,7 @@ Decision Engine - Classifies messages as GREEN/YELLOW/RED.
 import logging
 from typing import List
 from dataclasses import dataclass
-from ..models import AnalysisResult, Classification, DetectedIssue, EmotionType
+from ..models import AnalysisResult, Classification, DetectedIssue, EmotionType, ToxicityResult
 
 logger = logging.getLogger(__name__)
 
@@ -41,11 +41,22 @@ class DecisionEngine:
         DetectedIssue.NAME_CALLING,
     }
     
+    # Analysis fields the decision depends on
+    INPUTS = ("detected_issues", "toxicity")
+    
     def classify(self, analysis: AnalysisResult) -> ClassificationResult:
+        return self.classify_signals(analysis.detected_issues, analysis.toxicity)
+    
+    def classify_signals(
+        self,
+        detected_issues: List[DetectedIssue],
+        toxicity: ToxicityResult
+    ) -> ClassificationResult:
+        """Classify from just the inputs the decision needs (see INPUTS)."""
         reasons = []
         
         # Check for immediate RED flags (profanity, threats, attacks)
-        for issue in analysis.detected_issues:
+        for issue in detected_issues:
             if issue in self.RED_FLAGS:
                 reasons.append(f"Detected: {issue.value}")
         
@@ -58,22 +69,22 @@ class DecisionEngine:
             )
         
         # Check toxicity score
-        if analysis.toxicity.score > 0.6:
-            reasons.append(f"High toxicity: {analysis.toxicity.score:.2f}")
+        if toxicity.score > 0.6:
+            reasons.append(f"High toxicity: {toxicity.score:.2f}")
             return ClassificationResult(
                 classification=Classification.RED,
-                confidence=analysis.toxicity.confidence,
+                confidence=toxicity.confidence,
                 reasons=reasons,
                 feedback_type="urgent_coaching"
             )
         
         # Check for YELLOW flags
-        for issue in analysis.detected_issues:
+        for issue in detected_issues:
             if issue in self.YELLOW_FLAGS:
                 reasons.append(f"Detected: {issue.value}")
         
         # Age-inappropriate content should be at least YELLOW
-        if DetectedIssue.AGE_INAPPROPRIATE in analysis.detected_issues:
+        if DetectedIssue.AGE_INAPPROPRIATE in detected_issues:
             reasons.append("Age-inappropriate content detected")
             return ClassificationResult(
                 classification=Classification.YELLOW,
@@ -82,9 +93,9 @@ class DecisionEngine:
                 feedback_type="gentle_suggestion"
             )
         
-        if reasons or analysis.toxicity.score > 0.3:
+        if reasons or toxicity.score > 0.3:
             if not reasons:
-                reasons.append(f"Moderate concerns: {analysis.toxicity.score:.2f}")
+                reasons.append(f"Moderate concerns: {toxicity.score:.2f}")
             return ClassificationResult(
                 classification=Classification.YELLOW,
                 confidence=0.75,
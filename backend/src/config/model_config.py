@@ -33,15 +33,192 @@ MODEL_CONFIG = {
     "feedback": {
         "hf_llm": {
             "description": "Hugging Face LLM for personalized feedback",
-            "fallback": "Built-in templates if HF API unavailable"
+            "fallback": "Built-in templates if HF API unavailable",
+            # Shared keep-alive connection pool (requests path; HF_API_URL
+            # points it at another endpoint, e.g. the stub server)
+            "http": {
+                "pool_size": 20,
+                "max_keepalive": 10,
+                "keepalive_expiry_s": 60,
+                "connect_timeout_s": 3.0,
+                "read_timeout_s": 30.0,
+                "http2": True  # needs `pip install h2`
+            },
+            # Skip the LLM (templates only) after repeated failures or slow calls
+            "circuit_breaker": {
+                "failure_threshold": 3,  # Consecutive failures that open the circuit
+                "latency_threshold_ms": 8000,  # Slower calls count as failures
+                "open_seconds": 30,  # Templates only, then probe again
+                "half_open_probes": 1
+            }
+        },
+        # Return template feedback at once and run the LLM call in the
+        # background; its result serves later similar messages (needs the
+        # llm_feedback_cache) and can be streamed from /analyze/stream.
+        # FEEDBACK_SPECULATIVE=1 also enables it.
+        "speculative": {
+            "enabled": False,
+            "max_workers": 4,  # Concurrent background LLM calls
+            "max_pending": 64,  # Upgrades queued or running; more are dropped
+            "stream_timeout_s": 20  # How long /analyze/stream waits for the upgrade
         }
     },
     
     # Cache settings
     "cache": {
+        "enabled": True,
+        # "tinylfu" (per process, frequency-aware), "memory" (per process, LRU),
+        # "sharded" (per process, LRU with a lock per shard) or "sqlite"
+        # (shared by all workers)
+        "backend": "tinylfu",
+        "path": "/tmp/kid-safety-cache.db",  # sqlite only
+        "max_size": 1000,  # memory/sharded/sqlite entry limit
+        "shards": 16,  # sharded only
+        "max_bytes": 16 * 1024 * 1024,  # tinylfu memory budget
+        "sweep_interval": 60,  # tinylfu: seconds between expiry sweeps
+        "ttl_seconds": 3600,
+        # Optional second tier shared across nodes (in front: the cache above)
+        "l2": {
+            "backend": None,  # None, "redis" or "memory" (in-process stand-in)
+            "url": "redis://localhost:6379/0",
+            "prefix": "kid-safety:",
+            "timeout_ms": 50,
+            "retry_interval": 5,  # Seconds to run L1-only after an L2 failure
+            "max_size": 10000  # memory only
+        }
+    },
+    
+    # Fingerprints of short messages already classified GREEN with high
+    # confidence; these get a canned GREEN result without any analysis
+    "known_green": {
+        "enabled": True,
+        "capacity": 1_000_000,
+        "max_length": 64,  # Longer messages are never added
+        "min_confidence": 0.9,
+        "path": None  # File to persist to (GREEN_SET_PATH overrides)
+    },
+    
+    # Snapshot of the hottest response cache entries, written on shutdown
+    # and every `interval_s`, restored at startup (before warm start)
+    "cache_snapshot": {
+        "enabled": True,
+        "path": None,  # Snapshot file (CACHE_SNAPSHOT_PATH overrides); None disables
+        "max_entries": 5000,
+        "interval_s": 300,
+        "time_budget_s": 5  # Restore stops after this long; hottest entries come first
+    },
+    
+    # Sampled reuse-distance analytics: predicted hit rate per cache size
+    # and TTL (CACHE_ANALYTICS=1 also enables)
+    "cache_analytics": {
+        "enabled": False,
+        "sample_rate": 0.01,  # Share of keys tracked
+        "max_tracked": 100_000,
+        "sizes": [100, 1000, 10_000, 50_000, 100_000],
+        "ttls": [60, 300, 900, 3600, 86400]
+    },
+    
+    # Pre-populate the caches at startup from historical classification
+    # exports (most frequent messages first), before the API reports ready
+    "warm_start": {
+        "enabled": True,
+        "paths": [
+            os.path.join(os.path.dirname(__file__), "..", "..", "..", "web", "data", "*Classification.csv")
+        ],
+        "max_entries": 500,
+        "time_budget_s": 30
+    },
+    
+    # Per-message memo of analyzer outputs (keyed by preprocessed text)
+    "analysis_memo": {
+        "max_entries": 2000
+    },
+    
+    # Template feedback keyed by (classification, issue, emotion, age, topic)
+    "feedback_cache": {
+        "enabled": True,
+        "max_size": 500
+    },
+    
+    # LLM feedback keyed by prompt signature (classification, issues, emotion,
+    # age, mentioned items, profanity): saves paid calls for similar messages
+    "llm_feedback_cache": {
         "enabled": True,
         "max_size": 1000,
-        "ttl_seconds": 3600
+        "variants": 3,  # LLM calls per signature before it is served from cache
+        "ttl_seconds": 24 * 3600
+    },
+    
+    # Sliding window of recent messages per child/conversation
+    "conversation": {
+        "window_size": 10,
+        "repeat_threshold": 3,  # Same issue this often in the window = repetition
+        "escalation_steps": 2,  # e.g. GREEN -> YELLOW -> RED
+        "max_sessions": 50000,  # Live windows (LRU)
+        "max_spilled": 200000,  # Compact idle/evicted windows
+        "idle_seconds": 900
+    },
+    
+    # Separate model process shared by all API workers (main.py --inference-server)
+    "inference_server": {
+        "socket_path": "/tmp/kid-safety-inference.sock",
+        "timeout_ms": 200,  # Client gives up and uses rules after this
+        "max_batch": 32,
+        "max_wait_ms": 5  # Time the server waits to fill a batch
+    },
+    
+    # Consistent-hash gateway in front of API replicas (main.py --gateway)
+    "gateway": {
+        "replicas": [],  # Replica base URLs (GATEWAY_REPLICAS overrides, comma-separated)
+        "virtual_nodes": 100,
+        "connect_timeout_s": 2.0,
+        # Must cover a replica's slowest answer (LLM read timeout above plus analysis);
+        # a timed-out request is not re-sent, it may have made a paid LLM call
+        "read_timeout_s": 40.0,
+        "retry_interval": 5.0,  # Seconds a failed replica is skipped
+        # Bearer token for POST/DELETE /gateway/replicas (GATEWAY_ADMIN_TOKEN overrides);
+        # None disables runtime replica changes
+        "admin_token": None
+    },
+    
+    # Latency budgets (per-request deadlines)
+    "deadlines": {
+        "default_budget_ms": None,  # None = no budget unless the client sets one
+        # Initial cost estimates, refined from observed latencies
+        "stage_cost_ms": {
+            "toxicity": 40,
+            "emotion": 25,
+            "hate_speech": 40,
+            "feedback_llm": 2000
+        },
+        # Unobserved estimates drift back to the defaults above (so one slow
+        # call can't keep a stage switched off for good)
+        "cost_half_life_s": 60
+    },
+    
+    # Load-adaptive degradation (full -> skip emotion -> skip hate speech
+    # -> rules only -> template-only feedback)
+    "load_control": {
+        "enabled": True,
+        "max_in_flight": 32,
+        "max_queue_wait_ms": 200,
+        "max_p95_ms": 500,  # Model stage only; LLM feedback time doesn't count
+        "level_thresholds": [1.0, 1.5, 2.0, 3.0],
+        "recover_ratio": 0.7,
+        "cooldown_seconds": 10,
+        "window_size": 200,
+        "window_seconds": 30,
+        "min_window_samples": 20,
+        "eval_interval_seconds": 0.25
+    },
+    
+    # Priority lanes in front of the model stage
+    "scheduler": {
+        "enabled": True,
+        "capacity": 4,  # Concurrent requests in the model stage
+        "reserved_critical": 1,  # Slots only self-harm/threat messages may use
+        "max_wait_ms": 2000,  # Longer (or past the deadline) and the request gets rules only
+        "window_size": 500
     }
 }
 
@@ -68,7 +245,7 @@ class ProductionConfig:
     # API
     api_host: str = "0.0.0.0"
     api_port: int = 8000
-    workers: int = 4
+    workers: int = 1  # >1 splits per-process state (caches, conversation windows)
     
     @classmethod
     def from_env(cls) -> "ProductionConfig":
@@ -81,7 +258,7 @@ class ProductionConfig:
             cache_enabled=os.getenv("CACHE_ENABLED", "true").lower() == "true",
             api_host=os.getenv("API_HOST", "0.0.0.0"),
             api_port=int(os.getenv("API_PORT", "8000")),
-            workers=int(os.getenv("WORKERS", "4")),
+            workers=int(os.getenv("WORKERS", "1")),
         )
 
 
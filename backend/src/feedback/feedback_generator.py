@@ -4,9 +4,18 @@ Main Feedback Generator
 Uses Hugging Face LLM for personalized feedback, with template fallback.
 """
 
+import os
+import time
+import asyncio
 import logging
-from typing import Optional, Tuple
-from ..models import Classification, AnalysisResult, Feedback, Educational
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Tuple, Dict
+from ..models import Classification, AnalysisResult, Feedback, Educational, FeedbackSource
+from ..config import MODEL_CONFIG
+from ..serving.deadline import Deadline, StageCostModel
+from ..serving.circuit_breaker import CircuitBreaker, BreakerState
+from ..cache.feedback_cache import FeedbackCache, LLMFeedbackCache
 from .templates import TemplateGenerator
 from .hf_llm_generator import HuggingFaceLLMGenerator
 
@@ -19,21 +28,64 @@ class FeedbackGenerator:
     
     Primary mode: Hugging Face LLM for personalized feedback
     Fallback: Template-based feedback if HF API unavailable
+    
+    Thread-safe: the age range is passed per call and template generators
+    are built once per age range, so no per-request state is shared.
+    
+    Template feedback is cached by its signature (see
+    TemplateGenerator.signature), so differently worded messages with the
+    same issue, emotion, age and topic share one entry. LLM feedback is
+    cached by its prompt signature (see HuggingFaceLLMGenerator.prompt_signature)
+    with a few variants per signature; a reused variant is checked against
+    the current message like fresh LLM output.
+    
+    In speculative mode the LLM call never blocks a response: template
+    feedback is returned and the call runs on a background pool, one per
+    signature at a time. Its result is added to the LLM feedback cache,
+    so the next similar message gets LLM feedback, and can be awaited
+    with upgraded_feedback() (e.g. to push it to a client over a stream).
     """
     
+    AGE_RANGES = ("8-10", "11-13")
+    
     def __init__(
         self,
         mode: str = "hf_llm",
         age_range: str = "8-10",
         hf_api_key: Optional[str] = None,
-        hf_model_id: Optional[str] = None
+        hf_model_id: Optional[str] = None,
+        speculative: Optional[bool] = None
     ):
+        """
+        Args:
+            mode: "hf_llm" (LLM with template fallback) or anything else for templates only
+            age_range: Default age range
+            hf_api_key: HF API token (defaults to HF_API_KEY env var)
+            hf_model_id: LLM to use
+            speculative: Templates first, LLM in the background (default: config
+                or FEEDBACK_SPECULATIVE=1)
+        """
         self.mode = mode
         self.age_range = age_range
-        self.template_generator = TemplateGenerator(age_range=age_range)
+        self._templates = {age: TemplateGenerator(age_range=age) for age in self.AGE_RANGES}
+        cache_config = MODEL_CONFIG["feedback_cache"]
+        self.feedback_cache = (
+            FeedbackCache(max_size=cache_config["max_size"]) if cache_config["enabled"] else None
+        )
+        llm_cache_config = MODEL_CONFIG["llm_feedback_cache"]
+        self.llm_feedback_cache = (
+            LLMFeedbackCache.from_config(llm_cache_config) if llm_cache_config["enabled"] else None
+        )
+        self.llm_cost = StageCostModel(
+            {"feedback_llm": MODEL_CONFIG["deadlines"]["stage_cost_ms"]["feedback_llm"]},
+            half_life_s=MODEL_CONFIG["deadlines"]["cost_half_life_s"]
+        )
         
         # Initialize HF LLM (primary mode)
         self.hf_llm = None
+        self.llm_breaker = CircuitBreaker.from_config(
+            "hf_llm", MODEL_CONFIG["feedback"]["hf_llm"]["circuit_breaker"]
+        )
         if mode == "hf_llm":
             self.hf_llm = HuggingFaceLLMGenerator(
                 api_key=hf_api_key,
@@ -43,34 +95,96 @@ class FeedbackGenerator:
             if not self.hf_llm.is_available():
                 logger.warning("HF API key not available, will use template fallback")
         
-        logger.info(f"FeedbackGenerator initialized (mode={mode}, age_range={age_range})")
+        speculative_config = MODEL_CONFIG["feedback"]["speculative"]
+        if speculative is None:
+            speculative = speculative_config["enabled"] or os.getenv("FEEDBACK_SPECULATIVE") == "1"
+        self.speculative = speculative
+        self.max_upgrade_workers = speculative_config["max_workers"]
+        self.max_pending_upgrades = speculative_config["max_pending"]
+        self._upgrade_lock = threading.Lock()
+        self._upgrade_pool: Optional[ThreadPoolExecutor] = None
+        self._upgrade_pool_pid = None
+        self._upgrades: Dict[tuple, Future] = {}  # signature -> running upgrade
+        self._upgrade_stats = {"scheduled": 0, "upgraded": 0, "failed": 0, "dropped": 0}
+        
+        logger.info(f"FeedbackGenerator initialized (mode={mode}, age_range={age_range}, speculative={speculative})")
     
     def generate(
         self,
         message: str,
         classification: Classification,
-        analysis: AnalysisResult
-    ) -> Tuple[Optional[Feedback], Optional[Educational], bool]:
+        analysis: AnalysisResult,
+        deadline: Optional[Deadline] = None,
+        age_range: Optional[str] = None
+    ) -> Tuple[Optional[Feedback], Optional[Educational], bool, Optional[FeedbackSource]]:
         """
         Generate feedback and educational content.
         
+        Args:
+            message: Original message
+            classification: Message classification
+            analysis: Analysis result
+            deadline: Optional latency budget. If the LLM call no longer fits,
+                templates are used and "feedback_llm" is recorded on the deadline.
+            age_range: Age range for this message (defaults to the generator's)
+        
         Returns:
-            Tuple of (Feedback, Educational, used_llm)
+            Tuple of (Feedback, Educational, used_llm, source)
         """
         if classification == Classification.GREEN:
-            return None, None, False
+            return None, None, False, None
         
         feedback = None
         educational = None
         used_llm = False
         
+        age_range = age_range or self.age_range
+        deadline = deadline or Deadline()
+        use_llm = self.mode == "hf_llm" and self.hf_llm and self.hf_llm.is_available()
+        
+        signature = self.hf_llm.prompt_signature(message, classification, analysis, age_range) if use_llm else None
+        # While the circuit is open the API is known to be failing: no calls, not even in the background
+        circuit_open = use_llm and self.llm_breaker.state == BreakerState.OPEN
+        
+        # LLM feedback already generated for a message with the same signature
+        if use_llm and self.llm_feedback_cache:
+            feedback = self._cached_llm_feedback(signature, message)
+            if feedback is not None:
+                if self.speculative and not circuit_open and self.llm_feedback_cache.needs_variants(signature):
+                    self._schedule_upgrade(signature, message, classification, analysis, age_range)
+                educational = self.hf_llm.generate_educational(classification, analysis)
+                return feedback, educational, True, FeedbackSource.LLM_CACHE
+        
+        # Speculative: templates now, the LLM call in the background (unless shed under load)
+        if use_llm and self.speculative and "feedback_llm" not in deadline.disabled:
+            feedback, educational = self._template_feedback(message, classification, analysis, age_range)
+            if not circuit_open and self._schedule_upgrade(signature, message, classification, analysis, age_range):
+                return feedback, educational, False, FeedbackSource.SPECULATIVE
+            return feedback, educational, False, FeedbackSource.TEMPLATE
+        
+        if use_llm and not deadline.permits("feedback_llm", self.llm_cost.estimate("feedback_llm")):
+            use_llm = False
+        # While the circuit is open the API is known to be failing: go straight to templates
+        if use_llm and not self.llm_breaker.allow():
+            use_llm = False
+        
         # Try HF LLM first (primary mode)
-        if self.mode == "hf_llm" and self.hf_llm and self.hf_llm.is_available():
+        if use_llm:
+            start, elapsed_ms = time.perf_counter(), None
             try:
-                feedback = self.hf_llm.generate(message, classification, analysis)
+                feedback = self.hf_llm.generate(
+                    message, classification, analysis,
+                    timeout=deadline.timeout_s(self.hf_llm.timeout),
+                    age_range=age_range
+                )
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                self.llm_cost.observe("feedback_llm", elapsed_ms)
+                self.llm_breaker.record(feedback is not None, elapsed_ms)
                 if feedback:
                     # Validate feedback doesn't contain profanity
                     if self._validate_feedback(feedback):
+                        if self.llm_feedback_cache:
+                            self.llm_feedback_cache.add(signature, feedback.model_copy(deep=True))
                         # Filter out alternatives that are too similar to original message
                         feedback.suggested_alternatives = self._filter_original_message(
                             feedback.suggested_alternatives, message
@@ -87,19 +201,174 @@ class FeedbackGenerator:
                         logger.warning("HF LLM feedback contained profanity, falling back to templates")
                         feedback = None
             except Exception as e:
+                if elapsed_ms is None:  # The call itself raised
+                    self.llm_breaker.record(False)
                 logger.warning(f"HF LLM generation failed, using templates: {e}")
         
         # Fall back to templates if HF LLM unavailable or failed
         if feedback is None:
-            feedback = self.template_generator.generate(message, classification, analysis)
-            if feedback and feedback.suggested_alternatives:
-                feedback.suggested_alternatives = self._filter_original_message(
-                    feedback.suggested_alternatives, message
-                )
-            educational = self.template_generator.generate_educational(classification, analysis)
+            feedback, educational = self._template_feedback(message, classification, analysis, age_range)
             logger.debug("Used templates for feedback")
         
-        return feedback, educational, used_llm
+        return feedback, educational, used_llm, FeedbackSource.LLM if used_llm else FeedbackSource.TEMPLATE
+    
+    def _upgrade_executor(self) -> ThreadPoolExecutor:
+        """Background pool for LLM upgrades (a forked worker starts its own). Call under _upgrade_lock."""
+        if self._upgrade_pool_pid != os.getpid():
+            self._upgrade_pool = ThreadPoolExecutor(
+                max_workers=self.max_upgrade_workers, thread_name_prefix="feedback-upgrade"
+            )
+            self._upgrade_pool_pid = os.getpid()
+            self._upgrades = {}  # Upgrades of the parent never finish here
+        return self._upgrade_pool
+    
+    def _schedule_upgrade(
+        self,
+        signature: tuple,
+        message: str,
+        classification: Classification,
+        analysis: AnalysisResult,
+        age_range: str
+    ) -> Optional[Future]:
+        """
+        Run the LLM call for a signature in the background (joining a
+        running one). Returns None if too many upgrades are pending.
+        """
+        with self._upgrade_lock:
+            future = self._upgrades.get(signature)
+            if future is not None:
+                return future
+            if len(self._upgrades) >= self.max_pending_upgrades:
+                self._upgrade_stats["dropped"] += 1
+                return None
+            future = self._upgrade_executor().submit(
+                self._upgrade, signature, message, classification, analysis, age_range
+            )
+            self._upgrades[signature] = future
+            self._upgrade_stats["scheduled"] += 1
+        
+        def done(_):
+            with self._upgrade_lock:
+                if self._upgrades.get(signature) is future:
+                    del self._upgrades[signature]
+        
+        future.add_done_callback(done)
+        return future
+    
+    def _upgrade(
+        self,
+        signature: tuple,
+        message: str,
+        classification: Classification,
+        analysis: AnalysisResult,
+        age_range: str
+    ) -> Optional[Feedback]:
+        """Background LLM call; a validated result is cached for the signature."""
+        feedback = None
+        if self.llm_breaker.allow():
+            start = time.perf_counter()
+            try:
+                feedback = self.hf_llm.generate(message, classification, analysis, age_range=age_range)
+            except Exception as e:
+                logger.warning(f"Background LLM feedback failed: {e}")
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.llm_cost.observe("feedback_llm", elapsed_ms)
+            self.llm_breaker.record(feedback is not None, elapsed_ms)
+        
+        if feedback is None or not self._validate_feedback(feedback):
+            with self._upgrade_lock:
+                self._upgrade_stats["failed"] += 1
+            return None
+        
+        if self.llm_feedback_cache:
+            self.llm_feedback_cache.add(signature, feedback)
+        with self._upgrade_lock:
+            self._upgrade_stats["upgraded"] += 1
+        return feedback
+    
+    async def upgraded_feedback(
+        self,
+        message: str,
+        classification: Classification,
+        analysis: AnalysisResult,
+        age_range: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> Optional[Feedback]:
+        """
+        Wait for the background LLM feedback of a speculative response.
+        
+        Returns:
+            LLM feedback checked against this message, or None if there is
+            none (no upgrade running, it failed, or `timeout` passed)
+        """
+        if not (self.speculative and self.hf_llm):
+            return None
+        signature = self.hf_llm.prompt_signature(message, classification, analysis, age_range or self.age_range)
+        with self._upgrade_lock:
+            future = self._upgrades.get(signature)
+        if future is None:
+            # Already finished (or never started): use what it cached, if anything
+            return self._cached_llm_feedback(signature, message) if self.llm_feedback_cache else None
+        
+        try:
+            # shield: a client giving up must not cancel the upgrade for everyone else
+            variant = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return self._reuse(variant, message) if variant is not None else None
+    
+    def _cached_llm_feedback(self, signature: tuple, message: str) -> Optional[Feedback]:
+        """
+        A cached LLM variant that passes the checks for this message, or None.
+        In speculative mode a signature is served before it has all its variants.
+        """
+        variants = self.llm_feedback_cache.get(signature, partial=self.speculative)
+        for variant in variants:
+            feedback = self._reuse(variant, message)
+            if feedback is not None:
+                return feedback
+        if variants:
+            self.llm_feedback_cache.reject()
+        return None
+    
+    def _reuse(self, variant: Feedback, message: str) -> Optional[Feedback]:
+        """A copy of shared LLM feedback with alternatives filtered for this message (None if unusable)."""
+        if not self._validate_feedback(variant):
+            return None
+        alternatives = self._filter_original_message(variant.suggested_alternatives, message)
+        if not alternatives:
+            return None
+        return variant.model_copy(update={"suggested_alternatives": alternatives})
+    
+    def _template_feedback(
+        self,
+        message: str,
+        classification: Classification,
+        analysis: AnalysisResult,
+        age_range: str
+    ) -> Tuple[Feedback, Educational]:
+        """Template feedback, reused across messages with the same signature."""
+        template_generator = self.template_generator(age_range)
+        
+        entry = None
+        if self.feedback_cache:
+            signature = template_generator.signature(message, classification, analysis)
+            entry = self.feedback_cache.get(signature)
+        if entry is None:
+            entry = (
+                template_generator.generate_reusable(message, classification, analysis),
+                template_generator.generate_educational(classification, analysis)
+            )
+            if self.feedback_cache:
+                self.feedback_cache.set(signature, entry)
+        
+        # The cached entry is shared; only the alternatives depend on the wording
+        feedback, educational = entry
+        alternatives = template_generator.filter_alternatives(feedback.suggested_alternatives, message)
+        feedback = feedback.model_copy(update={
+            "suggested_alternatives": self._filter_original_message(alternatives, message)
+        })
+        return feedback, educational.model_copy()
     
     def _validate_feedback(self, feedback: Feedback) -> bool:
         """Validate that feedback doesn't contain profanity."""
@@ -162,19 +431,38 @@ class FeedbackGenerator:
         
         return filtered
     
+    def template_generator(self, age_range: Optional[str] = None) -> TemplateGenerator:
+        """Get the prebuilt template generator for an age range."""
+        return self._templates.get(age_range or self.age_range, self._templates["8-10"])
+    
     def set_age_range(self, age_range: str):
-        """Update age range."""
+        """Update the default age range (used when generate() is not given one)."""
         self.age_range = age_range
-        self.template_generator = TemplateGenerator(age_range=age_range)
         if self.hf_llm:
             self.hf_llm.age_range = age_range
     
+    def clear_caches(self):
+        """Drop cached template and LLM feedback."""
+        if self.feedback_cache:
+            self.feedback_cache.clear()
+        if self.llm_feedback_cache:
+            self.llm_feedback_cache.clear()
+    
+    def _speculative_stats(self) -> dict:
+        with self._upgrade_lock:
+            return {"enabled": self.speculative, "pending": len(self._upgrades), **self._upgrade_stats}
+    
     def get_status(self) -> dict:
         """Get generator status."""
         status = {
             "mode": self.mode,
             "age_range": self.age_range,
-            "template_available": True
+            "template_available": True,
+            "cache": self.feedback_cache.get_stats() if self.feedback_cache else {"enabled": False},
+            "llm_cache": self.llm_feedback_cache.get_stats() if self.llm_feedback_cache else {"enabled": False},
+            "llm_cost_ms": self.llm_cost.get_stats(),
+            "circuit_breaker": self.llm_breaker.get_stats(),
+            "speculative": self._speculative_stats()
         }
         
         if self.hf_llm:
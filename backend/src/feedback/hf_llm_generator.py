@@ -5,21 +5,21 @@ Uses Hugging Face's free Inference API for generating personalized feedback.
 """
 
 import os
+import time
+import asyncio
 import logging
-from typing import Optional
+from typing import Optional, List, Tuple
 from dotenv import load_dotenv
 
 from ..models import Classification, AnalysisResult, Feedback, Educational, DetectedIssue
+from .http_client import PooledHTTPClient, shared_http_client
 
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-# Import requests at module level
-import requests
-
-# Try to use InferenceClient (recommended), fall back to requests
+# Try to use InferenceClient (recommended), fall back to the HTTP API
 try:
     from huggingface_hub import InferenceClient
     HAS_INFERENCE_CLIENT = True
@@ -48,7 +48,8 @@ class HuggingFaceLLMGenerator:
         api_key: Optional[str] = None,
         model_id: Optional[str] = None,
         age_range: str = "8-10",
-        timeout: int = 30
+        timeout: int = 30,
+        http_client: Optional[PooledHTTPClient] = None
     ):
         """
         Initialize Hugging Face LLM generator.
@@ -58,11 +59,16 @@ class HuggingFaceLLMGenerator:
             model_id: Model to use (defaults to Mistral-7B-Instruct)
             age_range: Age range for feedback (8-10 or 11-13)
             timeout: Request timeout in seconds
+            http_client: Connection pool for the HTTP API (default: the shared pool)
         """
         self.api_key = api_key or os.getenv("HF_API_KEY")
         self.model_id = model_id or self.DEFAULT_MODEL
         self.age_range = age_range
         self.timeout = timeout
+        self.http = http_client or shared_http_client()
+        self._flavour: Optional[str] = None  # API flavour known to work for this model
+        # Router endpoint for the HTTP flavour (old api-inference endpoint is deprecated)
+        self.api_url = os.getenv("HF_API_URL") or f"https://router.huggingface.co/models/{self.model_id}"
         
         if not self.api_key:
             logger.warning(
@@ -73,21 +79,17 @@ class HuggingFaceLLMGenerator:
         # Initialize InferenceClient if available (handles new router endpoint automatically)
         if HAS_INFERENCE_CLIENT and self.api_key:
             try:
-                self.client = InferenceClient(model=self.model_id, token=self.api_key)
+                self.client = InferenceClient(model=self.model_id, token=self.api_key, timeout=self.timeout)
                 self.use_client = True
                 logger.info(f"HuggingFaceLLMGenerator initialized with InferenceClient (model={self.model_id})")
             except Exception as e:
-                logger.warning(f"Failed to initialize InferenceClient: {e}, falling back to requests")
+                logger.warning(f"Failed to initialize InferenceClient: {e}, falling back to HTTP API")
                 self.client = None
                 self.use_client = False
-                # Fallback to router endpoint
-                self.api_url = f"https://router.huggingface.co/models/{self.model_id}"
         else:
             self.client = None
             self.use_client = False
-            # Use router endpoint (old api-inference endpoint is deprecated)
-            self.api_url = f"https://router.huggingface.co/models/{self.model_id}"
-            logger.info(f"HuggingFaceLLMGenerator initialized with requests (model={self.model_id})")
+            logger.info(f"HuggingFaceLLMGenerator initialized with pooled HTTP client (model={self.model_id})")
     
     def is_available(self) -> bool:
         """Check if API key is configured."""
@@ -97,11 +99,21 @@ class HuggingFaceLLMGenerator:
         self,
         message: str,
         classification: Classification,
-        analysis: AnalysisResult
+        analysis: AnalysisResult,
+        timeout: Optional[float] = None,
+        age_range: Optional[str] = None
     ) -> Optional[Feedback]:
         """
         Generate feedback using Hugging Face API.
         
+        Args:
+            message: Original message
+            classification: Message classification
+            analysis: Analysis result
+            timeout: Time budget in seconds for this call, shared by every API
+                flavour tried (defaults to the generator timeout per flavour)
+            age_range: Age range for this message (defaults to the generator's)
+        
         Returns:
             Feedback object or None if generation fails
         """
@@ -110,8 +122,33 @@ class HuggingFaceLLMGenerator:
             return None
         
         try:
-            prompt = self._build_prompt(message, classification, analysis)
-            response_text = self._call_api(prompt)
+            prompt = self._build_prompt(message, classification, analysis, age_range)
+            response_text = self._call_api(prompt, timeout=timeout)
+            
+            if response_text:
+                return self._parse_response(response_text, message, analysis)
+            
+        except Exception as e:
+            logger.warning(f"HF API generation failed: {e}")
+        
+        return None
+    
+    async def agenerate(
+        self,
+        message: str,
+        classification: Classification,
+        analysis: AnalysisResult,
+        timeout: Optional[float] = None,
+        age_range: Optional[str] = None
+    ) -> Optional[Feedback]:
+        """Async variant of generate(), on the pooled async client."""
+        if not self.is_available():
+            logger.warning("HF API key not available, cannot generate feedback")
+            return None
+        
+        try:
+            prompt = self._build_prompt(message, classification, analysis, age_range)
+            response_text = await self._acall_api(prompt, timeout=timeout)
             
             if response_text:
                 return self._parse_response(response_text, message, analysis)
@@ -125,23 +162,16 @@ class HuggingFaceLLMGenerator:
         self,
         message: str,
         classification: Classification,
-        analysis: AnalysisResult
+        analysis: AnalysisResult,
+        age_range: Optional[str] = None
     ) -> str:
         """Build detailed prompt for LLM."""
+        age_range = age_range or self.age_range
         issues = ", ".join([i.value.replace("_", " ") for i in analysis.detected_issues]) or "communication issue"
         emotion = analysis.emotion.primary_emotion.value
         
         # Extract specific items from message for context
-        message_lower = message.lower()
-        specific_items = []
-        if "drawing" in message_lower or "art" in message_lower:
-            specific_items.append("drawing")
-        if "game" in message_lower or "playing" in message_lower:
-            specific_items.append("game")
-        if "haircut" in message_lower or "hair" in message_lower:
-            specific_items.append("haircut")
-        if "shirt" in message_lower or "clothes" in message_lower:
-            specific_items.append("clothing")
+        specific_items = self._specific_items(message)
         
         context_note = ""
         if specific_items:
@@ -150,10 +180,10 @@ class HuggingFaceLLMGenerator:
         
         # Add explicit warning about profanity
         profanity_warning = ""
-        if analysis.patterns.profanity_detected or DetectedIssue.PROFANITY in analysis.detected_issues:
+        if self._has_profanity(analysis):
             profanity_warning = "\n\n⚠️ CRITICAL RULES - READ CAREFULLY:\n- The original message contains profanity.\n- NEVER repeat or include ANY profanity in your response.\n- NEVER include profanity in your suggestions or alternatives.\n- Only suggest clean, appropriate, child-friendly alternatives.\n- Do not quote the profanity back - just acknowledge the feeling.\n- Examples of BAD alternatives: 'fuck you', 'shit', 'damn'\n- Examples of GOOD alternatives: 'I'm frustrated', 'I'm upset', 'I need a break'"
         
-        prompt = f"""You are a helpful communication coach for children (age {self.age_range}).
+        prompt = f"""You are a helpful communication coach for children (age {age_range}).
 
 A child said: "{message}"
 
@@ -183,57 +213,176 @@ Your response (clean, no profanity, no original message):"""
         
         return prompt
     
-    def _call_api(self, prompt: str) -> Optional[str]:
-        """Call Hugging Face Inference API using InferenceClient or requests."""
+    def _flavours(self) -> List[str]:
+        """API flavours to try, in order: the one known to work, else all of them."""
+        if self._flavour:
+            return [self._flavour]
+        flavours = ["text_generation", "chat_completion"] if self.use_client and self.client else []
+        return flavours + ["http"]
+    
+    @staticmethod
+    def _specific_items(message: str) -> List[str]:
+        """Things the child mentioned that the feedback should refer to."""
+        message_lower = message.lower()
+        specific_items = []
+        if "drawing" in message_lower or "art" in message_lower:
+            specific_items.append("drawing")
+        if "game" in message_lower or "playing" in message_lower:
+            specific_items.append("game")
+        if "haircut" in message_lower or "hair" in message_lower:
+            specific_items.append("haircut")
+        if "shirt" in message_lower or "clothes" in message_lower:
+            specific_items.append("clothing")
+        return specific_items
+    
+    @staticmethod
+    def _has_profanity(analysis: AnalysisResult) -> bool:
+        return analysis.patterns.profanity_detected or DetectedIssue.PROFANITY in analysis.detected_issues
+    
+    def prompt_signature(
+        self,
+        message: str,
+        classification: Classification,
+        analysis: AnalysisResult,
+        age_range: Optional[str] = None
+    ) -> Tuple:
+        """
+        Everything the prompt depends on apart from the message wording:
+        messages with the same signature can share LLM feedback.
+        """
+        return (
+            self.model_id,
+            classification.value,
+            tuple(issue.value for issue in analysis.detected_issues),
+            analysis.emotion.primary_emotion.value,
+            age_range or self.age_range,
+            tuple(self._specific_items(message)),
+            self._has_profanity(analysis),
+        )
+    
+    def _call_api(self, prompt: str, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Call Hugging Face Inference API using InferenceClient or the pooled HTTP client.
+        
+        The first flavour that returns text is remembered and used alone from
+        then on, so a failing call costs one attempt instead of three. If the
+        remembered flavour fails, the next call probes all of them again.
+        
+        A `timeout` is a budget for the whole call: each flavour gets what the
+        previous ones left.
+        """
+        if timeout is not None and timeout <= 0:
+            logger.warning("No time left for HF API call")
+            return None
         
-        # Use InferenceClient if available (recommended - handles new endpoint automatically)
-        if self.use_client and self.client:
+        expires = time.monotonic() + timeout if timeout is not None else None
+        for flavour in self._flavours():
+            remaining = expires - time.monotonic() if expires is not None else None
+            if remaining is not None and remaining <= 0:
+                logger.warning(f"No time left for HF API ({flavour})")
+                break
             try:
-                # Try text generation first
-                try:
-                    response = self.client.text_generation(
-                        prompt,
-                        max_new_tokens=300,  # Increased to allow longer responses
-                        temperature=0.7,
-                        top_p=0.9,
-                        do_sample=True,
-                        return_full_text=False
-                    )
-                    text = response.strip()
-                except Exception:
-                    # If text_generation fails, try conversational API
-                    # For instruction-tuned models, we format as a conversation
-                    response = self.client.chat_completion(
-                        messages=[{"role": "user", "content": prompt}],
-                        max_tokens=300,  # Increased to allow longer responses
-                        temperature=0.7,
-                        top_p=0.9
-                    )
-                    # Extract text from chat completion response
-                    if isinstance(response, dict) and "choices" in response:
-                        text = response["choices"][0]["message"]["content"]
-                    else:
-                        text = str(response)
-                    text = text.strip()
-                
-                # Remove prompt if model included it
-                if prompt in text:
-                    text = text.replace(prompt, "").strip()
-                
-                return text if text else None
-                
+                text = self._call_flavour(flavour, prompt, remaining)
             except Exception as e:
-                logger.warning(f"HF InferenceClient failed: {e}, trying requests fallback")
-                # Fall through to requests fallback
+                logger.warning(f"HF API ({flavour}) failed: {e}")
+                text = None
+            
+            if text:
+                if self._flavour != flavour:
+                    logger.info(f"HF API flavour for {self.model_id}: {flavour}")
+                    self._flavour = flavour
+                return text
+            if self._flavour == flavour:
+                self._flavour = None
+        
+        return None
+    
+    def _call_flavour(self, flavour: str, prompt: str, timeout: Optional[float]) -> Optional[str]:
+        """One API call: InferenceClient text generation or chat, or the HTTP API."""
+        if flavour == "http":
+            # HTTP API (for older huggingface_hub versions or if InferenceClient fails)
+            response = self.http.post(
+                self.api_url,
+                headers=self._headers(),
+                json=self._payload(prompt),
+                timeout=timeout if timeout is not None else self.timeout
+            )
+            return self._read_response(response, prompt)
+        
+        client = self._client_for(timeout)
+        if flavour == "text_generation":
+            response = client.text_generation(
+                prompt,
+                max_new_tokens=300,  # Increased to allow longer responses
+                temperature=0.7,
+                top_p=0.9,
+                do_sample=True,
+                return_full_text=False
+            )
+            text = response.strip()
+        else:
+            # Conversational API: for instruction-tuned models, we format as a conversation
+            response = client.chat_completion(
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=300,  # Increased to allow longer responses
+                temperature=0.7,
+                top_p=0.9
+            )
+            # Extract text from chat completion response
+            if isinstance(response, dict) and "choices" in response:
+                text = response["choices"][0]["message"]["content"]
+            else:
+                text = str(response)
+            text = text.strip()
+        
+        # Remove prompt if model included it
+        if prompt in text:
+            text = text.replace(prompt, "").strip()
         
-        # Fallback to requests (for older huggingface_hub versions or if InferenceClient fails)
+        return text if text else None
+    
+    def _client_for(self, timeout: Optional[float]):
+        """
+        InferenceClient honouring `timeout`.
+        
+        The client's timeout is fixed at construction and its methods take no
+        per-call timeout, so a deadline gets a client of its own (cheap: the
+        HTTP session underneath is shared).
+        """
+        if timeout is None or timeout == self.timeout:
+            return self.client
+        return InferenceClient(model=self.model_id, token=self.api_key, timeout=timeout)
+    
+    async def _acall_api(self, prompt: str, timeout: Optional[float] = None) -> Optional[str]:
+        """Async variant of _call_api (InferenceClient calls run in a thread)."""
+        if self._flavours() != ["http"]:
+            return await asyncio.to_thread(self._call_api, prompt, timeout)
+        
+        if timeout is not None and timeout <= 0:
+            logger.warning("No time left for HF API call")
+            return None
         
-        headers = {
+        try:
+            response = await self.http.apost(
+                self.api_url,
+                headers=self._headers(),
+                json=self._payload(prompt),
+                timeout=timeout if timeout is not None else self.timeout
+            )
+        except Exception as e:
+            logger.warning(f"HF API request failed: {e}")
+            return None
+        
+        return self._read_response(response, prompt)
+    
+    def _headers(self) -> dict:
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
-        
-        payload = {
+    
+    def _payload(self, prompt: str) -> dict:
+        return {
             "inputs": prompt,
             "parameters": {
                 "max_new_tokens": 300,  # Increased to allow longer responses
@@ -243,15 +392,10 @@ Your response (clean, no profanity, no original message):"""
                 "top_p": 0.9,
             }
         }
-        
+    
+    def _read_response(self, response, prompt: str) -> Optional[str]:
+        """Generated text from an HTTP API response (None on errors)."""
         try:
-            response = requests.post(
-                self.api_url,
-                headers=headers,
-                json=payload,
-                timeout=self.timeout
-            )
-            
             if response.status_code == 200:
                 result = response.json()
                 
@@ -281,7 +425,7 @@ Your response (clean, no profanity, no original message):"""
                 return None
                 
         except Exception as e:
-            logger.warning(f"HF API request failed: {e}")
+            logger.warning(f"HF API response could not be read: {e}")
             return None
     
     def _contains_profanity(self, text: str) -> bool:
@@ -422,6 +566,8 @@ Your response (clean, no profanity, no original message):"""
             "provider": "huggingface",
             "model": self.model_id,
             "api_key_configured": self.is_available(),
-            "age_range": self.age_range
+            "age_range": self.age_range,
+            "api_flavour": self._flavour,
+            "http": self.http.get_stats()
         }
 
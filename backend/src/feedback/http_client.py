@@ -0,0 +1,222 @@
+"""
+Pooled HTTP client for LLM feedback calls.
+
+A bare requests.post() opens a new connection per call, so every feedback
+request pays DNS, TCP and TLS setup before the model even starts. The
+client here keeps connections alive in a pool shared by all callers, with
+separate connect and read timeouts, and uses HTTP/2 when the h2 package
+is installed (one multiplexed connection per host).
+
+Connection reuse is measured with httpx's trace hook: a request that
+opens no new connection went over a pooled one.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Optional, Dict, Any
+
+import httpx
+
+from ..config import MODEL_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Optional: HTTP/2 needs `pip install h2` (httpx[http2])
+try:
+    import h2  # noqa: F401
+    HAS_H2 = True
+except ImportError:
+    HAS_H2 = False
+
+
+class PooledHTTPClient:
+    """
+    Keep-alive connection pool with sync and async clients.
+
+    Thread-safe and fork-safe (a forked worker opens its own connections).
+    The async client belongs to the event loop that first uses it.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 20,
+        max_keepalive: int = 10,
+        keepalive_expiry_s: float = 60.0,
+        connect_timeout_s: float = 3.0,
+        read_timeout_s: float = 30.0,
+        http2: bool = True
+    ):
+        """
+        Args:
+            pool_size: Maximum open connections (per client)
+            max_keepalive: Idle connections kept open for reuse
+            keepalive_expiry_s: Seconds an idle connection is kept
+            connect_timeout_s: Timeout for opening a connection (incl. TLS)
+            read_timeout_s: Timeout for waiting on the response
+            http2: Use HTTP/2 if the h2 package is installed
+        """
+        self.limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry_s
+        )
+        self.connect_timeout_s = connect_timeout_s
+        self.read_timeout_s = read_timeout_s
+        self.http2 = http2 and HAS_H2
+
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+
+        self._requests = 0
+        self._connections = 0
+        self._connect_ms = 0.0
+        self._errors = 0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "PooledHTTPClient":
+        """Create from MODEL_CONFIG["feedback"]["hf_llm"]["http"]."""
+        return cls(
+            pool_size=config["pool_size"],
+            max_keepalive=config["max_keepalive"],
+            keepalive_expiry_s=config["keepalive_expiry_s"],
+            connect_timeout_s=config["connect_timeout_s"],
+            read_timeout_s=config["read_timeout_s"],
+            http2=config["http2"]
+        )
+
+    def timeout(self, read_timeout_s: Optional[float] = None) -> httpx.Timeout:
+        """Timeouts for one call; a shorter read timeout also caps the connect timeout."""
+        read = self.read_timeout_s if read_timeout_s is None else read_timeout_s
+        return httpx.Timeout(read, connect=min(self.connect_timeout_s, read))
+
+    def _check_pid(self):
+        # Pooled sockets must not be shared with a forked child
+        if self._pid != os.getpid():
+            self._client = self._async_client = None
+            self._pid = os.getpid()
+
+    @property
+    def client(self) -> httpx.Client:
+        with self._lock:
+            self._check_pid()
+            if self._client is None:
+                self._client = httpx.Client(limits=self.limits, timeout=self.timeout(), http2=self.http2)
+            return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        with self._lock:
+            self._check_pid()
+            if self._async_client is None:
+                self._async_client = httpx.AsyncClient(
+                    limits=self.limits, timeout=self.timeout(), http2=self.http2
+                )
+            return self._async_client
+
+    def _tracer(self):
+        """Trace callback for one request, and a function recording its outcome."""
+        opened = {"at": None, "ms": 0.0, "new": False}
+
+        def trace(event: str, info: Dict[str, Any]):
+            if event == "connection.connect_tcp.started":
+                opened["at"], opened["new"] = time.perf_counter(), True
+            elif event in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+                opened["ms"] = (time.perf_counter() - opened["at"]) * 1000
+
+        def record(failed: bool):
+            with self._lock:
+                self._requests += 1
+                self._errors += failed
+                if opened["new"]:
+                    self._connections += 1
+                    self._connect_ms += opened["ms"]
+
+        return trace, record
+
+    def post(self, url: str, timeout: Optional[float] = None, **kwargs) -> httpx.Response:
+        """
+        POST over a pooled connection.
+
+        Args:
+            url: Request URL
+            timeout: Read timeout for this call (default: read_timeout_s)
+            **kwargs: Passed to httpx (json, headers, ...)
+
+        Raises:
+            httpx.HTTPError: Connection failure or timeout
+        """
+        trace, record = self._tracer()
+        try:
+            response = self.client.post(
+                url, timeout=self.timeout(timeout), extensions={"trace": trace}, **kwargs
+            )
+        except httpx.HTTPError:
+            record(failed=True)
+            raise
+        record(failed=False)
+        return response
+
+    async def apost(self, url: str, timeout: Optional[float] = None, **kwargs) -> httpx.Response:
+        """Async variant of post()."""
+        trace, record = self._tracer()
+
+        async def async_trace(event: str, info: Dict[str, Any]):
+            trace(event, info)
+
+        try:
+            response = await self.async_client.post(
+                url, timeout=self.timeout(timeout), extensions={"trace": async_trace}, **kwargs
+            )
+        except httpx.HTTPError:
+            record(failed=True)
+            raise
+        record(failed=False)
+        return response
+
+    def close(self):
+        """Close the sync client's connections."""
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    async def aclose(self):
+        """Close both clients' connections."""
+        with self._lock:
+            client, self._async_client = self._async_client, None
+        if client is not None:
+            await client.aclose()
+        self.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Requests, connections opened and how often a pooled connection was reused."""
+        with self._lock:
+            reused = self._requests - self._connections
+            return {
+                "http2": self.http2,
+                "pool_size": self.limits.max_connections,
+                "max_keepalive": self.limits.max_keepalive_connections,
+                "requests": self._requests,
+                "errors": self._errors,
+                "connections_opened": self._connections,
+                "reused": reused,
+                "reuse_rate_percent": round(reused / self._requests * 100, 2) if self._requests else 0,
+                "avg_connect_ms": round(self._connect_ms / self._connections, 2) if self._connections else 0,
+            }
+
+
+_shared: Optional[PooledHTTPClient] = None
+_shared_lock = threading.Lock()
+
+
+def shared_http_client() -> PooledHTTPClient:
+    """The process-wide client, so all generators share one pool."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = PooledHTTPClient.from_config(MODEL_CONFIG["feedback"]["hf_llm"]["http"])
+        return _shared
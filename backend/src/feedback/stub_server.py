@@ -0,0 +1,135 @@
+"""
+Local stand-in for the Hugging Face Inference API.
+
+Answers POST /models/<model_id> in the API's text-generation format after
+an optional delay, and counts the connections it accepted, so the LLM
+feedback path and connection pooling can be tested offline.
+
+Usage:
+    python -m src.feedback.stub_server --port 8089 --delay-ms 300
+    HF_API_KEY=stub HF_API_URL=http://127.0.0.1:8089/models/stub python main.py --api
+"""
+
+import json
+import time
+import logging
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPLY = (
+    "That message could really hurt someone's feelings. "
+    'Instead, you could say "I don\'t agree with you" or "Can we talk about this?"'
+)
+
+
+class StubLLMServer:
+    """
+    HTTP/1.1 keep-alive server replying like the HF Inference API.
+
+    Use as a context manager, or start()/stop().
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, delay_ms: float = 0, reply: str = DEFAULT_REPLY):
+        """
+        Args:
+            host: Interface to bind
+            port: Port to bind (0 picks a free one)
+            delay_ms: Simulated generation time per request
+            reply: generated_text returned for every prompt
+        """
+        self.delay_ms = delay_ms
+        self.reply = reply
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def model_url(self, model_id: str = "stub") -> str:
+        return f"{self.url}/models/{model_id}"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep connections open between requests
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    json.loads(self.rfile.read(length) or b"{}")["inputs"]
+                except (ValueError, KeyError, TypeError):
+                    return self._reply(400, {"error": "Request body needs inputs"})
+                if not self.path.startswith("/models/"):
+                    return self._reply(404, {"error": "Model not found"})
+                with stub._lock:
+                    stub.requests += 1
+                time.sleep(stub.delay_ms / 1000)
+                self._reply(200, [{"generated_text": stub.reply}])
+
+            def _reply(self, status: int, body: Any):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True, name="stub-llm")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"requests": self.requests, "connections": self.connections}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Hugging Face Inference API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--delay-ms", type=float, default=0, help="Simulated generation time")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = StubLLMServer(args.host, args.port, delay_ms=args.delay_ms)
+    logger.info(f"Stub LLM listening on {server.model_url()}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
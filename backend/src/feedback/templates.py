@@ -3,7 +3,7 @@ Template-based Feedback Generator.
 """
 
 import random
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from ..models import Classification, AnalysisResult, Feedback, Educational, DetectedIssue, EmotionType
 
 
@@ -102,12 +102,25 @@ class TemplateGenerator:
         if classification == Classification.GREEN:
             return None
         
-        primary_issue = (analysis.detected_issues[0] if analysis.detected_issues 
-                        else DetectedIssue.HARSH_CRITICISM)
+        feedback = self.generate_reusable(message, classification, analysis)
+        feedback.suggested_alternatives = self.filter_alternatives(
+            feedback.suggested_alternatives, message
+        )
+        return feedback
+    
+    def generate_reusable(self, message: str, classification: Classification,
+                          analysis: AnalysisResult) -> Feedback:
+        """
+        Feedback shared by every message with the same `signature()`.
+        
+        Alternatives are the unfiltered candidates; pass them through
+        `filter_alternatives()` with the actual message before use.
+        """
+        primary_issue = self._primary_issue(analysis)
         
         main_message = self._build_main_message(message, analysis.emotion.primary_emotion, 
                                                 primary_issue, classification)
-        alternatives = self._get_alternatives(primary_issue, message)
+        alternatives = self._candidate_alternatives(primary_issue, message)
         tip = self.TIPS.get(primary_issue, self.TIPS[DetectedIssue.PERSONAL_ATTACK])
         
         return Feedback(
@@ -116,6 +129,59 @@ class TemplateGenerator:
             communication_tip=tip
         )
     
+    def signature(self, message: str, classification: Classification,
+                  analysis: AnalysisResult) -> Tuple:
+        """
+        Everything template feedback depends on.
+        
+        Messages with the same signature get the same feedback (apart from
+        the alternatives filtered against each message).
+        """
+        primary_issue = self._primary_issue(analysis)
+        topic = None
+        if primary_issue in (DetectedIssue.HARSH_CRITICISM, DetectedIssue.PERSONAL_ATTACK):
+            topic = self._context_topic(message)
+        return (
+            classification.value,
+            primary_issue.value,
+            analysis.emotion.primary_emotion.value,
+            self.age_range,
+            topic,
+            self._alternatives_topic(message),
+        )
+    
+    @staticmethod
+    def _primary_issue(analysis: AnalysisResult) -> DetectedIssue:
+        return analysis.detected_issues[0] if analysis.detected_issues else DetectedIssue.HARSH_CRITICISM
+    
+    @staticmethod
+    def _context_topic(message: str) -> Optional[str]:
+        """Topic the main message refers to, if any."""
+        message_lower = message.lower()
+        if "drawing" in message_lower or "art" in message_lower or "picture" in message_lower:
+            return "drawing"
+        if "game" in message_lower or "playing" in message_lower:
+            return "game"
+        if "haircut" in message_lower or "hair" in message_lower:
+            return "haircut"
+        if "shirt" in message_lower or "clothes" in message_lower or "outfit" in message_lower:
+            return "clothing"
+        if "food" in message_lower or "lunch" in message_lower or "dinner" in message_lower:
+            return "food"
+        return None
+    
+    @staticmethod
+    def _alternatives_topic(message: str) -> Optional[str]:
+        """Topic that adds context-specific alternatives, if any."""
+        message_lower = message.lower()
+        if "drawing" in message_lower or "art" in message_lower:
+            return "drawing"
+        if "game" in message_lower:
+            return "game"
+        if "haircut" in message_lower or "hair" in message_lower:
+            return "haircut"
+        return None
+    
     def _build_main_message(self, message: str, emotion: EmotionType, issue: DetectedIssue, 
                            classification: Classification) -> str:
         parts = []
@@ -124,22 +190,10 @@ class TemplateGenerator:
         parts.append(random.choice(ack_options))
         
         # Extract specific context from message for more nuanced feedback
-        message_lower = message.lower()
-        context_items = []
-        if "drawing" in message_lower or "art" in message_lower or "picture" in message_lower:
-            context_items.append("drawing")
-        if "game" in message_lower or "playing" in message_lower:
-            context_items.append("game")
-        if "haircut" in message_lower or "hair" in message_lower:
-            context_items.append("haircut")
-        if "shirt" in message_lower or "clothes" in message_lower or "outfit" in message_lower:
-            context_items.append("clothing")
-        if "food" in message_lower or "lunch" in message_lower or "dinner" in message_lower:
-            context_items.append("food")
+        item = self._context_topic(message)
         
         # Add context-specific explanation if we found something
-        if context_items and issue in [DetectedIssue.HARSH_CRITICISM, DetectedIssue.PERSONAL_ATTACK]:
-            item = context_items[0]
+        if item and issue in [DetectedIssue.HARSH_CRITICISM, DetectedIssue.PERSONAL_ATTACK]:
             if issue == DetectedIssue.HARSH_CRITICISM:
                 parts.append(f"When we say we don't like someone's {item}, it can hurt their feelings.")
             elif issue == DetectedIssue.PERSONAL_ATTACK:
@@ -154,18 +208,25 @@ class TemplateGenerator:
         return " ".join(parts)
     
     def _get_alternatives(self, issue: DetectedIssue, message: str = "") -> List[str]:
+        return self.filter_alternatives(self._candidate_alternatives(issue, message), message)
+    
+    def _candidate_alternatives(self, issue: DetectedIssue, message: str = "") -> List[str]:
         alternatives = self.SUGGESTIONS.get(issue, self.SUGGESTIONS[DetectedIssue.PERSONAL_ATTACK])[:3]
         
         # Add context-specific alternatives if we can identify the topic
-        message_lower = message.lower()
-        if "drawing" in message_lower or "art" in message_lower:
+        topic = self._alternatives_topic(message)
+        if topic == "drawing":
             alternatives.insert(0, "I'm not a fan of this style")
             alternatives.insert(1, "This isn't really my thing")
-        elif "game" in message_lower:
+        elif topic == "game":
             alternatives.insert(0, "I'm not enjoying this game right now")
-        elif "haircut" in message_lower or "hair" in message_lower:
+        elif topic == "haircut":
             alternatives.insert(0, "I prefer a different style")
         
+        return alternatives
+    
+    def filter_alternatives(self, alternatives: List[str], message: str) -> List[str]:
+        """Drop alternatives too similar to the original message; keep the top 3."""
         # Filter out alternatives that are too similar to the original message
         filtered = []
         original_lower = message.lower().strip()
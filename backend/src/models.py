@@ -80,12 +80,22 @@ class PatternResult(BaseModel):
     matched_patterns: List[str] = Field(default_factory=list)
 
 
+class ConversationSignal(BaseModel):
+    """Aggregate flags from a child's recent messages in one conversation."""
+    window_size: int = 0
+    repetition_detected: bool = False
+    escalation_detected: bool = False
+    repeated_issues: List[DetectedIssue] = Field(default_factory=list)
+    flagged: bool = False
+
+
 class AnalysisResult(BaseModel):
     toxicity: ToxicityResult
     emotion: EmotionResult
     patterns: PatternResult
     detected_issues: List[DetectedIssue] = Field(default_factory=list)
     intent: IntentType = IntentType.NEUTRAL
+    conversation: Optional[ConversationSignal] = None
 
 
 class Feedback(BaseModel):
@@ -100,12 +110,23 @@ class Educational(BaseModel):
     follow_up_question: Optional[str] = None
 
 
+class FeedbackSource(str, Enum):
+    LLM = "llm"                            # LLM call for this message
+    LLM_CACHE = "llm_cache"                # LLM variant cached for a similar message
+    TEMPLATE = "template"                  # Templates (no LLM, or it failed)
+    SPECULATIVE = "template_speculative"   # Templates now, LLM upgrade running in the background
+
+
 class ProcessingMetadata(BaseModel):
     processing_time_ms: float
     model_versions: Dict[str, str] = Field(default_factory=dict)
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     used_llm: bool = False
     fallback_used: bool = False
+    degraded_stages: List[str] = Field(default_factory=list)
+    cache_hit: bool = False
+    known_green: bool = False  # Canned GREEN result from the known-GREEN set
+    feedback_source: Optional[FeedbackSource] = None  # None when there is no feedback
 
 
 class ProcessingResult(BaseModel):
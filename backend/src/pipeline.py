@@ -6,23 +6,43 @@ Features:
 - Hugging Face LLM feedback generation (with template fallback)
 - Response caching
 - Graceful fallbacks
+- Per-request latency budgets
+- Load-adaptive degradation
+- Priority lanes for safety-critical messages
+- Demand-driven analysis (only compute what the caller needs)
+- Per-conversation repetition/escalation tracking
+- Coalescing of identical in-flight messages
+- Cache namespaces per model/rule version
 """
 
+import os
 import time
 import logging
-from typing import Optional, Dict, Any
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List
 from datetime import datetime, timezone
 
 from .models import (
     ProcessingResult, ProcessingMetadata, Classification, 
     AnalysisResult, ToxicityResult, EmotionResult, PatternResult,
-    EmotionType, IntentType
+    EmotionType, IntentType, FeedbackSource, Feedback
 )
 from .preprocessor import TextPreprocessor
-from .analyzer import SafetyAnalyzer
+from .analyzer import (
+    SafetyAnalyzer, ConversationWindowAnalyzer, ToxicityAnalyzer, EmotionAnalyzer, PatternAnalyzer,
+    HateSpeechAnalyzer, SexualContentAnalyzer, SelfHarmAnalyzer, BullyingAnalyzer
+)
 from .classifier import DecisionEngine
-from .feedback import FeedbackGenerator
-from .cache import ResponseCache
+from .feedback import FeedbackGenerator, TemplateGenerator, HuggingFaceLLMGenerator
+from .cache import CachedResponse, GreenFingerprintSet, CacheAnalytics, create_cache, cache_key
+from .cache.warm_start import read_exports
+from .cache.namespace import rules_version, cache_namespace
+from .cache.snapshot import supports_snapshots, save_snapshot, restore_snapshot
+from .config import MODEL_CONFIG
+from .serving import (
+    Deadline, LoadController, PriorityScheduler, Lane, RemoteInferenceClient, SingleFlight,
+    process_memory
+)
 
 logger = logging.getLogger(__name__)
 
@@ -33,8 +53,21 @@ class MessageProcessor:
     
     Uses ML classification models and Hugging Face LLM for personalized feedback.
     Falls back to templates if HF API is unavailable.
+    
+    process() and friends are safe to call from many threads; see
+    docs/THREAD_SAFETY.md.
     """
     
+    # Messages per batch_process() call during warm start
+    WARM_START_BATCH = 32
+    
+    # Classes whose rules (keywords, patterns, flags), templates and prompts decide results
+    RULE_PACKS = (
+        TextPreprocessor, ToxicityAnalyzer, EmotionAnalyzer, PatternAnalyzer, HateSpeechAnalyzer,
+        SexualContentAnalyzer, SelfHarmAnalyzer, BullyingAnalyzer, SafetyAnalyzer, DecisionEngine,
+        FeedbackGenerator, TemplateGenerator, HuggingFaceLLMGenerator
+    )
+    
     def __init__(
         self,
         use_models: bool = True,
@@ -42,16 +75,26 @@ class MessageProcessor:
         feedback_mode: str = "hf_llm",
         age_range: str = "8-10",
         cache_enabled: bool = True,
-        cache_max_size: int = 1000,
+        cache_max_size: Optional[int] = None,
         hf_api_key: Optional[str] = None,
-        hf_model_id: Optional[str] = None
+        hf_model_id: Optional[str] = None,
+        inference_socket: Optional[str] = None
     ):
         logger.info(f"Initializing MessageProcessor (models={use_models}, feedback={feedback_mode})")
         start = time.time()
         
         # Initialize components
         self.preprocessor = TextPreprocessor(max_length=500)
-        self.analyzer = SafetyAnalyzer(use_models=use_models, device=device)
+        # With an inference server, the ML models run there instead of here
+        inference_client = None
+        if inference_socket:
+            inference_client = RemoteInferenceClient(
+                inference_socket,
+                timeout_ms=MODEL_CONFIG["inference_server"]["timeout_ms"]
+            )
+        self.analyzer = SafetyAnalyzer(
+            use_models=use_models, device=device, inference_client=inference_client
+        )
         self.decision_engine = DecisionEngine()
         self.feedback_generator = FeedbackGenerator(
             mode=feedback_mode,
@@ -62,13 +105,55 @@ class MessageProcessor:
         
         # Initialize cache
         self.cache_enabled = cache_enabled
-        self.cache = ResponseCache(max_size=cache_max_size) if cache_enabled else None
+        self.cache = create_cache(MODEL_CONFIG["cache"], max_size=cache_max_size) if cache_enabled else None
+        
+        # Optional reuse-distance sampling for cache sizing
+        analytics_config = MODEL_CONFIG["cache_analytics"]
+        self.cache_analytics = None
+        if cache_enabled and (analytics_config["enabled"] or os.getenv("CACHE_ANALYTICS") == "1"):
+            self.cache_analytics = CacheAnalytics.from_config(analytics_config)
+        
+        # Switches to cheaper modes under load
+        self.load_controller = LoadController.from_config(MODEL_CONFIG["load_control"])
+        
+        # Priority lanes in front of the model stage (only useful with models loaded)
+        self.scheduler = PriorityScheduler.from_config(MODEL_CONFIG["scheduler"])
+        self.scheduler.enabled = self.scheduler.enabled and self.analyzer.models_loaded()
+        
+        # Identical messages in flight at the same time are computed once
+        self.single_flight = SingleFlight()
+        
+        # Recent messages per child/conversation
+        self.conversation_analyzer = ConversationWindowAnalyzer(**MODEL_CONFIG["conversation"])
         
         # Store config
         self._use_models = use_models
         self._device = device
         self._age_range = age_range
         self._feedback_mode = feedback_mode
+        self._default_budget_ms = MODEL_CONFIG["deadlines"]["default_budget_ms"]
+        self._warm_start_stats: Optional[Dict[str, Any]] = None
+        self._snapshot_stats: Optional[Dict[str, Any]] = None
+        self._snapshot_path = os.getenv("CACHE_SNAPSHOT_PATH", MODEL_CONFIG["cache_snapshot"]["path"])
+        
+        # Cached results are only reused within the same models/rules/feedback mode
+        self._rules_version = rules_version(self.RULE_PACKS)
+        self.cache_namespace = cache_namespace(self._get_model_versions(), feedback_mode)
+        if self.cache:
+            self.cache.set_namespace(self.cache_namespace)
+        
+        # Known-GREEN fingerprints (consulted before the response cache)
+        green_config = MODEL_CONFIG["known_green"]
+        self.green_set = None
+        self._green_path = os.getenv("GREEN_SET_PATH", green_config["path"])
+        if cache_enabled and green_config["enabled"]:
+            self.green_set = GreenFingerprintSet(
+                capacity=green_config["capacity"],
+                version=self.cache_namespace
+            )
+            if self._green_path:
+                self.green_set.load(self._green_path)
+        self._known_green_response = CachedResponse.from_result(self._known_green_result())
         
         init_time = time.time() - start
         logger.info(f"MessageProcessor ready in {init_time:.2f}s")
@@ -77,7 +162,12 @@ class MessageProcessor:
         self, 
         message: str, 
         age_range: Optional[str] = None,
-        skip_cache: bool = False
+        skip_cache: bool = False,
+        budget_ms: Optional[float] = None,
+        received_at: Optional[float] = None,
+        lane: Lane = Lane.INTERACTIVE,
+        child_id: Optional[str] = None,
+        conversation_id: Optional[str] = None
     ) -> ProcessingResult:
         """
         Process a message through the full pipeline.
@@ -86,49 +176,297 @@ class MessageProcessor:
             message: Message to analyze
             age_range: Override age range (default uses init value)
             skip_cache: Force fresh analysis even if cached
+            budget_ms: Latency budget. Stages that would overrun it fall back
+                to rules/templates and are listed in metadata.degraded_stages.
+            received_at: time.perf_counter() when the request arrived. The
+                budget counts from here and the gap is reported as queue wait.
+            lane: Scheduling lane for the model stage. Safety-critical
+                messages are promoted to Lane.CRITICAL automatically.
+            child_id: Sender. When given, the message is added to the child's
+                conversation window and analysis.conversation is filled in.
+            conversation_id: Conversation within the child's messages
             
         Returns:
             ProcessingResult with classification, analysis, and feedback
         """
-        start = time.time()
         effective_age = age_range or self._age_range
         
         # Validate input
         if not message or not message.strip():
             return self._error_result("Message cannot be empty")
         
+        result = self._tracked_process(message, effective_age, skip_cache, budget_ms, received_at, lane)
+        
+        # Per-child state is never cached, so this runs for cache hits too
+        if child_id:
+            result = self._observe_conversation(result, child_id, conversation_id)
+        return result
+    
+    async def process_async(
+        self,
+        message: str,
+        age_range: Optional[str] = None,
+        skip_cache: bool = False,
+        budget_ms: Optional[float] = None,
+        received_at: Optional[float] = None,
+        lane: Lane = Lane.INTERACTIVE,
+        child_id: Optional[str] = None,
+        conversation_id: Optional[str] = None
+    ) -> ProcessingResult:
+        """
+        process() for asyncio callers.
+        
+        The pipeline runs in the default executor. Requests for a message
+        already in flight (from either process() or process_async()) wait
+        for it without holding a thread. Arguments are as for process().
+        """
+        effective_age = age_range or self._age_range
+        if not message or not message.strip():
+            return self._error_result("Message cannot be empty")
+        
+        result, shared = await self.single_flight.do_async(
+            self._flight_key(message, effective_age, budget_ms),
+            lambda: self._tracked_process(
+                message, effective_age, skip_cache, budget_ms, received_at, lane, coalesce=False
+            ),
+            timeout=self._flight_timeout_s(Deadline(budget_ms, received_at))
+        )
+        if shared:
+            result = result.model_copy(deep=True)
+        
+        if child_id:
+            result = self._observe_conversation(result, child_id, conversation_id)
+        return result
+    
+    def _observe_conversation(
+        self,
+        result: ProcessingResult,
+        child_id: str,
+        conversation_id: Optional[str]
+    ) -> ProcessingResult:
+        """
+        Add the message to the child's window; returns the result with
+        analysis.conversation set. The input result is not modified, since a
+        coalesced computation may still be copying it for other callers.
+        """
+        signal = self.conversation_analyzer.observe(
+            child_id,
+            conversation_id,
+            result.classification,
+            result.analysis.detected_issues
+        )
+        analysis = result.analysis.model_copy(update={"conversation": signal})
+        return result.model_copy(update={"analysis": analysis})
+    
+    def _tracked_process(
+        self,
+        message: str,
+        effective_age: str,
+        skip_cache: bool,
+        budget_ms: Optional[float],
+        received_at: Optional[float],
+        lane: Lane,
+        coalesce: bool = True
+    ) -> ProcessingResult:
+        """_process() under load tracking and a fresh deadline."""
+        with self.load_controller.track(self._queue_wait_ms(received_at)):
+            deadline = self._make_deadline(budget_ms, received_at)
+            return self._process(message, effective_age, skip_cache, deadline, lane, coalesce)
+    
+    def _process(
+        self,
+        message: str,
+        effective_age: str,
+        skip_cache: bool,
+        deadline: Deadline,
+        lane: Lane,
+        coalesce: bool = True
+    ) -> ProcessingResult:
+        """
+        Run the pipeline for a validated message.
+        
+        With `coalesce`, concurrent calls for the same message (same cache
+        key) share one computation; each caller gets its own copy.
+        """
+        start = time.time()
+        
+        if not skip_cache and self._is_known_green(message):
+            return self._known_green_response.to_result(
+                (time.time() - start) * 1000, datetime.now(timezone.utc)
+            )
+        
         # Check cache
         if self.cache_enabled and self.cache and not skip_cache:
+            self._record_lookup(message, effective_age)
             cached = self.cache.get(message, effective_age)
-            if cached:
+            if cached is not None:
                 logger.debug("Cache hit")
-                cached["metadata"]["processing_time_ms"] = 1
-                cached["metadata"]["cache_hit"] = True
-                return ProcessingResult(**cached)
+                return cached.to_result(
+                    (time.time() - start) * 1000, datetime.now(timezone.utc)
+                )
+        
+        if not coalesce:
+            return self._compute(message, effective_age, deadline, lane, start)
+        
+        result, shared = self.single_flight.do(
+            self._flight_key(message, effective_age, deadline.budget_ms),
+            lambda: self._compute(message, effective_age, deadline, lane, start),
+            timeout=self._flight_timeout_s(deadline)
+        )
+        return result.model_copy(deep=True) if shared else result
+    
+    @staticmethod
+    def _flight_key(message: str, effective_age: str, budget_ms: Optional[float]):
+        """
+        Single-flight key. Budgeted requests may get degraded results, so
+        they are never shared with unbudgeted ones (or vice versa).
+        """
+        return cache_key(message, effective_age), budget_ms is not None
+    
+    @staticmethod
+    def _flight_timeout_s(deadline: Deadline) -> Optional[float]:
+        """How long a coalesced caller may wait for the leader (None = no limit)."""
+        return deadline.remaining_ms() / 1000 if deadline.bounded else None
+    
+    def _compute(
+        self,
+        message: str,
+        effective_age: str,
+        deadline: Deadline,
+        lane: Lane,
+        start: float
+    ) -> ProcessingResult:
+        """Run the pipeline and cache the result."""
+        result = self._run(message, effective_age, deadline, lane, start)
+        
+        # Cache result (degraded results are not worth reusing, and speculative
+        # ones would hide the LLM feedback from repeats of the message)
+        speculative = result.metadata.feedback_source == FeedbackSource.SPECULATIVE
+        if self.cache_enabled and self.cache and not deadline.degraded and not speculative:
+            self.cache.set(message, CachedResponse.from_result(result), effective_age)
+            self._remember_green(message, result)
+        
+        return result
+    
+    def _record_lookup(self, message: str, age_range: str):
+        """Feed a user lookup to cache analytics (startup traffic such as warm start and snapshot restore must not)."""
+        if self.cache_analytics is not None:
+            self.cache_analytics.record(cache_key(message, age_range))
+    
+    def _is_known_green(self, message: str) -> bool:
+        return (
+            self.green_set is not None
+            and len(message) <= MODEL_CONFIG["known_green"]["max_length"]
+            and message in self.green_set
+        )
+    
+    def _remember_green(self, message: str, result: ProcessingResult):
+        """
+        Add short, confidently GREEN messages to the known-GREEN set.
         
+        The verdict must come from a run with the toxicity model available
+        (not the rules fallback, which gives whitelisted phrases such as "how
+        are you" high confidence on keywords alone), and the toxicity result
+        must be confident too.
+        """
+        config = MODEL_CONFIG["known_green"]
+        if (self.green_set is not None
+                and not result.metadata.fallback_used
+                and result.classification == Classification.GREEN
+                and result.confidence >= config["min_confidence"]
+                and result.analysis.toxicity.confidence >= config["min_confidence"]
+                and not result.analysis.detected_issues
+                and len(message) <= config["max_length"]):
+            self.green_set.add(message)
+    
+    def _known_green_result(self) -> ProcessingResult:
+        """The canned result served for known-GREEN messages."""
+        return ProcessingResult(
+            success=True,
+            classification=Classification.GREEN,
+            confidence=MODEL_CONFIG["known_green"]["min_confidence"],
+            analysis=AnalysisResult(
+                toxicity=ToxicityResult(score=0, confidence=1, label="known_green"),
+                emotion=EmotionResult(primary_emotion=EmotionType.NEUTRAL, scores={}, intensity=0),
+                patterns=PatternResult(),
+                detected_issues=[],
+                intent=IntentType.NEUTRAL
+            ),
+            metadata=ProcessingMetadata(
+                processing_time_ms=0,
+                model_versions=self._get_model_versions(),
+                known_green=True
+            )
+        )
+    
+    def refresh_cache_namespace(self) -> str:
+        """
+        Recompute the cache namespace; call after swapping models or rules.
+        
+        On a change, the response cache and known-GREEN set switch to the
+        new namespace at once (old response entries are evicted in the
+        background), and the analysis memo and feedback caches are cleared.
+        
+        Returns:
+            The current namespace
+        """
+        self._rules_version = rules_version(self.RULE_PACKS)
+        namespace = cache_namespace(self._get_model_versions(), self._feedback_mode)
+        if namespace == self.cache_namespace:
+            return namespace
+        
+        logger.info(f"Cache namespace {self.cache_namespace} -> {namespace}")
+        self.cache_namespace = namespace
+        if self.cache:
+            self.cache.set_namespace(namespace)
+        if self.green_set is not None:
+            self.green_set.set_version(namespace)
+        self.analyzer.graph.memo.clear()
+        self.feedback_generator.clear_caches()
+        self._known_green_response = CachedResponse.from_result(self._known_green_result())
+        return namespace
+    
+    def save_green_set(self):
+        """Persist the known-GREEN set (if a path is configured)."""
+        if self.green_set is not None and self._green_path:
+            self.green_set.save(self._green_path)
+    
+    def _run(
+        self,
+        message: str,
+        effective_age: str,
+        deadline: Deadline,
+        lane: Lane,
+        start: float
+    ) -> ProcessingResult:
+        """Analyze, classify and generate feedback (no caching)."""
         # Preprocess
         cleaned, preprocess_meta = self.preprocessor.process(message)
         
         # Analyze
-        analysis = self.analyzer.analyze(cleaned)
+        lane = self._triage(cleaned, lane)
+        with self._model_stage(lane, deadline):
+            analysis = self.analyzer.analyze(cleaned, deadline)
         
         # Classify
         classification_result = self.decision_engine.classify(analysis)
         
+        # Under load, LLM feedback for low-severity messages is shed first
+        if (classification_result.classification == Classification.YELLOW
+                and self.scheduler.should_shed(lane)):
+            self.scheduler.record_shed(lane)
+            deadline.disable("feedback_llm")
+        
         # Generate feedback if needed
-        feedback, educational, used_llm = None, None, False
+        feedback, educational, used_llm, feedback_source = None, None, False, None
         if classification_result.classification != Classification.GREEN:
-            if effective_age != self._age_range:
-                self.feedback_generator.set_age_range(effective_age)
-            
-            feedback, educational, used_llm = self.feedback_generator.generate(
+            feedback, educational, used_llm, feedback_source = self.feedback_generator.generate(
                 message,
                 classification_result.classification,
-                analysis
+                analysis,
+                deadline,
+                age_range=effective_age
             )
-            
-            if effective_age != self._age_range:
-                self.feedback_generator.set_age_range(self._age_range)
         
         # Build result
         processing_time = (time.time() - start) * 1000
@@ -145,29 +483,205 @@ class MessageProcessor:
                 model_versions=self._get_model_versions(),
                 timestamp=datetime.now(timezone.utc),
                 used_llm=used_llm,
-                fallback_used=not self.analyzer.toxicity_analyzer.model_loaded
+                feedback_source=feedback_source,
+                fallback_used=(
+                    not self.analyzer.stage_uses_model("toxicity")
+                    or "toxicity" in deadline.degraded
+                ),
+                degraded_stages=list(deadline.degraded)
             )
         )
         
-        # Cache result
-        if self.cache_enabled and self.cache:
-            self.cache.set(message, result.model_dump(), effective_age)
-        
         return result
     
-    def quick_classify(self, message: str) -> Classification:
+    def cached_response(self, message: str, age_range: Optional[str] = None) -> Optional[bytes]:
+        """
+        Get the response JSON for a cached message, or None on a miss.
+        
+        Hits are served straight from the pre-serialized entry, without
+        building a ProcessingResult.
+        """
+        if not (self.cache_enabled and self.cache) or not message or not message.strip():
+            return None
+        start = time.perf_counter()
+        if self._is_known_green(message):
+            return self._known_green_response.render(
+                (time.perf_counter() - start) * 1000, datetime.now(timezone.utc)
+            )
+        self._record_lookup(message, age_range or self._age_range)
+        cached = self.cache.get(message, age_range or self._age_range)
+        if cached is None:
+            return None
+        return cached.render((time.perf_counter() - start) * 1000, datetime.now(timezone.utc))
+    
+    async def upgraded_feedback(
+        self,
+        message: str,
+        result: ProcessingResult,
+        age_range: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> Optional[Feedback]:
+        """
+        LLM feedback replacing the template feedback of a speculative result.
+        
+        Args:
+            message: Message the result is for
+            result: Result with metadata.feedback_source == "template_speculative"
+            age_range: Age range the message was processed with
+            timeout: Seconds to wait for the background LLM call
+            
+        Returns:
+            The LLM feedback, or None (not speculative, LLM failed or too slow)
+        """
+        if result.metadata.feedback_source != FeedbackSource.SPECULATIVE:
+            return None
+        return await self.feedback_generator.upgraded_feedback(
+            message, result.classification, result.analysis, age_range or self._age_range, timeout
+        )
+    
+    def quick_classify(
+        self,
+        message: str,
+        budget_ms: Optional[float] = None,
+        received_at: Optional[float] = None
+    ) -> Classification:
         """Quick classification without feedback generation."""
-        cleaned, _ = self.preprocessor.process(message)
-        analysis = self.analyzer.analyze(cleaned)
-        return self.decision_engine.classify(analysis).classification
+        if self._is_known_green(message):
+            return Classification.GREEN
+        with self.load_controller.track(self._queue_wait_ms(received_at)):
+            deadline = self._make_deadline(budget_ms, received_at)
+            cleaned, _ = self.preprocessor.process(message)
+            with self._model_stage(self._triage(cleaned, Lane.INTERACTIVE), deadline):
+                signals = self.analyzer.evaluate(cleaned, DecisionEngine.INPUTS, deadline)
+            return self.decision_engine.classify_signals(**signals).classification
+    
+    def analyze_fields(
+        self,
+        message: str,
+        fields: List[str],
+        budget_ms: Optional[float] = None,
+        received_at: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Compute only the requested analysis fields.
+        
+        Args:
+            message: Message to analyze
+            fields: Any of SafetyAnalyzer.OUTPUTS, plus "classification"
+            budget_ms: Latency budget
+            received_at: time.perf_counter() when the request arrived
+        
+        Returns:
+            Dict of field -> value (pydantic models for analysis fields,
+            Classification for "classification")
+        """
+        unknown = set(fields) - set(SafetyAnalyzer.OUTPUTS) - {"classification"}
+        if unknown:
+            raise ValueError(f"Unknown analysis fields: {sorted(unknown)}")
+        
+        wanted = [f for f in fields if f != "classification"]
+        if "classification" in fields:
+            wanted += [f for f in DecisionEngine.INPUTS if f not in wanted]
+        
+        with self.load_controller.track(self._queue_wait_ms(received_at)):
+            deadline = self._make_deadline(budget_ms, received_at)
+            cleaned, _ = self.preprocessor.process(message)
+            with self._model_stage(self._triage(cleaned, Lane.INTERACTIVE), deadline):
+                values = self.analyzer.evaluate(cleaned, wanted, deadline)
+        
+        if "classification" in fields:
+            signals = {name: values[name] for name in DecisionEngine.INPUTS}
+            values["classification"] = self.decision_engine.classify_signals(**signals).classification
+        return {field: values[field] for field in fields}
     
     def batch_process(
         self, 
         messages: list,
         age_range: Optional[str] = None
     ) -> list:
-        """Process multiple messages."""
-        return [self.process(msg, age_range) for msg in messages]
+        """
+        Process multiple messages (in the batch lane).
+        
+        Cache lookups for the whole batch are done up front, and new results
+        stored at the end, so a remote (L2) cache costs one round trip each.
+        """
+        if not (self.cache_enabled and self.cache):
+            return [self.process(msg, age_range, lane=Lane.BATCH) for msg in messages]
+        
+        effective_age = age_range or self._age_range
+        start = time.time()
+        valid = [msg for msg in messages if msg and msg.strip()]
+        for message in valid:
+            self._record_lookup(message, effective_age)
+        hits = dict(zip(valid, self.cache.get_many(valid, effective_age)))
+        
+        results, fresh = [], []
+        for message in messages:
+            if message not in hits:
+                results.append(self._error_result("Message cannot be empty"))
+                continue
+            cached = hits[message]
+            if cached is not None:
+                results.append(cached.to_result((time.time() - start) * 1000, datetime.now(timezone.utc)))
+                continue
+            
+            with self.load_controller.track(0.0):
+                deadline = self._make_deadline(None)
+                result = self._run(message, effective_age, deadline, Lane.BATCH, time.time())
+            if not deadline.degraded and result.metadata.feedback_source != FeedbackSource.SPECULATIVE:
+                fresh.append((message, CachedResponse.from_result(result)))
+                self._remember_green(message, result)
+            results.append(result)
+        
+        if fresh:
+            self.cache.set_many(fresh, effective_age)
+        return results
+    
+    def _triage(self, cleaned: str, lane: Lane) -> Lane:
+        """Promote safety-critical messages to the critical lane."""
+        if self.scheduler.enabled and self.analyzer.is_critical(cleaned):
+            return Lane.CRITICAL
+        return lane
+    
+    @contextmanager
+    def _model_stage(self, lane: Lane, deadline: Deadline):
+        """
+        Hold a scheduler slot for the model stage, timed for the load controller.
+        
+        If no slot frees up before the deadline (or the scheduler's max wait),
+        the ML stages are switched to rules for this request and show up as
+        degraded.
+        """
+        with self.load_controller.measure(), self.scheduler.slot(lane, deadline) as admitted:
+            if not admitted:
+                for stage in SafetyAnalyzer.MODEL_STAGES:
+                    deadline.disable(stage)
+            yield
+    
+    def _make_deadline(
+        self,
+        budget_ms: Optional[float],
+        received_at: Optional[float] = None
+    ) -> Deadline:
+        """
+        Create the per-request deadline.
+        
+        Falls back to the configured default budget, and disables the stages
+        switched off by the current load mode.
+        """
+        if budget_ms is None:
+            budget_ms = self._default_budget_ms
+        return Deadline(
+            budget_ms,
+            start=received_at,
+            disabled=self.load_controller.disabled_stages()
+        )
+    
+    @staticmethod
+    def _queue_wait_ms(received_at: Optional[float]) -> float:
+        if received_at is None:
+            return 0.0
+        return max(0.0, (time.perf_counter() - received_at) * 1000)
     
     def _error_result(self, error: str) -> ProcessingResult:
         """Create error result."""
@@ -194,9 +708,10 @@ class MessageProcessor:
     def _get_model_versions(self) -> Dict[str, str]:
         """Get model version info."""
         return {
-            "toxicity": "toxic-bert-v1" if self.analyzer.toxicity_analyzer.model_loaded else "rules-v1",
-            "emotion": "distilbert-emotion-v2" if self.analyzer.emotion_analyzer.model_loaded else "rules-v1",
-            "feedback": "templates-v1"
+            "toxicity": "toxic-bert-v1" if self.analyzer.stage_uses_model("toxicity") else "rules-v1",
+            "emotion": "distilbert-emotion-v2" if self.analyzer.stage_uses_model("emotion") else "rules-v1",
+            "feedback": "templates-v1",
+            "rules": self._rules_version
         }
     
     def get_system_status(self) -> Dict[str, Any]:
@@ -208,13 +723,176 @@ class MessageProcessor:
                 "use_models": self._use_models,
                 "device": self._device,
                 "age_range": self._age_range,
-                "feedback_mode": self._feedback_mode
+                "feedback_mode": self._feedback_mode,
+                "cache_namespace": self.cache_namespace
             },
             "cache": self.cache.get_stats() if self.cache else {"enabled": False},
+            "cache_layers": self.get_cache_stats(),
+            "load": self.load_controller.get_status(),
+            "scheduler": self.scheduler.get_stats(),
+            "conversation": self.conversation_analyzer.get_stats(),
+            "single_flight": self.single_flight.get_stats(),
+            "process": {"pid": os.getpid(), **process_memory()},
+            "warm_start": self._warm_start_stats,
+            "cache_snapshot": self._snapshot_stats,
+            "cache_analytics": (
+                self.cache_analytics.get_stats() if self.cache_analytics else {"enabled": False}
+            ),
             "ready": True
         }
         return status
     
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        Stats for each cache layer.
+        
+        - response: whole responses by (message, age range)
+        - analysis: analyzer outputs by preprocessed text, shared by
+          process(), quick_classify(), analyze_fields() and batch_process()
+        - feedback: template feedback by signature (issue, emotion, age, topic)
+        - llm_feedback: LLM feedback variants by prompt signature
+        - known_green: fingerprints of messages answered with a canned GREEN
+        """
+        feedback_cache = self.feedback_generator.feedback_cache
+        llm_feedback_cache = self.feedback_generator.llm_feedback_cache
+        return {
+            "known_green": self.green_set.get_stats() if self.green_set is not None else {"enabled": False},
+            "response": self.cache.get_stats() if self.cache else {"enabled": False},
+            "analysis": self.analyzer.graph.memo.get_stats(),
+            "feedback": feedback_cache.get_stats() if feedback_cache else {"enabled": False},
+            "llm_feedback": llm_feedback_cache.get_stats() if llm_feedback_cache else {"enabled": False},
+        }
+    
+    def warm_up(self, messages: tuple = ("Hello!", "Whatever", "You're stupid")):
+        """Run a few messages through the analyzers so lazy initialisation happens now."""
+        for message in messages:
+            cleaned, _ = self.preprocessor.process(message)
+            self.analyzer.analyze(cleaned)
+        self.analyzer.graph.memo.clear()
+        # Cold-start timings would inflate the stage cost estimates
+        self.analyzer.stage_costs.reset()
+    
+    def warm_start(
+        self,
+        paths: Optional[List[str]] = None,
+        max_entries: Optional[int] = None,
+        time_budget_s: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Pre-populate the caches from historical classification exports.
+        
+        The most frequent exported messages are run through the pipeline
+        (most frequent first) until the entry or time budget runs out. Call
+        before the service reports ready.
+        
+        Warm start never calls the LLM: a message whose feedback would come
+        from the LLM only has its analysis memoized (the first live request
+        then just makes the LLM call), everything else is cached in full.
+        Messages already cached (e.g. restored from a snapshot) are skipped.
+        
+        Args:
+            paths: CSV files or globs (default MODEL_CONFIG["warm_start"]["paths"])
+            max_entries: Most messages to load
+            time_budget_s: Stop starting new messages after this long
+        
+        Returns:
+            Warm-start stats (also in get_system_status()["warm_start"])
+        """
+        config = MODEL_CONFIG["warm_start"]
+        paths = config["paths"] if paths is None else paths
+        max_entries = config["max_entries"] if max_entries is None else max_entries
+        time_budget_s = config["time_budget_s"] if time_budget_s is None else time_budget_s
+        
+        start = time.perf_counter()
+        counts = read_exports(paths)
+        messages = [message for message, _ in counts.most_common(max_entries)]
+        cache = self.cache if self.cache_enabled else None
+        
+        loaded, analysis_only, budget_exhausted = 0, 0, False
+        for i in range(0, len(messages), self.WARM_START_BATCH):
+            chunk = messages[i:i + self.WARM_START_BATCH]
+            # One cache round trip per chunk, not counted by cache analytics
+            cached = cache.get_many(chunk, self._age_range) if cache else [None] * len(chunk)
+            
+            fresh = []
+            for message, hit in zip(chunk, cached):
+                if time.perf_counter() - start >= time_budget_s:
+                    budget_exhausted = True
+                    break
+                loaded += 1
+                if hit is not None:
+                    continue
+                deadline = Deadline()
+                deadline.disable("feedback_llm")
+                result = self._run(message, self._age_range, deadline, Lane.BATCH, time.time())
+                if deadline.degraded:
+                    analysis_only += 1
+                    continue
+                fresh.append((message, CachedResponse.from_result(result)))
+                self._remember_green(message, result)
+            
+            if cache and fresh:
+                cache.set_many(fresh, self._age_range)
+            if budget_exhausted:
+                break
+        
+        self._warm_start_stats = {
+            "candidates": len(counts),
+            "loaded": loaded,
+            "analysis_only": analysis_only,
+            "budget_exhausted": budget_exhausted,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+        logger.info(f"Warm start: {self._warm_start_stats}")
+        return self._warm_start_stats
+    
+    def _snapshots_enabled(self) -> bool:
+        return bool(
+            MODEL_CONFIG["cache_snapshot"]["enabled"] and self._snapshot_path
+            and self.cache and supports_snapshots(self.cache)
+        )
+    
+    def save_cache_snapshot(self) -> int:
+        """
+        Write the hottest response cache entries to the snapshot file.
+        
+        Returns:
+            Number of entries written (0 if snapshots are disabled)
+        """
+        if not self._snapshots_enabled():
+            return 0
+        written = save_snapshot(
+            self.cache, self._snapshot_path, MODEL_CONFIG["cache_snapshot"]["max_entries"]
+        )
+        logger.info(f"Wrote {written} cache entries to {self._snapshot_path}")
+        return written
+    
+    def restore_cache_snapshot(self, time_budget_s: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Restore the response cache from the snapshot file. Call before the
+        service reports ready (and before warm_start()).
+        
+        Entries from another namespace or past their TTL are skipped.
+        
+        Args:
+            time_budget_s: Stop restoring after this long
+        
+        Returns:
+            Restore stats (also in get_system_status()["cache_snapshot"]),
+            or None if snapshots are disabled
+        """
+        if not self._snapshots_enabled():
+            return None
+        config = MODEL_CONFIG["cache_snapshot"]
+        self._snapshot_stats = restore_snapshot(
+            self.cache,
+            self._snapshot_path,
+            config["time_budget_s"] if time_budget_s is None else time_budget_s,
+            config["max_entries"]
+        )
+        logger.info(f"Cache snapshot restore: {self._snapshot_stats}")
+        return self._snapshot_stats
+    
     def set_age_range(self, age_range: str):
         """Update default age range."""
         if age_range not in ["8-10", "11-13"]:
@@ -223,8 +901,12 @@ class MessageProcessor:
         self.feedback_generator.set_age_range(age_range)
     
     def clear_cache(self):
-        """Clear the response cache."""
+        """Clear every cache layer."""
         if self.cache:
             self.cache.clear()
+        self.analyzer.graph.memo.clear()
+        self.feedback_generator.clear_caches()
+        if self.green_set is not None:
+            self.green_set.clear()
 
 
@@ -0,0 +1,26 @@
+"""Serving Module"""
+from .deadline import Deadline, StageCostModel
+from .load_controller import LoadController, DegradationMode
+from .scheduler import PriorityScheduler, Lane
+from .prefork import PreforkServer, process_memory
+from .inference_server import InferenceServer, RemoteInferenceClient, InferenceUnavailable
+from .single_flight import SingleFlight
+from .hash_ring import HashRing
+from .circuit_breaker import CircuitBreaker, BreakerState
+__all__ = [
+    "Deadline",
+    "StageCostModel",
+    "LoadController",
+    "DegradationMode",
+    "PriorityScheduler",
+    "Lane",
+    "PreforkServer",
+    "process_memory",
+    "InferenceServer",
+    "RemoteInferenceClient",
+    "InferenceUnavailable",
+    "SingleFlight",
+    "HashRing",
+    "CircuitBreaker",
+    "BreakerState",
+]
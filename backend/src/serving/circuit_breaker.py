@@ -0,0 +1,163 @@
+"""
+Circuit breaker for a flaky dependency.
+
+While the HF API is down every message would still wait for its timeouts
+before falling back to templates. The breaker opens after a run of
+failures (or calls slower than the latency limit) and callers skip the
+dependency entirely; after `open_seconds` it half-opens and lets a few
+probe calls through, closing again on the first success.
+"""
+
+import time
+import logging
+from enum import Enum
+from threading import Lock
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+
+class BreakerState(str, Enum):
+    CLOSED = "closed"        # Calls go through
+    OPEN = "open"            # Calls are skipped
+    HALF_OPEN = "half_open"  # Probe calls go through
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive failures,
+    open -> half-open after `open_seconds`, half-open -> closed on a
+    successful probe (or back to open on a failed one).
+
+    Thread-safe.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        latency_threshold_ms: Optional[float] = None,
+        open_seconds: float = 30,
+        half_open_probes: int = 1
+    ):
+        """
+        Args:
+            name: Dependency name (for logs)
+            failure_threshold: Consecutive failures that open the circuit
+            latency_threshold_ms: Successful calls slower than this count as failures
+            open_seconds: How long calls are skipped before probing
+            half_open_probes: Concurrent probe calls allowed while half-open
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.latency_threshold_ms = latency_threshold_ms
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self._lock = Lock()
+        self._state = BreakerState.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._times_opened = 0
+        self._rejected = 0
+        self._slow_calls = 0
+
+    @classmethod
+    def from_config(cls, name: str, config: Dict[str, Any]) -> "CircuitBreaker":
+        """Create from a config section (e.g. MODEL_CONFIG["feedback"]["hf_llm"]["circuit_breaker"])."""
+        return cls(
+            name,
+            failure_threshold=config["failure_threshold"],
+            latency_threshold_ms=config["latency_threshold_ms"],
+            open_seconds=config["open_seconds"],
+            half_open_probes=config["half_open_probes"]
+        )
+
+    @property
+    def state(self) -> BreakerState:
+        with self._lock:
+            self._check_half_open()
+            return self._state
+
+    def _check_half_open(self):
+        if self._state == BreakerState.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = BreakerState.HALF_OPEN
+            self._probes_in_flight = 0
+            logger.info(f"Circuit {self.name} half-open, probing")
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go through now. Every allowed call must be
+        followed by record().
+        """
+        with self._lock:
+            self._check_half_open()
+            if self._state == BreakerState.CLOSED:
+                return True
+            if self._state == BreakerState.HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return True
+            self._rejected += 1
+            return False
+
+    def record(self, success: bool, latency_ms: Optional[float] = None):
+        """
+        Record the outcome of an allowed call.
+
+        Args:
+            success: Whether the call returned a usable result
+            latency_ms: Call duration; above latency_threshold_ms it counts as a failure
+        """
+        slow = (
+            success and latency_ms is not None
+            and self.latency_threshold_ms is not None and latency_ms > self.latency_threshold_ms
+        )
+        with self._lock:
+            self._slow_calls += slow
+            if self._state == BreakerState.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if success and not slow:
+                if self._state != BreakerState.CLOSED:
+                    logger.info(f"Circuit {self.name} closed")
+                self._state = BreakerState.CLOSED
+                self._consecutive_failures = 0
+                return
+
+            self._consecutive_failures += 1
+            if self._state == BreakerState.HALF_OPEN or (
+                self._state == BreakerState.CLOSED and self._consecutive_failures >= self.failure_threshold
+            ):
+                self._open()
+
+    def _open(self):
+        self._state = BreakerState.OPEN
+        self._opened_at = time.monotonic()
+        self._times_opened += 1
+        logger.warning(
+            f"Circuit {self.name} open after {self._consecutive_failures} failures, "
+            f"skipping calls for {self.open_seconds}s"
+        )
+
+    def reset(self):
+        """Close the circuit and forget failures."""
+        with self._lock:
+            self._state = BreakerState.CLOSED
+            self._consecutive_failures = 0
+            self._probes_in_flight = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._check_half_open()
+            retry_in = (
+                max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+                if self._state == BreakerState.OPEN else 0.0
+            )
+            return {
+                "state": self._state.value,
+                "consecutive_failures": self._consecutive_failures,
+                "times_opened": self._times_opened,
+                "rejected": self._rejected,
+                "slow_calls": self._slow_calls,
+                "retry_in_s": round(retry_in, 1),
+            }
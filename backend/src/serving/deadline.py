@@ -0,0 +1,159 @@
+"""
+Per-request latency budgets.
+
+A Deadline is created once per request and handed to every pipeline stage.
+Each stage asks whether its expensive path still fits in the remaining
+budget and, if not, takes its cheap path and records the degradation.
+"""
+
+import math
+import time
+import logging
+from threading import Lock
+from typing import Optional, Dict, List, Iterable
+
+logger = logging.getLogger(__name__)
+
+
+class Deadline:
+    """
+    Latency budget for a single request.
+
+    A deadline without a budget never expires, so stages can always call
+    `allows()` without checking whether the client asked for a budget.
+    """
+
+    def __init__(
+        self,
+        budget_ms: Optional[float] = None,
+        start: Optional[float] = None,
+        disabled: Iterable[str] = ()
+    ):
+        """
+        Args:
+            budget_ms: Total budget in milliseconds (None = unbounded)
+            start: perf_counter() timestamp the budget counts from (default: now)
+            disabled: Stages that must take their cheap path regardless of budget
+                (e.g. switched off by the load controller)
+        """
+        self.budget_ms = budget_ms
+        self.start = start if start is not None else time.perf_counter()
+        self.disabled = frozenset(disabled)
+        self.degraded: List[str] = []
+
+    @property
+    def bounded(self) -> bool:
+        return self.budget_ms is not None
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+    def remaining_ms(self) -> float:
+        """Remaining budget in milliseconds (inf if unbounded)."""
+        if self.budget_ms is None:
+            return math.inf
+        return max(0.0, self.budget_ms - self.elapsed_ms())
+
+    def expired(self) -> bool:
+        return self.remaining_ms() <= 0
+
+    def allows(self, cost_ms: float) -> bool:
+        """Check if a stage with the given expected cost fits in the budget."""
+        return self.remaining_ms() >= cost_ms
+
+    def permits(self, stage: str, cost_ms: float) -> bool:
+        """
+        Check if an expensive stage may run.
+
+        Records the stage as degraded when it is disabled or does not fit.
+        """
+        if stage in self.disabled or not self.allows(cost_ms):
+            self.degrade(stage)
+            return False
+        return True
+
+    def disable(self, stage: str):
+        """Force a stage onto its cheap path for the rest of the request."""
+        self.disabled = self.disabled | {stage}
+
+    def degrade(self, stage: str):
+        """Record that a stage fell back to its cheaper path."""
+        if stage not in self.degraded:
+            self.degraded.append(stage)
+            logger.debug(f"Degraded stage '{stage}' ({self.remaining_ms():.1f}ms left)")
+
+    def timeout_s(self, ceiling: float) -> float:
+        """Network timeout in seconds, capped by the remaining budget."""
+        return min(ceiling, self.remaining_ms() / 1000)
+
+
+class StageCostModel:
+    """
+    Expected cost of expensive pipeline stages.
+
+    Starts from configured defaults and tracks an exponentially weighted
+    moving average of observed latencies.
+
+    A stage is only observed when it runs, and it stops running once its
+    estimate exceeds typical budgets, so one slow call (a cold start) could
+    lock it out for good. With `half_life_s` the estimate decays back
+    towards the configured default while a stage goes unobserved, until
+    requests let it run and measure it again. Thread-safe.
+    """
+
+    def __init__(
+        self,
+        defaults: Optional[Dict[str, float]] = None,
+        alpha: float = 0.2,
+        half_life_s: Optional[float] = None
+    ):
+        """
+        Args:
+            defaults: Initial cost estimate per stage in milliseconds
+            alpha: Weight of each new observation in the moving average
+            half_life_s: Time without observations after which an estimate is
+                halfway back to its default (None = no decay)
+        """
+        self.alpha = alpha
+        self.half_life_s = half_life_s
+        self._defaults: Dict[str, float] = dict(defaults or {})
+        self._estimates: Dict[str, float] = dict(self._defaults)
+        self._observed_at: Dict[str, float] = {}
+        self._lock = Lock()
+
+    def _current(self, stage: str, now: float) -> Optional[float]:
+        estimate = self._estimates.get(stage)
+        default = self._defaults.get(stage)
+        observed_at = self._observed_at.get(stage)
+        if estimate is None or default is None or observed_at is None or not self.half_life_s:
+            return estimate
+        weight = 0.5 ** ((now - observed_at) / self.half_life_s)
+        return default + (estimate - default) * weight
+
+    def estimate(self, stage: str) -> float:
+        """Expected cost of a stage in milliseconds (0 if unknown)."""
+        with self._lock:
+            estimate = self._current(stage, time.monotonic())
+            return 0.0 if estimate is None else estimate
+
+    def observe(self, stage: str, elapsed_ms: float):
+        """Record an observed stage latency."""
+        with self._lock:
+            now = time.monotonic()
+            previous = self._current(stage, now)
+            if previous is None:
+                self._estimates[stage] = elapsed_ms
+            else:
+                self._estimates[stage] = (1 - self.alpha) * previous + self.alpha * elapsed_ms
+            self._observed_at[stage] = now
+
+    def reset(self):
+        """Forget observations (e.g. timings of warm-up calls)."""
+        with self._lock:
+            self._estimates = dict(self._defaults)
+            self._observed_at.clear()
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._lock:
+            now = time.monotonic()
+            return {stage: round(self._current(stage, now), 2) for stage in self._estimates}
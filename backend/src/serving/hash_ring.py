@@ -0,0 +1,86 @@
+"""
+Consistent hashing.
+
+Each node is placed on a hash ring at many points (virtual nodes); a key
+belongs to the first node clockwise from its hash. When a node joins it
+takes over only the keys between its points and their predecessors, and
+when it leaves only its keys move, so caches on the other nodes stay warm.
+"""
+
+import hashlib
+import threading
+from bisect import bisect_right
+from typing import Iterable, List, Optional
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Consistent-hash ring with virtual nodes.
+
+    Thread-safe: add()/remove() build a new ring and swap it in, lookups use
+    whichever ring was current when they started.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 100):
+        """
+        Args:
+            nodes: Initial nodes (any unique strings, e.g. replica URLs)
+            vnodes: Points per node; more points spread keys more evenly
+        """
+        self.vnodes = vnodes
+        self._lock = threading.Lock()
+        # (points, owner of each point, nodes), replaced as a whole
+        self._ring = ([], [], [])
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._ring[2])
+
+    def __len__(self) -> int:
+        return len(self._ring[2])
+
+    def add(self, node: str):
+        """Add a node (no-op if present)."""
+        with self._lock:
+            if node not in self._ring[2]:
+                self._rebuild(self._ring[2] + [node])
+
+    def remove(self, node: str):
+        """Remove a node (no-op if absent)."""
+        with self._lock:
+            if node in self._ring[2]:
+                self._rebuild([n for n in self._ring[2] if n != node])
+
+    def _rebuild(self, nodes: List[str]):
+        ring = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(self.vnodes))
+        self._ring = ([point for point, _ in ring], [node for _, node in ring], nodes)
+
+    def node_for(self, key: str) -> Optional[str]:
+        """The node owning a key (None if the ring is empty)."""
+        nodes = self.preference_list(key, 1)
+        return nodes[0] if nodes else None
+
+    def preference_list(self, key: str, count: Optional[int] = None) -> List[str]:
+        """
+        Distinct nodes clockwise from a key: the owner first, then the nodes
+        to fail over to, in order.
+        """
+        points, owners, nodes = self._ring
+        count = len(nodes) if count is None else min(count, len(nodes))
+        result: List[str] = []
+        if not points:
+            return result
+        start = bisect_right(points, _hash(key))
+        for i in range(len(points)):
+            node = owners[(start + i) % len(points)]
+            if node not in result:
+                result.append(node)
+                if len(result) == count:
+                    break
+        return result
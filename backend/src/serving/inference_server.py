@@ -0,0 +1,394 @@
+"""
+Dedicated inference process.
+
+One process owns the toxicity, emotion and hate-speech models; API workers
+send it text over a Unix domain socket and it batches requests from all
+workers into one forward pass per model. HTTP concurrency then no longer
+multiplies model memory, and batching works across workers.
+
+Wire format (all integers big-endian):
+    request:  u32 length | u32 request_id | u8 stage | utf-8 text
+    response: u32 length | u32 request_id | u8 status | json result
+`length` counts the bytes after itself. Header and payload are sent with
+one sendmsg() call and read into a preallocated buffer, so payloads are not
+copied into intermediate strings on the way.
+"""
+
+import os
+import json
+import time
+import queue
+import socket
+import struct
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..models import ToxicityResult, EmotionResult
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("toxicity", "emotion", "hate_speech")
+STAGE_CODES = {stage: code for code, stage in enumerate(STAGES)}
+
+_LENGTH = struct.Struct("!I")
+_REQUEST = struct.Struct("!IB")
+_RESPONSE = struct.Struct("!IB")
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+MAX_FRAME = 64 * 1024
+
+
+class InferenceUnavailable(Exception):
+    """The inference server could not answer in time."""
+
+
+def _recv_exact(sock: socket.socket, view: memoryview) -> bool:
+    """Fill `view` from the socket. Returns False on a clean EOF."""
+    got = 0
+    while got < len(view):
+        n = sock.recv_into(view[got:])
+        if n == 0:
+            return False
+        got += n
+    return True
+
+
+def _read_frame(sock: socket.socket, buffer: bytearray) -> Optional[memoryview]:
+    """Read one length-prefixed frame into `buffer`; None on EOF."""
+    header = memoryview(buffer)[:_LENGTH.size]
+    if not _recv_exact(sock, header):
+        return None
+    (length,) = _LENGTH.unpack(header)
+    if length > MAX_FRAME:
+        raise ValueError(f"Frame too large ({length} bytes)")
+    body = memoryview(buffer)[:length]
+    if not _recv_exact(sock, body):
+        return None
+    return body
+
+
+def _encode_result(stage: str, result: Any) -> bytes:
+    if stage in ("toxicity", "emotion"):
+        result = result.model_dump(mode="json")
+    return json.dumps(result).encode()
+
+
+def _decode_result(stage: str, payload) -> Any:
+    data = json.loads(bytes(payload))
+    if stage == "toxicity":
+        return ToxicityResult.model_validate(data)
+    if stage == "emotion":
+        return EmotionResult.model_validate(data)
+    return data
+
+
+class InferenceServer:
+    """
+    Owns the models and serves batched inference over a Unix socket.
+
+    Each connection has a reader thread that queues requests; one batcher
+    thread drains the queue, waiting up to `max_wait_ms` to fill a batch of
+    `max_batch`, and runs each stage once per batch.
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        analyzers: Optional[Dict[str, Any]] = None,
+        device: str = "cpu",
+        max_batch: int = 32,
+        max_wait_ms: float = 5
+    ):
+        """
+        Args:
+            socket_path: Unix socket to listen on
+            analyzers: stage -> analyzer with analyze_batch(texts). Loads the
+                ML analyzers if not given.
+            device: Device for the models when loading them here
+            max_batch: Largest batch per model call
+            max_wait_ms: How long to wait for a batch to fill
+        """
+        self.socket_path = socket_path
+        self.analyzers = analyzers or self._load_analyzers(device)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+
+        self._requests: queue.Queue = queue.Queue()
+        self._listener: Optional[socket.socket] = None
+        self._stopping = threading.Event()
+        self._batches = 0
+        self._items = 0
+
+    @staticmethod
+    def _load_analyzers(device: str) -> Dict[str, Any]:
+        from ..analyzer.toxicity import ToxicityAnalyzer
+        from ..analyzer.emotion import EmotionAnalyzer
+        from ..analyzer.hate_speech import HateSpeechAnalyzer
+        return {
+            "toxicity": ToxicityAnalyzer(use_model=True, device=device),
+            "emotion": EmotionAnalyzer(use_model=True, device=device),
+            "hate_speech": HateSpeechAnalyzer(use_model=True, device=device),
+        }
+
+    def start(self):
+        """Bind the socket and start serving in background threads."""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(self.socket_path)
+        self._listener.listen(256)
+
+        threading.Thread(target=self._accept_loop, name="inference-accept", daemon=True).start()
+        threading.Thread(target=self._batch_loop, name="inference-batch", daemon=True).start()
+        logger.info(f"Inference server listening on {self.socket_path}")
+
+    def serve_forever(self):
+        self.start()
+        try:
+            while not self._stopping.wait(1):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stopping.set()
+        if self._listener:
+            self._listener.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def _accept_loop(self):
+        while not self._stopping.is_set():
+            try:
+                conn, _ = self._listener.accept()
+            except OSError:
+                return
+            threading.Thread(
+                target=self._read_loop, args=(conn,), name="inference-conn", daemon=True
+            ).start()
+
+    def _read_loop(self, conn: socket.socket):
+        send_lock = threading.Lock()
+        buffer = bytearray(MAX_FRAME)
+        try:
+            while True:
+                frame = _read_frame(conn, buffer)
+                if frame is None:
+                    return
+                request_id, code = _REQUEST.unpack_from(frame)
+                text = str(frame[_REQUEST.size:], "utf-8")
+                self._requests.put((conn, send_lock, request_id, code, text))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Inference connection closed: {e}")
+        finally:
+            conn.close()
+
+    def _next_batch(self) -> List[Tuple]:
+        batch = [self._requests.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _batch_loop(self):
+        while not self._stopping.is_set():
+            batch = self._next_batch()
+            self._batches += 1
+            self._items += len(batch)
+
+            by_stage: Dict[int, List[Tuple]] = {}
+            for item in batch:
+                by_stage.setdefault(item[3], []).append(item)
+
+            for code, items in by_stage.items():
+                self._run_stage(code, items)
+
+    def _run_stage(self, code: int, items: List[Tuple]):
+        try:
+            stage = STAGES[code]
+            results = self.analyzers[stage].analyze_batch([item[4] for item in items])
+            replies = [(STATUS_OK, _encode_result(stage, r)) for r in results]
+        except Exception as e:
+            logger.error(f"Inference batch failed: {e}")
+            replies = [(STATUS_ERROR, b"")] * len(items)
+
+        for (conn, send_lock, request_id, _, _), (status, payload) in zip(items, replies):
+            header = _LENGTH.pack(_RESPONSE.size + len(payload)) + _RESPONSE.pack(request_id, status)
+            try:
+                with send_lock:
+                    conn.sendmsg([header, payload])
+            except OSError:
+                pass  # Client went away; its reader thread cleans up
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "socket_path": self.socket_path,
+            "batches": self._batches,
+            "items": self._items,
+            "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0,
+            "queued": self._requests.qsize(),
+        }
+
+
+class _Pending:
+    __slots__ = ("event", "status", "payload")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.status = STATUS_ERROR
+        self.payload = b""
+
+
+class RemoteInferenceClient:
+    """
+    Client for InferenceServer, shared by all threads of an API worker.
+
+    Requests are multiplexed over one connection by request id. If the
+    server is down, calls fail fast with InferenceUnavailable until
+    `retry_interval` has passed, so callers can fall back to rules.
+    Fork-safe: a forked worker opens its own connection.
+    """
+
+    def __init__(self, socket_path: str, timeout_ms: float = 200, retry_interval: float = 1.0):
+        """
+        Args:
+            socket_path: Server's Unix socket
+            timeout_ms: Default per-call timeout
+            retry_interval: Seconds to wait before reconnecting after a failure
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout_ms / 1000
+        self.retry_interval = retry_interval
+
+        self._lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._pid = None
+        self._pending: Dict[int, _Pending] = {}
+        self._next_id = 0
+        self._down_until = 0.0
+        self._calls = 0
+        self._failures = 0
+
+    def infer(self, stage: str, text: str, timeout: Optional[float] = None) -> Any:
+        """
+        Run one model stage remotely.
+
+        Args:
+            stage: One of STAGES
+            text: Preprocessed text
+            timeout: Seconds to wait (defaults to the client timeout)
+
+        Raises:
+            InferenceUnavailable: Server down, slow, or failed
+        """
+        timeout = self.timeout if timeout is None else timeout
+        if timeout <= 0:
+            raise InferenceUnavailable("no time left")
+
+        payload = text.encode("utf-8")
+        pending = _Pending()
+        with self._lock:
+            self._calls += 1
+            sock = self._connection()
+            self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+            request_id = self._next_id
+            self._pending[request_id] = pending
+            header = _LENGTH.pack(_REQUEST.size + len(payload)) + _REQUEST.pack(request_id, STAGE_CODES[stage])
+            try:
+                sock.sendmsg([header, payload])
+            except OSError as e:
+                self._pending.pop(request_id, None)
+                self._disconnect()
+                self._failures += 1
+                raise InferenceUnavailable(f"send failed: {e}")
+
+        if not pending.event.wait(timeout):
+            with self._lock:
+                self._pending.pop(request_id, None)
+                self._failures += 1
+            raise InferenceUnavailable(f"{stage} timed out after {timeout * 1000:.0f}ms")
+
+        if pending.status != STATUS_OK:
+            with self._lock:
+                self._failures += 1
+            raise InferenceUnavailable(f"{stage} failed on the server")
+        return _decode_result(stage, pending.payload)
+
+    def _connection(self) -> socket.socket:
+        """Get the connection, (re)connecting if needed. Caller holds the lock."""
+        if self._sock is not None and self._pid == os.getpid():
+            return self._sock
+        if time.monotonic() < self._down_until:
+            self._failures += 1
+            raise InferenceUnavailable("server unavailable")
+
+        # After a fork the inherited socket belongs to the parent
+        self._sock = None
+        self._pending.clear()
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.socket_path)
+        except OSError as e:
+            self._down_until = time.monotonic() + self.retry_interval
+            self._failures += 1
+            raise InferenceUnavailable(f"connect failed: {e}")
+
+        self._sock, self._pid = sock, os.getpid()
+        threading.Thread(
+            target=self._read_loop, args=(sock,), name="inference-client", daemon=True
+        ).start()
+        return sock
+
+    def _read_loop(self, sock: socket.socket):
+        buffer = bytearray(MAX_FRAME)
+        try:
+            while True:
+                frame = _read_frame(sock, buffer)
+                if frame is None:
+                    break
+                request_id, status = _RESPONSE.unpack_from(frame)
+                with self._lock:
+                    pending = self._pending.pop(request_id, None)
+                if pending is not None:
+                    pending.status = status
+                    pending.payload = bytes(frame[_RESPONSE.size:])
+                    pending.event.set()
+        except (OSError, ValueError):
+            pass
+        with self._lock:
+            if self._sock is sock:
+                self._disconnect()
+
+    def _disconnect(self):
+        """Drop the connection and fail waiting calls. Caller holds the lock."""
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._down_until = time.monotonic() + self.retry_interval
+        for pending in self._pending.values():
+            pending.event.set()  # status stays STATUS_ERROR
+        self._pending.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "socket_path": self.socket_path,
+                "connected": self._sock is not None and self._pid == os.getpid(),
+                "calls": self._calls,
+                "failures": self._failures,
+                "in_flight": len(self._pending),
+            }
@@ -0,0 +1,231 @@
+"""
+Load-adaptive degradation.
+
+Watches in-flight requests, queue wait and recent p95 model-stage latency,
+and steps the processor down to progressively cheaper modes when the system
+is overloaded. Modes step back up automatically once pressure has stayed low
+for a while.
+
+Latency is taken from the model stage only (see measure()), not the whole
+request: LLM feedback takes seconds even on an idle server, and counting it
+would degrade the models for traffic that isn't load at all.
+"""
+
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+from enum import IntEnum
+from threading import Lock
+from typing import Optional, Dict, Any, FrozenSet, List
+
+logger = logging.getLogger(__name__)
+
+
+class DegradationMode(IntEnum):
+    """Processing modes, from most to least expensive."""
+    FULL = 0
+    SKIP_EMOTION = 1
+    SKIP_HATE_SPEECH = 2
+    RULES_ONLY = 3
+    TEMPLATE_ONLY = 4
+
+
+# Stages switched to their cheap path in each mode (cumulative)
+MODE_DISABLED_STAGES: Dict[DegradationMode, FrozenSet[str]] = {
+    DegradationMode.FULL: frozenset(),
+    DegradationMode.SKIP_EMOTION: frozenset({"emotion"}),
+    DegradationMode.SKIP_HATE_SPEECH: frozenset({"emotion", "hate_speech"}),
+    DegradationMode.RULES_ONLY: frozenset({"emotion", "hate_speech", "toxicity"}),
+    DegradationMode.TEMPLATE_ONLY: frozenset({"emotion", "hate_speech", "toxicity", "feedback_llm"}),
+}
+
+
+class LoadController:
+    """
+    Chooses the processing mode from recent load.
+
+    Pressure is the worst of in-flight count, p95 queue wait and p95
+    model-stage latency, each divided by its configured limit (1.0 = at the
+    limit). The mode steps up one level whenever pressure reaches the
+    threshold of the next level, and steps down one level only after pressure
+    has stayed below the current level's threshold times `recover_ratio` for
+    `cooldown_seconds`.
+
+    Samples from before a mode change describe the old mode, so the windows
+    are emptied on every change and the p95 figures only count again once
+    `min_window_samples` new requests were seen. A slow p95 therefore moves
+    the mode at most one level per fresh window, instead of once per
+    evaluation.
+
+    Thread-safe.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        max_in_flight: int = 32,
+        max_queue_wait_ms: float = 200,
+        max_p95_ms: float = 500,
+        level_thresholds: Optional[List[float]] = None,
+        recover_ratio: float = 0.7,
+        cooldown_seconds: float = 10,
+        window_size: int = 200,
+        window_seconds: float = 30,
+        min_window_samples: int = 20,
+        eval_interval_seconds: float = 0.25
+    ):
+        """
+        Args:
+            enabled: If False, always stay in FULL mode
+            max_in_flight: Concurrent requests considered "at the limit"
+            max_queue_wait_ms: p95 queue wait considered "at the limit"
+            max_p95_ms: p95 model-stage latency considered "at the limit"
+            level_thresholds: Pressure needed to enter each degraded mode
+            recover_ratio: Fraction of a level's threshold to fall below before recovering
+            cooldown_seconds: How long pressure must stay low before stepping down
+            window_size: Maximum number of recent requests used for p95 figures
+            window_seconds: Only requests this recent count towards p95 figures
+            min_window_samples: Samples needed before a p95 figure counts
+            eval_interval_seconds: Minimum time between mode evaluations
+        """
+        self.enabled = enabled
+        self.max_in_flight = max_in_flight
+        self.max_queue_wait_ms = max_queue_wait_ms
+        self.max_p95_ms = max_p95_ms
+        self.level_thresholds = level_thresholds or [1.0, 1.5, 2.0, 3.0]
+        self.recover_ratio = recover_ratio
+        self.cooldown = cooldown_seconds
+        self.window_seconds = window_seconds
+        self.min_window_samples = min_window_samples
+        self.eval_interval = eval_interval_seconds
+
+        self._mode = DegradationMode.FULL
+        self._in_flight = 0
+        self._latencies: deque = deque(maxlen=window_size)
+        self._queue_waits: deque = deque(maxlen=window_size)
+        self._low_since: Optional[float] = None
+        self._last_eval = 0.0
+        self._pressure = 0.0
+        self._transitions = 0
+        self._lock = Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "LoadController":
+        """Create a controller from MODEL_CONFIG["load_control"]."""
+        return cls(**config)
+
+    @property
+    def mode(self) -> DegradationMode:
+        return self._mode
+
+    def disabled_stages(self) -> FrozenSet[str]:
+        """Stages the current mode switches to their cheap path."""
+        return MODE_DISABLED_STAGES[self._mode]
+
+    @contextmanager
+    def track(self, queue_wait_ms: float = 0.0):
+        """Track one request for its whole duration."""
+        with self._lock:
+            self._in_flight += 1
+            self._queue_waits.append((time.monotonic(), queue_wait_ms))
+        self.evaluate()
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self.evaluate()
+
+    @contextmanager
+    def measure(self):
+        """Time a request's model stage (including its wait for a slot)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._latencies.append((time.monotonic(), elapsed_ms))
+
+    def evaluate(self, now: Optional[float] = None) -> DegradationMode:
+        """Re-evaluate the mode (rate limited by eval_interval_seconds)."""
+        if not self.enabled:
+            return self._mode
+
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if now - self._last_eval < self.eval_interval:
+                return self._mode
+            self._last_eval = now
+            self._expire_samples(now)
+            self._pressure = self._compute_pressure()
+            self._apply_hysteresis(self._pressure, now)
+            return self._mode
+
+    def _expire_samples(self, now: float):
+        cutoff = now - self.window_seconds
+        for samples in (self._latencies, self._queue_waits):
+            while samples and samples[0][0] < cutoff:
+                samples.popleft()
+
+    def _windowed_p95(self, samples) -> float:
+        return _p95(samples) if len(samples) >= self.min_window_samples else 0.0
+
+    def _compute_pressure(self) -> float:
+        return max(
+            self._in_flight / self.max_in_flight,
+            self._windowed_p95(self._queue_waits) / self.max_queue_wait_ms,
+            self._windowed_p95(self._latencies) / self.max_p95_ms,
+        )
+
+    def _apply_hysteresis(self, pressure: float, now: float):
+        level = int(self._mode)
+
+        # Step up immediately
+        if level < DegradationMode.TEMPLATE_ONLY and pressure >= self.level_thresholds[level]:
+            self._set_mode(DegradationMode(level + 1), pressure)
+            self._low_since = None
+            return
+
+        if level == DegradationMode.FULL:
+            return
+
+        # Step down only after pressure has stayed low for the cooldown
+        if pressure < self.level_thresholds[level - 1] * self.recover_ratio:
+            if self._low_since is None:
+                self._low_since = now
+            elif now - self._low_since >= self.cooldown:
+                self._set_mode(DegradationMode(level - 1), pressure)
+                self._low_since = now
+        else:
+            self._low_since = None
+
+    def _set_mode(self, mode: DegradationMode, pressure: float):
+        logger.warning(f"Load mode {self._mode.name} -> {mode.name} (pressure={pressure:.2f})")
+        self._mode = mode
+        self._transitions += 1
+        self._latencies.clear()
+        self._queue_waits.clear()
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get controller status."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "mode": self._mode.name.lower(),
+                "disabled_stages": sorted(MODE_DISABLED_STAGES[self._mode]),
+                "pressure": round(self._pressure, 3),
+                "in_flight": self._in_flight,
+                "p95_latency_ms": round(_p95(self._latencies), 2),
+                "p95_queue_wait_ms": round(_p95(self._queue_waits), 2),
+                "transitions": self._transitions,
+            }
+
+
+def _p95(samples) -> float:
+    """p95 of (timestamp, value) samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(value for _, value in samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
@@ -0,0 +1,332 @@
+"""
+Pre-fork multi-worker serving.
+
+The master process loads and warms the models once, freezes the GC heap and
+then forks the API workers. Workers share the model weights with the master
+copy-on-write, so N workers cost far less than N x the model RAM.
+
+POSIX only (needs os.fork).
+"""
+
+import gc
+import os
+import sys
+import time
+import signal
+import socket
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Fields of /proc/<pid>/smaps_rollup we report (values are in kB)
+_SMAPS_FIELDS = {
+    "Rss": "rss_mb",
+    "Pss": "pss_mb",
+    "Shared_Clean": "shared_clean_mb",
+    "Shared_Dirty": "shared_dirty_mb",
+    "Private_Clean": "private_clean_mb",
+    "Private_Dirty": "private_dirty_mb",
+}
+
+
+def process_memory(pid: Optional[int] = None) -> Dict[str, float]:
+    """
+    Memory use of a process in MB.
+
+    Reads /proc/<pid>/smaps_rollup, which splits RSS into pages shared with
+    other processes (e.g. model weights inherited from the master) and private
+    pages. PSS divides shared pages between the processes sharing them, so the
+    PSS of all workers adds up to their real footprint.
+
+    Returns an empty dict where /proc is not available.
+    """
+    pid = pid or os.getpid()
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.readlines()
+    except OSError:
+        return {}
+
+    usage = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].rstrip(":") in _SMAPS_FIELDS:
+            usage[_SMAPS_FIELDS[parts[0].rstrip(":")]] = round(int(parts[1]) / 1024, 1)
+    if usage:
+        usage["shared_mb"] = round(
+            usage.get("shared_clean_mb", 0) + usage.get("shared_dirty_mb", 0), 1
+        )
+    return usage
+
+
+class _Worker:
+    __slots__ = ("pid", "generation", "started")
+
+    def __init__(self, pid: int, generation: int):
+        self.pid = pid
+        self.generation = generation
+        self.started = time.monotonic()
+
+
+class PreforkServer:
+    """
+    Master process for pre-fork serving.
+
+    - `preload()` builds the processor in the master (models loaded, warmed).
+    - The master binds the listening socket, then forks `workers` children
+      that each run uvicorn on the inherited socket.
+    - Crashed workers are restarted (with backoff if they keep crashing).
+    - SIGHUP reloads: the master preloads again, starts a new generation of
+      workers and gracefully stops the old one. No requests are dropped since
+      both generations accept on the same socket.
+    - SIGTERM/SIGINT stop all workers gracefully.
+    - SIGUSR1 logs per-worker memory (also logged every `report_interval`).
+    """
+
+    def __init__(
+        self,
+        app: Any,
+        preload: Callable[[], Any],
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        workers: int = 4,
+        graceful_timeout: float = 30,
+        min_uptime: float = 5,
+        report_interval: float = 300,
+        log_level: str = "info"
+    ):
+        """
+        Args:
+            app: ASGI app (or "module:attr" import string) each worker serves
+            preload: Called in the master before forking (and again on reload);
+                should load models and install the shared processor
+            host: Bind address
+            port: Bind port
+            workers: Number of worker processes
+            graceful_timeout: Seconds a stopping worker gets before SIGKILL
+            min_uptime: Workers that die sooner than this count as crash-looping
+            report_interval: Seconds between memory reports (0 to disable)
+            log_level: uvicorn log level for workers
+        """
+        if not hasattr(os, "fork"):
+            raise RuntimeError("Pre-fork serving needs os.fork (POSIX only)")
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.app = app
+        self.preload = preload
+        self.host = host
+        self.port = port
+        self.num_workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.min_uptime = min_uptime
+        self.report_interval = report_interval
+        self.log_level = log_level
+
+        self._socket: Optional[socket.socket] = None
+        self._workers: Dict[int, _Worker] = {}
+        self._generation = 0
+        self._crash_streak = 0
+        self._restarts = 0
+        self._reload_requested = False
+        self._report_requested = False
+        self._stopping = False
+
+    def run(self):
+        """Preload, fork the workers and supervise them until stopped."""
+        self._preload()
+        self._socket = self._bind()
+        self._install_signal_handlers()
+
+        logger.info(f"Master {os.getpid()} serving on {self.host}:{self.port} with {self.num_workers} workers")
+        self._spawn_generation()
+
+        last_report = time.monotonic()
+        try:
+            while not self._stopping:
+                self._reap()
+                if self._reload_requested:
+                    self._reload_requested = False
+                    self._reload()
+                now = time.monotonic()
+                if self._report_requested or (
+                    self.report_interval and now - last_report >= self.report_interval
+                ):
+                    self._report_requested = False
+                    last_report = now
+                    self._log_memory()
+                self._maintain()
+                time.sleep(0.2)
+        finally:
+            self._stop_workers(list(self._workers))
+            self._socket.close()
+            logger.info("Master stopped")
+
+    def _preload(self):
+        start = time.time()
+        gc.unfreeze()
+        self.preload()
+        # Move everything allocated so far out of the collector's reach: the
+        # GC would otherwise write to every object header during collections
+        # in the workers and un-share their pages.
+        gc.collect()
+        gc.freeze()
+        logger.info(f"Preloaded in {time.time() - start:.2f}s ({gc.get_freeze_count()} objects frozen)")
+
+    def _bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET6 if ":" in self.host else socket.AF_INET)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def _install_signal_handlers(self):
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, "_reload_requested", True))
+        signal.signal(signal.SIGUSR1, lambda *_: setattr(self, "_report_requested", True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, "_stopping", True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, "_stopping", True))
+
+    def _spawn_generation(self):
+        self._generation += 1
+        for _ in range(self.num_workers):
+            self._spawn()
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()
+        self._workers[pid] = _Worker(pid, self._generation)
+        logger.info(f"Started worker {pid} (generation {self._generation})")
+
+    def _run_worker(self):
+        """Worker process body. Never returns."""
+        code = 0
+        try:
+            for sig in (signal.SIGHUP, signal.SIGUSR1, signal.SIGTERM, signal.SIGINT):
+                signal.signal(sig, signal.SIG_DFL)
+            self._limit_torch_threads()
+
+            import uvicorn
+            config = uvicorn.Config(self.app, log_level=self.log_level, lifespan="on")
+            uvicorn.Server(config).run(sockets=[self._socket])
+        except BaseException:
+            logger.exception(f"Worker {os.getpid()} failed")
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _limit_torch_threads(self):
+        # Each worker would otherwise start one intra-op thread per core
+        torch = sys.modules.get("torch")
+        if torch is not None:
+            torch.set_num_threads(max(1, (os.cpu_count() or 1) // self.num_workers))
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+
+            worker = self._workers.pop(pid, None)
+            if worker is None or self._stopping or worker.generation != self._generation:
+                continue
+
+            code = os.waitstatus_to_exitcode(status)
+            logger.warning(f"Worker {pid} exited unexpectedly (code {code})")
+            if time.monotonic() - worker.started < self.min_uptime:
+                self._crash_streak += 1
+            else:
+                self._crash_streak = 0
+
+    def _maintain(self):
+        """Bring the current generation back up to `num_workers`."""
+        current = sum(1 for w in self._workers.values() if w.generation == self._generation)
+        missing = self.num_workers - current
+        if missing <= 0 or self._stopping:
+            return
+
+        if self._crash_streak:
+            # Back off when workers die right after starting
+            delay = min(30, 2 ** min(self._crash_streak, 5))
+            logger.warning(f"Workers crash-looping, waiting {delay}s before restart")
+            time.sleep(delay)
+            if self._stopping:
+                return
+
+        for _ in range(missing):
+            self._restarts += 1
+            self._spawn()
+
+    def _reload(self):
+        logger.info("Reloading: preloading and starting a new worker generation")
+        old = [pid for pid, w in self._workers.items() if w.generation == self._generation]
+        try:
+            self._preload()
+        except Exception:
+            logger.exception("Reload failed, keeping the current workers")
+            return
+        self._crash_streak = 0
+        self._spawn_generation()
+        self._stop_workers(old)
+
+    def _stop_workers(self, pids: List[int]):
+        """SIGTERM the workers (uvicorn finishes in-flight requests), then SIGKILL stragglers."""
+        for pid in pids:
+            _signal(pid, signal.SIGTERM)
+
+        deadline = time.monotonic() + self.graceful_timeout
+        remaining = set(pids)
+        while remaining and time.monotonic() < deadline:
+            for pid in list(remaining):
+                try:
+                    done, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    done = pid
+                if done:
+                    remaining.discard(pid)
+                    self._workers.pop(pid, None)
+            time.sleep(0.1)
+
+        for pid in remaining:
+            logger.warning(f"Worker {pid} did not stop in time, killing it")
+            _signal(pid, signal.SIGKILL)
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+            self._workers.pop(pid, None)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Per-process memory and worker counts."""
+        return {
+            "master": {"pid": os.getpid(), **process_memory()},
+            "workers": [
+                {"pid": pid, "generation": w.generation, **process_memory(pid)}
+                for pid, w in sorted(self._workers.items())
+            ],
+            "generation": self._generation,
+            "restarts": self._restarts,
+        }
+
+    def _log_memory(self):
+        status = self.get_status()
+        master = status["master"]
+        logger.info(f"Master {master['pid']}: rss={master.get('rss_mb')}MB pss={master.get('pss_mb')}MB")
+        for w in status["workers"]:
+            logger.info(
+                f"Worker {w['pid']}: rss={w.get('rss_mb')}MB pss={w.get('pss_mb')}MB "
+                f"shared={w.get('shared_mb')}MB private_dirty={w.get('private_dirty_mb')}MB"
+            )
+        total_pss = master.get("pss_mb", 0) + sum(w.get("pss_mb", 0) for w in status["workers"])
+        logger.info(f"Total PSS: {round(total_pss, 1)}MB")
+
+
+def _signal(pid: int, sig: int):
+    try:
+        os.kill(pid, sig)
+    except ProcessLookupError:
+        pass
@@ -0,0 +1,211 @@
+"""
+Priority scheduling in front of the model stage.
+
+Messages that hit safety-critical rules (self-harm, threats) go into a
+CRITICAL lane that is always served first and has reserved capacity, so they
+never wait behind interactive or batch traffic.
+
+Waiting for a slot is bounded by the request's deadline (and `max_wait_ms`);
+a request that runs out of time in the queue gets no slot and takes the
+rule-based path instead.
+"""
+
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+from enum import IntEnum
+from threading import Condition
+from typing import Dict, Any, Optional
+
+from .deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+
+class Lane(IntEnum):
+    """Scheduling lanes, highest priority first."""
+    CRITICAL = 0
+    INTERACTIVE = 1
+    BATCH = 2
+
+
+class _LaneStats:
+    """Counters and recent latencies for one lane (guarded by the scheduler lock)."""
+
+    def __init__(self, window_size: int):
+        self.waiting = 0
+        self.active = 0
+        self.max_depth = 0
+        self.admitted = 0
+        self.shed = 0
+        self.timed_out = 0
+        self.waits_ms: deque = deque(maxlen=window_size)
+        self.service_ms: deque = deque(maxlen=window_size)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.waiting,
+            "active": self.active,
+            "max_queue_depth": self.max_depth,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "timed_out": self.timed_out,
+            "p50_wait_ms": round(_percentile(self.waits_ms, 0.5), 2),
+            "p95_wait_ms": round(_percentile(self.waits_ms, 0.95), 2),
+            "p95_service_ms": round(_percentile(self.service_ms, 0.95), 2),
+        }
+
+
+class PriorityScheduler:
+    """
+    Admission control for the model stage with priority lanes.
+
+    - At most `capacity` requests run the model stage at once.
+    - `reserved_critical` of those slots can only be used by CRITICAL work.
+    - Waiters are admitted strictly by lane priority, FIFO within a lane.
+
+    Thread-safe.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        capacity: int = 4,
+        reserved_critical: int = 1,
+        max_wait_ms: float = 2000,
+        window_size: int = 500
+    ):
+        """
+        Args:
+            enabled: If False, slot() admits everything immediately
+            capacity: Concurrent requests allowed in the model stage
+            reserved_critical: Slots only CRITICAL requests may use
+            max_wait_ms: Longest wait for a slot (less if the deadline is sooner)
+            window_size: Recent requests per lane kept for latency figures
+        """
+        if reserved_critical >= capacity:
+            raise ValueError("reserved_critical must be smaller than capacity")
+        self.enabled = enabled
+        self.capacity = capacity
+        self.reserved_critical = reserved_critical
+        self.max_wait_ms = max_wait_ms
+
+        self._cond = Condition()
+        self._active = 0
+        self._queues: Dict[Lane, deque] = {lane: deque() for lane in Lane}
+        self._stats: Dict[Lane, _LaneStats] = {lane: _LaneStats(window_size) for lane in Lane}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "PriorityScheduler":
+        """Create a scheduler from MODEL_CONFIG["scheduler"]."""
+        return cls(**config)
+
+    @contextmanager
+    def slot(self, lane: Lane, deadline: Optional[Deadline] = None):
+        """
+        Hold a model-stage slot in the given lane for the duration of the block.
+
+        Yields True once admitted, or False if the wait ran past the deadline
+        (or max_wait_ms); the block then runs without a slot and should only
+        do cheap work.
+        """
+        if not self.enabled:
+            yield True
+            return
+
+        timeout_s = (deadline or Deadline()).timeout_s(self.max_wait_ms / 1000)
+        wait_ms = self._acquire(lane, timeout_s)
+        if wait_ms is None:
+            yield False
+            return
+        start = time.perf_counter()
+        try:
+            yield True
+        finally:
+            self._release(lane, wait_ms, (time.perf_counter() - start) * 1000)
+
+    def _acquire(self, lane: Lane, timeout_s: float) -> Optional[float]:
+        """Wait for a slot; returns the wait in ms, or None on timeout."""
+        start = time.perf_counter()
+        give_up_at = time.monotonic() + timeout_s
+        ticket = object()
+        stats = self._stats[lane]
+        with self._cond:
+            queue = self._queues[lane]
+            queue.append(ticket)
+            stats.waiting += 1
+            stats.max_depth = max(stats.max_depth, stats.waiting)
+            while not self._can_admit(lane, ticket):
+                remaining = give_up_at - time.monotonic()
+                if remaining <= 0:
+                    queue.remove(ticket)
+                    stats.waiting -= 1
+                    stats.timed_out += 1
+                    # The next waiter in this lane may now be at the head
+                    self._cond.notify_all()
+                    return None
+                self._cond.wait(remaining)
+            queue.popleft()
+            stats.waiting -= 1
+            stats.active += 1
+            stats.admitted += 1
+            self._active += 1
+            # Others in this lane may now be at the head of the queue
+            self._cond.notify_all()
+        return (time.perf_counter() - start) * 1000
+
+    def _can_admit(self, lane: Lane, ticket: object) -> bool:
+        if self._queues[lane][0] is not ticket:
+            return False
+        if any(self._queues[higher] for higher in Lane if higher < lane):
+            return False
+        free = self.capacity - self._active
+        if lane == Lane.CRITICAL:
+            return free > 0
+        return free > self.reserved_critical
+
+    def _release(self, lane: Lane, wait_ms: float, service_ms: float):
+        with self._cond:
+            self._active -= 1
+            stats = self._stats[lane]
+            stats.active -= 1
+            stats.waits_ms.append(wait_ms)
+            stats.service_ms.append(service_ms)
+            self._cond.notify_all()
+
+    def should_shed(self, lane: Lane) -> bool:
+        """
+        Check if optional work (e.g. LLM feedback) in this lane should be shed.
+
+        CRITICAL work is never shed. Other lanes shed while anyone is queued
+        or all shared slots are busy.
+        """
+        if not self.enabled or lane == Lane.CRITICAL:
+            return False
+        with self._cond:
+            queued = any(self._queues[l] for l in Lane)
+            saturated = self.capacity - self._active <= self.reserved_critical
+            return queued or saturated
+
+    def record_shed(self, lane: Lane):
+        with self._cond:
+            self._stats[lane].shed += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-lane queue depth and latency."""
+        with self._cond:
+            return {
+                "enabled": self.enabled,
+                "capacity": self.capacity,
+                "reserved_critical": self.reserved_critical,
+                "active": self._active,
+                "lanes": {lane.name.lower(): self._stats[lane].to_dict() for lane in Lane},
+            }
+
+
+def _percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
@@ -0,0 +1,126 @@
+"""
+Single-flight request coalescing.
+
+When many identical requests arrive together (a message going viral in a
+class chat), they all miss the cache because the first computation has not
+finished yet. SingleFlight lets the first caller compute and makes the
+others wait for its result, from threads or from asyncio code.
+
+A waiting caller with a latency budget passes a timeout; if the leader has
+not finished by then it computes on its own (and normally takes the cheap
+path its own deadline allows) instead of waiting past its budget.
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one computation.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it runs get the same result, or the same exception. Once
+    it finishes the key is released, so later calls compute again (and
+    normally hit a cache filled by the leader). Thread-safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self._leaders = 0
+        self._coalesced = 0
+        self._timed_out = 0
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        """Get the in-flight call for a key, or register a new one (leader)."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._coalesced += 1
+                return future, False
+            future = self._calls[key] = Future()
+            self._leaders += 1
+            return future, True
+
+    def _complete(self, key: Hashable, future: Future, fn: Callable[[], Any]):
+        """Run the leader's function and publish the outcome. Never raises."""
+        try:
+            result = fn()
+        except BaseException as e:
+            self._release(key)
+            future.set_exception(e)
+        else:
+            self._release(key)
+            future.set_result(result)
+
+    def _release(self, key: Hashable):
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def _record_timeout(self):
+        with self._lock:
+            self._timed_out += 1
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """
+        Run `fn` once for all concurrent callers with this key.
+
+        Args:
+            key: Callers with equal keys share a computation
+            fn: The computation
+            timeout: Longest wait for another caller's computation, in
+                seconds (None = no limit); after that `fn` runs here
+
+        Returns:
+            (result, shared) - shared is True for callers that waited on
+            another caller's computation. The result object is the same for
+            everyone; copy it before mutating.
+        """
+        future, leader = self._join(key)
+        if leader:
+            self._complete(key, future, fn)
+            return future.result(), False
+        try:
+            return future.result(timeout=timeout), True
+        except FutureTimeout:
+            self._record_timeout()
+            return fn(), False
+
+    async def do_async(
+        self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None
+    ) -> Tuple[Any, bool]:
+        """
+        Async do(): `fn` (blocking) runs in the default executor, and
+        waiting callers do not hold a thread. Coalesces with do() callers.
+        """
+        future, leader = self._join(key)
+        loop = asyncio.get_running_loop()
+        if leader:
+            try:
+                loop.run_in_executor(None, self._complete, key, future, fn)
+            except BaseException as e:
+                self._release(key)
+                future.set_exception(e)
+            # shield: a cancelled leader must not cancel the future its followers wait on
+            return await asyncio.shield(asyncio.wrap_future(future)), False
+        try:
+            # shield: giving up must not cancel the leader's future
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout), True
+        except asyncio.TimeoutError:
+            self._record_timeout()
+            return await loop.run_in_executor(None, fn), False
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self._leaders,
+                "coalesced": self._coalesced,
+                "timed_out": self._timed_out,
+            }
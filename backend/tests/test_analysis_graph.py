@@ -0,0 +1,117 @@
+"""
+Tests for demand-driven analysis (analyzer DAG + per-message memo).
+"""
+
+import pytest
+from src.pipeline import MessageProcessor
+from src.models import Classification, EmotionType
+from src.analyzer import SafetyAnalyzer
+from src.analyzer.graph import AnalysisGraph, AnalysisNode, AnalysisMemo
+from src.serving import Deadline
+
+
+class TestAnalysisGraph:
+    """Graph evaluation should only run what is needed."""
+    
+    @pytest.fixture
+    def calls(self):
+        return []
+    
+    @pytest.fixture
+    def graph(self, calls):
+        def node(name, inputs=()):
+            def compute(text, deadline, **deps):
+                calls.append(name)
+                return f"{name}({','.join(sorted(deps.values()))})"
+            return AnalysisNode(name, tuple(inputs), compute)
+        
+        return AnalysisGraph(
+            [node("a"), node("b"), node("c", ["a"]), node("d", ["b", "c"])],
+            memo=AnalysisMemo(max_entries=10)
+        )
+    
+    def test_only_required_nodes_run(self, graph, calls):
+        result = graph.evaluate("msg", ["c"])
+        assert result == {"c": "c(a())"}
+        assert calls == ["a", "c"]
+    
+    def test_results_memoized_per_message(self, graph, calls):
+        graph.evaluate("msg", ["c"])
+        calls.clear()
+        
+        graph.evaluate("msg", ["d"])
+        assert calls == ["b", "d"]  # a and c reused
+        
+        calls.clear()
+        graph.evaluate("other", ["c"])
+        assert calls == ["a", "c"]
+    
+    def test_degraded_nodes_not_memoized(self, calls):
+        def degraded(text, deadline):
+            calls.append("model")
+            deadline.degrade("model")
+            return "rules"
+        
+        graph = AnalysisGraph(
+            [AnalysisNode("model", (), degraded),
+             AnalysisNode("derived", ("model",), lambda text, deadline, model: model)],
+            memo=AnalysisMemo()
+        )
+        graph.evaluate("msg", ["derived"], Deadline())
+        graph.evaluate("msg", ["derived"], Deadline())
+        assert calls == ["model", "model"]
+    
+    def test_cycle_rejected(self):
+        with pytest.raises(ValueError):
+            AnalysisGraph([
+                AnalysisNode("x", ("y",), lambda text, deadline, y: y),
+                AnalysisNode("y", ("x",), lambda text, deadline, x: x),
+            ])
+    
+    def test_unknown_output_rejected(self, graph):
+        with pytest.raises(ValueError):
+            graph.evaluate("msg", ["nope"])
+
+
+class TestSafetyAnalyzerGraph:
+    """SafetyAnalyzer should compute only the fields asked for."""
+    
+    @pytest.fixture
+    def analyzer(self):
+        return SafetyAnalyzer(use_models=False)
+    
+    def test_emotion_only(self, analyzer):
+        analyzer.toxicity_analyzer.analyze = lambda *a, **k: pytest.fail("toxicity not needed")
+        result = analyzer.evaluate("I'm so happy", ["emotion"])
+        assert result["emotion"].primary_emotion == EmotionType.JOY
+    
+    def test_full_analysis_matches_fields(self, analyzer):
+        full = analyzer.analyze("You're stupid")
+        partial = analyzer.evaluate("You're stupid", ["detected_issues"])
+        assert partial["detected_issues"] == full.detected_issues
+    
+    def test_memo_reused_across_calls(self, analyzer):
+        analyzer.evaluate("You're stupid", ["detected_issues"])
+        analyzer.toxicity_analyzer.analyze = lambda *a, **k: pytest.fail("should be memoized")
+        analyzer.analyze("You're stupid")
+        assert analyzer.get_analyzer_info()["memo"]["hits"] >= 1
+
+
+class TestAnalyzeFields:
+    """MessageProcessor.analyze_fields and quick_classify pay for what they use."""
+    
+    @pytest.fixture
+    def processor(self):
+        return MessageProcessor(use_models=False)
+    
+    def test_quick_classify_skips_emotion(self, processor):
+        processor.analyzer.emotion_analyzer.analyze = lambda *a, **k: pytest.fail("emotion not needed")
+        assert processor.quick_classify("fuck you") == Classification.RED
+    
+    def test_classification_field(self, processor):
+        values = processor.analyze_fields("This is boring", ["classification"])
+        assert values == {"classification": Classification.YELLOW}
+    
+    def test_unknown_field(self, processor):
+        with pytest.raises(ValueError):
+            processor.analyze_fields("Hello", ["feedback"])
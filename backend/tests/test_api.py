@@ -34,6 +34,10 @@ class TestAPIEndpoints:
         assert response.status_code == 200
         assert response.json()["status"] == "healthy"
     
+    def test_health_reports_load_mode(self, client):
+        response = client.get("/health")
+        assert response.json()["mode"] == "full"
+    
     def test_analyze_green(self, client):
         response = client.post("/analyze", json={"message": "Hello!"})
         assert response.status_code == 200
@@ -45,11 +49,70 @@ class TestAPIEndpoints:
         assert response.json()["classification"] == "red"
         assert response.json()["feedback"] is not None
     
+    def test_analyze_cache_hit_served_from_bytes(self, client):
+        first = client.post("/analyze", json={"message": "Your idea is bad"}).json()
+        second = client.post("/analyze", json={"message": "Your idea is bad"}).json()
+        assert not first["metadata"]["cache_hit"]
+        assert second["metadata"]["cache_hit"]
+        for key in ("classification", "analysis", "feedback", "educational"):
+            assert second[key] == first[key]
+    
+    def test_analyze_with_child_id_uses_cache(self, client):
+        body = {"message": "Your plan is dumb", "child_id": "child-cache"}
+        first = client.post("/analyze", json=body).json()
+        second = client.post("/analyze", json=body).json()
+        assert not first["metadata"]["cache_hit"]
+        assert second["metadata"]["cache_hit"]
+        assert second["classification"] == first["classification"]
+    
+    def test_analyze_stream(self, client):
+        response = client.post("/analyze/stream", json={"message": "You're stupid"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        
+        events = [line.split(": ", 1)[1] for line in response.text.splitlines() if line.startswith("event:")]
+        assert events == ["result", "done"]  # Not speculative: nothing to push
+    
+    def test_analyze_stream_pushes_llm_feedback(self, client, monkeypatch):
+        import json
+        import importlib
+        api_module = importlib.import_module("src.api.app")  # The package attribute is the app
+        from src.pipeline import MessageProcessor
+        from src.feedback.stub_server import StubLLMServer
+        
+        with StubLLMServer(delay_ms=100) as stub:
+            monkeypatch.setenv("HF_API_URL", stub.model_url())
+            monkeypatch.setenv("FEEDBACK_SPECULATIVE", "1")
+            monkeypatch.setattr(api_module, "_processor", MessageProcessor(
+                use_models=False, feedback_mode="hf_llm", hf_api_key="stub"
+            ))
+            response = client.post("/analyze/stream", json={"message": "You're stupid"})
+        
+        events = dict(
+            (block.split("\n")[0][len("event: "):], block.split("\n")[1][len("data: "):])
+            for block in response.text.strip().split("\n\n")
+        )
+        result = json.loads(events["result"])
+        assert result["metadata"]["feedback_source"] == "template_speculative"
+        assert "hurt someone's feelings" in json.loads(events["feedback"])["main_message"]
+        assert "done" in events
+    
     def test_classify(self, client):
         response = client.post("/classify", json={"message": "You're stupid"})
         assert response.status_code == 200
         assert response.json()["classification"] == "red"
     
+    def test_analyze_fields(self, client):
+        response = client.post("/analyze/fields", json={
+            "message": "You're stupid", "fields": ["classification", "intent"]
+        })
+        assert response.status_code == 200
+        assert response.json() == {"classification": "red", "intent": "personal_attack"}
+    
+    def test_analyze_fields_unknown(self, client):
+        response = client.post("/analyze/fields", json={"message": "Hi", "fields": ["nope"]})
+        assert response.status_code == 400
+    
     def test_examples(self, client):
         response = client.get("/examples")
         assert response.status_code == 200
@@ -76,6 +139,12 @@ class TestAPIValidation:
         messages = ["test"] * 150
         response = client.post("/batch", json=messages)
         assert response.status_code == 400
+    
+    def test_cache_stats(self, client):
+        response = client.get("/cache/stats")
+        assert response.status_code == 200
+        assert "response" in response.json()["layers"]
+        assert response.json()["analytics"] == {"enabled": False}
 
 
 class TestAPISettings:
@@ -0,0 +1,182 @@
+"""
+Stress tests: the pipeline must be safe to call from many threads.
+
+See docs/THREAD_SAFETY.md for the audit these back up.
+"""
+
+import time
+import asyncio
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from src.pipeline import MessageProcessor
+from src.models import Classification
+
+
+MESSAGES = ["You're stupid", "Whatever", "Hello friend!", "Nobody likes you", "This is boring"]
+AGES = ["8-10", "11-13"]
+
+# Age-specific explanation for a personal attack
+AGE_MARKERS = {
+    "8-10": "like a punch but on the inside",
+    "11-13": "Attacking someone personally",
+}
+
+
+def _signature(result):
+    return (
+        result.classification,
+        tuple(result.analysis.detected_issues),
+        result.feedback is not None,
+    )
+
+
+class TestConcurrentProcessing:
+    """Concurrent requests give the same results as sequential ones."""
+    
+    @pytest.fixture(params=[True, False], ids=["cache", "no_cache"])
+    def processor(self, request):
+        return MessageProcessor(
+            use_models=False,
+            feedback_mode="template",
+            cache_enabled=request.param
+        )
+    
+    def test_results_match_sequential(self, processor):
+        jobs = [(msg, age) for msg in MESSAGES for age in AGES] * 20
+        expected = {
+            (msg, age): _signature(processor.process(msg, age, skip_cache=True))
+            for msg, age in set(jobs)
+        }
+        
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(lambda job: processor.process(*job), jobs))
+        
+        for job, result in zip(jobs, results):
+            assert result.success
+            assert _signature(result) == expected[job]
+    
+    def test_per_request_age_range_isolated(self, processor):
+        jobs = [AGES[i % 2] for i in range(400)]
+        
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(
+                lambda age: processor.process("You're stupid", age, skip_cache=True),
+                jobs
+            ))
+        
+        for age, result in zip(jobs, results):
+            assert result.classification == Classification.RED
+            assert AGE_MARKERS[age] in result.feedback.main_message
+        
+        # The default age range is never touched by per-request ages
+        assert processor.feedback_generator.age_range == "8-10"
+    
+    def test_cache_hits_do_not_share_results(self, processor):
+        processor.process("You're stupid")
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: processor.process("You're stupid"), range(50)))
+        
+        for result in results:
+            result.analysis.detected_issues.clear()
+        assert processor.process("You're stupid").analysis.detected_issues
+    
+    def test_conversation_windows_concurrent(self, processor):
+        def send(i):
+            return processor.process("Whatever", child_id=f"kid-{i % 10}")
+        
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(send, range(300)))
+        
+        stats = processor.conversation_analyzer.get_stats()
+        assert stats["live_sessions"] == 10
+        # Every child sent 30 messages; the window is full for all of them
+        signal = processor.process("Whatever", child_id="kid-0").analysis.conversation
+        assert signal.window_size == processor.conversation_analyzer.window_size
+        assert signal.repetition_detected
+
+
+class TestCoalescing:
+    """Identical messages in flight together are computed once."""
+    
+    @pytest.fixture
+    def processor(self):
+        processor = MessageProcessor(use_models=False, feedback_mode="template")
+        run = processor._run
+        processor.runs = []
+        
+        def slow_run(*args):
+            processor.runs.append(args[0])
+            time.sleep(0.2)
+            return run(*args)
+        
+        processor._run = slow_run
+        return processor
+    
+    def test_threads(self, processor):
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            results = list(pool.map(lambda _: processor.process("Look at this meme lol"), range(10)))
+        
+        assert len(processor.runs) == 1
+        assert processor.get_system_status()["single_flight"]["coalesced"] == 9
+        assert len({id(r) for r in results}) == 10  # Everyone gets their own copy
+        assert len({r.classification for r in results}) == 1
+    
+    def test_async(self, processor):
+        async def main():
+            return await asyncio.gather(*(
+                processor.process_async("Look at this meme lol", child_id=f"kid-{i}") for i in range(10)
+            ))
+        
+        results = asyncio.run(main())
+        assert len(processor.runs) == 1
+        assert processor.single_flight.get_stats()["coalesced"] == 9
+        assert all(r.analysis.conversation.window_size == 1 for r in results)
+    
+    def test_api_path_coalesces(self, processor):
+        """The API looks up the cache itself and calls process(skip_cache=True)."""
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            list(pool.map(lambda _: processor.process("You're stupid", skip_cache=True), range(5)))
+        assert len(processor.runs) == 1
+    
+    def test_different_ages_not_coalesced(self, processor):
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            results = list(pool.map(lambda age: processor.process("You're stupid", age), AGES))
+        
+        assert len(processor.runs) == 2
+        for age, result in zip(AGES, results):
+            assert AGE_MARKERS[age] in result.feedback.main_message
+    
+    def test_budgeted_not_coalesced_with_unbudgeted(self, processor):
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            list(pool.map(
+                lambda budget: processor.process("You're stupid", skip_cache=True, budget_ms=budget),
+                [5000, None]
+            ))
+        assert len(processor.runs) == 2
+    
+    def test_budgeted_waiter_gives_up(self, processor):
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leader = pool.submit(processor.process, "You're stupid", skip_cache=True, budget_ms=10_000)
+            while not processor.runs:
+                time.sleep(0.005)
+            result = processor.process("You're stupid", skip_cache=True, budget_ms=50)
+            leader.result()
+        
+        # Waited out its budget for the leader, then ran its own pipeline
+        assert result.success
+        assert processor.single_flight.get_stats()["timed_out"] == 1
+        assert len(processor.runs) == 2
+    
+    def test_child_state_not_shared(self, processor):
+        barrier = threading.Barrier(2)
+        
+        def send(child_id):
+            barrier.wait()
+            return processor.process("Whatever", child_id=child_id)
+        
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            with_child, without = pool.map(send, ["kid-1", None])
+        
+        assert with_child.analysis.conversation is not None
+        assert without.analysis.conversation is None
@@ -0,0 +1,160 @@
+"""
+Tests for per-child conversation window analysis.
+"""
+
+import pytest
+from src.pipeline import MessageProcessor
+from src.models import Classification, DetectedIssue
+from src.analyzer import ConversationWindowAnalyzer
+from src.analyzer.conversation import _Window, issue_mask
+
+
+G, Y, R = Classification.GREEN, Classification.YELLOW, Classification.RED
+DISMISSIVE = [DetectedIssue.DISMISSIVE_TONE]
+
+
+class TestConversationWindow:
+    """Repetition and escalation over a sliding window."""
+    
+    @pytest.fixture
+    def analyzer(self):
+        return ConversationWindowAnalyzer(window_size=5, repeat_threshold=3, escalation_steps=2)
+    
+    def test_single_message_not_flagged(self, analyzer):
+        signal = analyzer.observe("kid", "chat", Y, DISMISSIVE)
+        assert signal.window_size == 1
+        assert not signal.flagged
+    
+    def test_repetition_detected(self, analyzer):
+        for _ in range(2):
+            assert not analyzer.observe("kid", "chat", Y, DISMISSIVE).flagged
+        signal = analyzer.observe("kid", "chat", Y, DISMISSIVE)
+        assert signal.repetition_detected
+        assert signal.repeated_issues == DISMISSIVE
+        assert signal.flagged
+    
+    def test_repetition_ages_out_of_window(self, analyzer):
+        for _ in range(3):
+            analyzer.observe("kid", "chat", Y, DISMISSIVE)
+        for _ in range(2):
+            signal = analyzer.observe("kid", "chat", G, [])
+        assert signal.repetition_detected  # 3 of the last 5
+        signal = analyzer.observe("kid", "chat", G, [])
+        assert not signal.repetition_detected
+        assert signal.window_size == 5
+    
+    def test_escalation_detected(self, analyzer):
+        analyzer.observe("kid", "chat", G, [])
+        assert not analyzer.observe("kid", "chat", Y, DISMISSIVE).escalation_detected
+        signal = analyzer.observe("kid", "chat", R, [DetectedIssue.PROFANITY])
+        assert signal.escalation_detected
+        assert signal.flagged
+    
+    def test_de_escalation_resets(self, analyzer):
+        for c in (G, Y, R):
+            analyzer.observe("kid", "chat", c, [])
+        signal = analyzer.observe("kid", "chat", G, [])
+        assert not signal.escalation_detected
+    
+    def test_rises_out_of_window_do_not_count(self):
+        analyzer = ConversationWindowAnalyzer(window_size=10, escalation_steps=2)
+        analyzer.observe("kid", "chat", G, [])
+        for _ in range(21):
+            analyzer.observe("kid", "chat", Y, DISMISSIVE)
+        # The G -> Y rise left the window long ago: Y -> R is one step
+        assert not analyzer.observe("kid", "chat", R, []).escalation_detected
+    
+    def test_sustained_red_stops_being_escalation(self, analyzer):
+        for c in (G, Y, R):
+            signal = analyzer.observe("kid", "chat", c, [])
+        assert signal.escalation_detected
+        
+        # Once the rises age out of the 5-message window, RED is just RED
+        for _ in range(5):
+            signal = analyzer.observe("kid", "chat", R, [])
+        assert not signal.escalation_detected
+    
+    def test_conversations_are_separate(self, analyzer):
+        for conversation in ("a", "b", "c"):
+            signal = analyzer.observe("kid", conversation, Y, DISMISSIVE)
+        assert not signal.flagged
+        for child in ("x", "y", "z"):
+            signal = analyzer.observe(child, "chat", Y, DISMISSIVE)
+        assert not signal.flagged
+    
+    def test_reset(self, analyzer):
+        for _ in range(2):
+            analyzer.observe("kid", "chat", Y, DISMISSIVE)
+        analyzer.reset("kid", "chat")
+        assert analyzer.observe("kid", "chat", Y, DISMISSIVE).window_size == 1
+
+
+class TestConversationMemory:
+    """Live sessions are capped; the rest are spilled and rehydrated."""
+    
+    def test_window_round_trips_through_bytes(self):
+        window = _Window(4)
+        for severity, issues in [(0, []), (1, DISMISSIVE), (2, [DetectedIssue.PROFANITY]),
+                                 (1, DISMISSIVE), (1, DISMISSIVE)]:
+            window.push(severity, issue_mask(issues))
+        
+        restored = _Window.from_bytes(window.to_bytes())
+        assert restored.count == window.count
+        assert restored.pos == window.pos
+        assert restored.rising_steps() == window.rising_steps()
+        assert list(restored.issue_counts) == list(window.issue_counts)
+        assert restored.severity_counts == window.severity_counts
+    
+    def test_lru_spill_and_rehydrate(self):
+        analyzer = ConversationWindowAnalyzer(window_size=5, max_sessions=1)
+        for _ in range(2):
+            analyzer.observe("a", None, Y, DISMISSIVE)
+        analyzer.observe("b", None, G, [])
+        
+        stats = analyzer.get_stats()
+        assert stats["live_sessions"] == 1
+        assert stats["spilled_sessions"] == 1
+        
+        # "a" comes back with its history
+        signal = analyzer.observe("a", None, Y, DISMISSIVE)
+        assert signal.window_size == 3
+        assert signal.repetition_detected
+        assert analyzer.get_stats()["rehydrations"] == 1
+    
+    def test_idle_sessions_spilled(self):
+        analyzer = ConversationWindowAnalyzer(idle_seconds=0)
+        analyzer.observe("a", None, G, [])
+        analyzer.observe("b", None, G, [])
+        assert analyzer.get_stats()["live_sessions"] == 1
+    
+    def test_spilled_sessions_bounded(self):
+        analyzer = ConversationWindowAnalyzer(max_sessions=1, max_spilled=2)
+        for child in "abcde":
+            analyzer.observe(child, None, G, [])
+        stats = analyzer.get_stats()
+        assert stats["live_sessions"] == 1
+        assert stats["spilled_sessions"] == 2
+        assert stats["dropped"] == 2
+
+
+class TestConversationPipeline:
+    """analysis.conversation is filled in when a child_id is given."""
+    
+    @pytest.fixture
+    def processor(self):
+        return MessageProcessor(use_models=False, feedback_mode="template")
+    
+    def test_no_child_id_no_signal(self, processor):
+        result = processor.process("Whatever")
+        assert result.analysis.conversation is None
+    
+    def test_repeated_dismissive_messages_flagged(self, processor):
+        for _ in range(3):
+            result = processor.process("Whatever", child_id="kid", conversation_id="chat")
+        assert result.analysis.conversation.repetition_detected
+        assert result.analysis.conversation.flagged
+    
+    def test_signal_not_cached(self, processor):
+        processor.process("Whatever", child_id="kid")
+        result = processor.process("Whatever")
+        assert result.analysis.conversation is None
@@ -2,10 +2,17 @@
 Tests for feedback quality.
 """
 
+import time
+import asyncio
+
 import pytest
 from src.pipeline import MessageProcessor
 from src.models import Classification
 from src.feedback import TemplateGenerator
+from src.models import Feedback, FeedbackSource
+from src.cache import LLMFeedbackCache
+from src.feedback.http_client import PooledHTTPClient
+from src.feedback.stub_server import StubLLMServer
 from src.analyzer import SafetyAnalyzer
 
 
@@ -115,3 +122,240 @@ class TestEducationalContent:
         assert result.educational.follow_up_question is not None
         assert "?" in result.educational.follow_up_question
 
+
+
+class TestPooledLLMClient:
+    """LLM calls should reuse pooled connections (against the local stub API)."""
+    
+    @pytest.fixture
+    def stub(self, monkeypatch):
+        with StubLLMServer() as server:
+            monkeypatch.setenv("HF_API_URL", server.model_url())
+            yield server
+    
+    @pytest.fixture
+    def processor(self, stub):
+        processor = MessageProcessor(use_models=False, feedback_mode="hf_llm", hf_api_key="stub", cache_enabled=False)
+        processor.feedback_generator.hf_llm.http = PooledHTTPClient()
+        return processor
+    
+    def test_llm_feedback_from_stub(self, stub, processor):
+        result = processor.process("You're stupid")
+        assert "hurt someone's feelings" in result.feedback.main_message
+        assert stub.get_stats()["requests"] == 1
+    
+    def test_connection_reused(self, stub, processor):
+        for message in ["You're stupid", "shut up loser", "you're so dumb"]:
+            processor.process(message)
+        
+        stats = processor.feedback_generator.hf_llm.get_status()["http"]
+        assert stats["requests"] == stub.get_stats()["requests"] >= 2
+        assert stats["connections_opened"] == 1
+        assert stats["reused"] == stats["requests"] - 1
+        assert stub.get_stats()["connections"] == 1
+    
+    def test_async_client(self, stub, processor):
+        hf_llm = processor.feedback_generator.hf_llm
+        analysis = processor.process("You're stupid").analysis
+        
+        async def generate_twice():
+            first = await hf_llm.agenerate("You're stupid", Classification.RED, analysis)
+            second = await hf_llm.agenerate("You're stupid", Classification.RED, analysis)
+            await hf_llm.http.aclose()
+            return first, second
+        
+        first, second = asyncio.run(generate_twice())
+        assert first.main_message == second.main_message
+        assert stub.get_stats()["connections"] == 2  # one for the sync, one for the async client
+    
+    def test_read_timeout(self, stub, processor):
+        stub.delay_ms = 500
+        hf_llm = processor.feedback_generator.hf_llm
+        
+        assert hf_llm._call_api("prompt", timeout=0.1) is None
+        assert hf_llm.http.get_stats()["errors"] == 1
+
+    def test_breaker_skips_llm_during_outage(self, stub, processor):
+        hf_llm = processor.feedback_generator.hf_llm
+        hf_llm.api_url = stub.url + "/down"  # 404 for every call
+        
+        for message in ["You're stupid", "fuck you", "you're so dumb", "you're an idiot"]:
+            result = processor.process(message)
+            assert result.feedback is not None
+            assert not result.metadata.used_llm
+        
+        status = processor.feedback_generator.get_status()
+        assert status["circuit_breaker"]["state"] == "open"
+        assert status["circuit_breaker"]["rejected"] >= 1
+        assert hf_llm.http.get_stats()["requests"] == 3
+    
+    def test_api_flavour_remembered(self, processor):
+        hf_llm = processor.feedback_generator.hf_llm
+        calls = []
+        
+        class Client:
+            def text_generation(self, prompt, **kwargs):
+                calls.append("text_generation")
+                raise ValueError("Model does not support text generation")
+            
+            def chat_completion(self, messages, **kwargs):
+                calls.append("chat_completion")
+                return {"choices": [{"message": {"content": "Try something kinder."}}]}
+        
+        hf_llm.client, hf_llm.use_client = Client(), True
+        assert hf_llm._call_api("prompt") == "Try something kinder."
+        assert hf_llm._call_api("prompt") == "Try something kinder."
+        
+        assert calls == ["text_generation", "chat_completion", "chat_completion"]
+        assert hf_llm.get_status()["api_flavour"] == "chat_completion"
+    
+    def test_deadline_applies_to_inference_client(self, processor, monkeypatch):
+        from src.feedback import hf_llm_generator
+        hf_llm = processor.feedback_generator.hf_llm
+        timeouts = []
+        
+        class Client:
+            def __init__(self, model=None, token=None, timeout=None):
+                timeouts.append(timeout)
+            
+            def text_generation(self, prompt, **kwargs):
+                time.sleep(0.05)
+                raise TimeoutError("read timed out")
+            
+            def chat_completion(self, messages, **kwargs):
+                return {"choices": [{"message": {"content": "Try something kinder."}}]}
+        
+        monkeypatch.setattr(hf_llm_generator, "InferenceClient", Client, raising=False)
+        hf_llm.client, hf_llm.use_client = Client(timeout=hf_llm.timeout), True
+        timeouts.clear()
+        
+        assert hf_llm._call_api("prompt", timeout=2) == "Try something kinder."
+        # Each flavour gets what is left of the budget, not the generator's 30s
+        assert len(timeouts) == 2
+        assert 1.9 < timeouts[0] <= 2
+        assert timeouts[1] < timeouts[0] - 0.04
+
+
+class TestLLMFeedbackCache:
+    """LLM feedback is shared by messages with the same prompt signature."""
+    
+    FEEDBACK = Feedback(
+        main_message="Words like that can hurt.",
+        suggested_alternatives=["I don't agree with you", "Can we talk about this?"],
+        communication_tip="Kind words help."
+    )
+    
+    def test_served_once_all_variants_collected(self):
+        cache = LLMFeedbackCache(variants=2)
+        assert cache.get("sig") == []
+        assert cache.add("sig", self.FEEDBACK)
+        assert cache.get("sig") == []
+        assert cache.add("sig", self.FEEDBACK.model_copy(update={"main_message": "That could hurt."}))
+        assert not cache.add("sig", self.FEEDBACK)
+        
+        assert len(cache.get("sig")) == 2
+        stats = cache.get_stats()
+        assert (stats["hits"], stats["misses"]) == (1, 2)
+    
+    def test_variants_expire(self):
+        cache = LLMFeedbackCache(variants=1, ttl_seconds=0.05)
+        cache.add("sig", self.FEEDBACK)
+        time.sleep(0.06)
+        assert cache.get("sig") == []
+        assert cache.get_stats()["size"] == 0
+    
+    def test_size_bound(self):
+        cache = LLMFeedbackCache(max_size=2, variants=1)
+        for signature in ("a", "b", "c"):
+            cache.add(signature, self.FEEDBACK)
+        assert cache.get("a") == []
+        assert cache.get_stats()["size"] == 2
+    
+    def test_llm_called_only_to_fill_variants(self, monkeypatch):
+        with StubLLMServer() as stub:
+            monkeypatch.setenv("HF_API_URL", stub.model_url())
+            processor = MessageProcessor(use_models=False, feedback_mode="hf_llm", hf_api_key="stub", cache_enabled=False)
+            generator = processor.feedback_generator
+            generator.hf_llm.http = PooledHTTPClient()
+            generator.llm_feedback_cache = LLMFeedbackCache(variants=2)
+            
+            results = [processor.process("You're stupid") for _ in range(4)]
+        
+        assert stub.get_stats()["requests"] == 2
+        assert all(result.metadata.used_llm for result in results)
+        assert generator.get_status()["llm_cache"]["hits"] == 2
+    
+    def test_reused_variant_checked_against_message(self):
+        processor = MessageProcessor(use_models=False, feedback_mode="hf_llm", hf_api_key="stub")
+        generator = processor.feedback_generator
+        generator.llm_feedback_cache = LLMFeedbackCache(variants=1)
+        generator.llm_feedback_cache.add("sig", self.FEEDBACK)
+        
+        feedback = generator._cached_llm_feedback("sig", "can we talk about this?")
+        assert feedback.suggested_alternatives == ["I don't agree with you"]
+        assert len(self.FEEDBACK.suggested_alternatives) == 2  # Cached variant untouched
+        
+        generator.llm_feedback_cache.add("profane", self.FEEDBACK.model_copy(update={"main_message": "shit happens"}))
+        assert generator._cached_llm_feedback("profane", "You're stupid") is None
+        assert generator.llm_feedback_cache.get_stats()["rejected"] == 1
+
+
+class TestSpeculativeFeedback:
+    """Templates are served at once; the LLM result serves later messages."""
+    
+    @pytest.fixture
+    def processor(self, monkeypatch):
+        with StubLLMServer(delay_ms=200) as stub:
+            monkeypatch.setenv("HF_API_URL", stub.model_url())
+            monkeypatch.setenv("FEEDBACK_SPECULATIVE", "1")
+            processor = MessageProcessor(use_models=False, feedback_mode="hf_llm", hf_api_key="stub")
+            generator = processor.feedback_generator
+            generator.hf_llm.http = PooledHTTPClient()
+            generator.llm_feedback_cache = LLMFeedbackCache(variants=1)
+            yield processor
+    
+    def test_template_first_then_llm(self, processor):
+        first = processor.process("You're stupid")
+        assert first.metadata.feedback_source == FeedbackSource.SPECULATIVE
+        assert not first.metadata.used_llm
+        assert first.feedback is not None
+        
+        upgrade = asyncio.run(processor.upgraded_feedback("You're stupid", first, timeout=5))
+        assert "hurt someone's feelings" in upgrade.main_message
+        
+        # The speculative result was not cached, so the repeat gets the LLM feedback
+        second = processor.process("You're stupid")
+        assert not second.metadata.cache_hit
+        assert second.metadata.feedback_source == FeedbackSource.LLM_CACHE
+        assert second.metadata.used_llm
+        assert second.feedback.main_message == upgrade.main_message
+        assert processor.process("You're stupid").metadata.cache_hit
+    
+    def test_open_circuit_skips_upgrade(self, processor):
+        generator = processor.feedback_generator
+        for _ in range(generator.llm_breaker.failure_threshold):
+            generator.llm_breaker.record(False)
+        
+        result = processor.process("You're stupid")
+        assert result.metadata.feedback_source == FeedbackSource.TEMPLATE
+        assert generator.get_status()["speculative"]["scheduled"] == 0
+    
+    def test_one_upgrade_per_signature(self, processor):
+        generator = processor.feedback_generator
+        results = [processor.process(message) for message in ["You're stupid", "you're stupid!!"]]
+        assert all(r.metadata.feedback_source == FeedbackSource.SPECULATIVE for r in results)
+        
+        asyncio.run(processor.upgraded_feedback("You're stupid", results[0], timeout=5))
+        stats = generator.get_status()["speculative"]
+        assert stats["scheduled"] == 1
+        assert stats["upgraded"] == 1
+        assert stats["pending"] == 0
+    
+    def test_failed_upgrade_keeps_templates(self, processor):
+        generator = processor.feedback_generator
+        generator.hf_llm.api_url += "-missing/../../nowhere"
+        
+        result = processor.process("You're stupid")
+        assert asyncio.run(processor.upgraded_feedback("You're stupid", result, timeout=5)) is None
+        assert generator.get_status()["speculative"]["failed"] == 1
+        assert processor.process("You're stupid").metadata.feedback_source == FeedbackSource.SPECULATIVE
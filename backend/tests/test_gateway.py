@@ -0,0 +1,208 @@
+"""
+Tests for consistent-hash routing across replicas.
+
+The harness runs several replicas in-process, each with its own
+MessageProcessor (and so its own cache), behind the gateway.
+"""
+
+import pytest
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.pipeline import MessageProcessor
+from src.serving import HashRing
+from src.api.gateway import Gateway, create_gateway_app, routing_key
+
+
+def replica_app(processor: MessageProcessor) -> FastAPI:
+    """The routed endpoints of one replica, backed by its own processor."""
+    app = FastAPI()
+
+    @app.post("/analyze")
+    def analyze(body: dict):
+        return processor.process(
+            body["message"], body.get("age_range"), child_id=body.get("child_id")
+        ).model_dump(mode="json")
+
+    @app.post("/classify")
+    def classify(body: dict):
+        return {"classification": processor.quick_classify(body["message"]).value}
+
+    return app
+
+
+class ReplicaTransport(httpx.AsyncBaseTransport):
+    """
+    Dispatches by host to in-process replicas; hosts in `down` refuse
+    connections, hosts in `slow` time out after receiving the request.
+    """
+
+    def __init__(self, replicas):
+        self.transports = {host: httpx.ASGITransport(app=replica_app(p)) for host, p in replicas.items()}
+        self.down = set()
+        self.slow = set()
+        self.received = []
+        self.timeouts = []
+
+    async def handle_async_request(self, request):
+        host = request.url.host
+        if host in self.down:
+            raise httpx.ConnectError("connection refused", request=request)
+        self.received.append(host)
+        self.timeouts.append(request.extensions["timeout"])
+        if host in self.slow:
+            raise httpx.ReadTimeout("no response", request=request)
+        return await self.transports[host].handle_async_request(request)
+
+
+ADMIN_TOKEN = "test-admin-token"
+ADMIN = {"Authorization": f"Bearer {ADMIN_TOKEN}"}
+
+
+@pytest.fixture
+def cluster():
+    processors = {
+        f"replica{i}": MessageProcessor(use_models=False, feedback_mode="template")
+        for i in range(3)
+    }
+    transport = ReplicaTransport(processors)
+    gateway = Gateway(
+        [f"http://{host}" for host in processors],
+        retry_interval=60,
+        admin_token=ADMIN_TOKEN,
+        client=httpx.AsyncClient(transport=transport)
+    )
+    with TestClient(create_gateway_app(gateway)) as client:
+        yield client, gateway, processors, transport
+
+
+class TestHashRing:
+    KEYS = [f"message {i}" for i in range(5000)]
+
+    def test_keys_spread_evenly(self):
+        ring = HashRing([f"node{i}" for i in range(4)])
+        counts = {}
+        for key in self.KEYS:
+            node = ring.node_for(key)
+            counts[node] = counts.get(node, 0) + 1
+        assert all(750 < count < 1750 for count in counts.values())
+
+    def test_join_moves_keys_only_to_new_node(self):
+        ring = HashRing([f"node{i}" for i in range(4)])
+        before = {key: ring.node_for(key) for key in self.KEYS}
+        ring.add("node4")
+        moved = [key for key in self.KEYS if ring.node_for(key) != before[key]]
+
+        assert all(ring.node_for(key) == "node4" for key in moved)
+        assert len(moved) < len(self.KEYS) * 0.3  # ~1/5 expected
+
+    def test_leave_moves_only_its_keys(self):
+        ring = HashRing([f"node{i}" for i in range(4)])
+        before = {key: ring.node_for(key) for key in self.KEYS}
+        ring.remove("node2")
+
+        for key in self.KEYS:
+            if before[key] != "node2":
+                assert ring.node_for(key) == before[key]
+
+    def test_preference_list(self):
+        ring = HashRing(["a", "b", "c"])
+        nodes = ring.preference_list("hello")
+        assert sorted(nodes) == ["a", "b", "c"]
+        assert nodes[0] == ring.node_for("hello")
+        assert HashRing().preference_list("hello") == []
+
+
+class TestGateway:
+    def test_same_message_same_replica(self, cluster):
+        client, gateway, processors, _ = cluster
+        first = client.post("/analyze", json={"message": "You're stupid"})
+        second = client.post("/analyze", json={"message": "  you're STUPID "})
+
+        assert first.status_code == 200
+        assert first.headers["X-Replica"] == second.headers["X-Replica"]
+        assert second.json()["metadata"]["cache_hit"]
+
+    def test_messages_spread_over_replicas(self, cluster):
+        client, _, processors, _ = cluster
+        for i in range(30):
+            client.post("/classify", json={"message": f"message number {i}"})
+
+        sizes = [p.get_cache_stats()["analysis"]["size"] for p in processors.values()]
+        assert sum(sizes) == 30 and all(sizes)
+
+    def test_child_routed_to_one_replica(self, cluster):
+        """A child's conversation window lives on one replica."""
+        client, gateway, _, _ = cluster
+        messages = [f"message number {i}" for i in range(6)]
+        assert len({gateway.ring.node_for(routing_key(m)) for m in messages}) > 1
+
+        responses = [client.post("/analyze", json={"message": m, "child_id": "kid-1"}) for m in messages]
+        assert {r.headers["X-Replica"] for r in responses} == {gateway.ring.node_for(routing_key("", "kid-1"))}
+        assert responses[-1].json()["analysis"]["conversation"]["window_size"] == len(messages)
+
+    def test_failover_to_next_replica(self, cluster):
+        client, gateway, _, transport = cluster
+        owner, backup = gateway.ring.preference_list(routing_key("hello there"))[:2]
+        transport.down.add(owner.split("//")[1])
+
+        response = client.post("/analyze", json={"message": "hello there"})
+        assert response.status_code == 200
+        assert response.headers["X-Replica"] == backup
+
+        stats = gateway.get_stats()
+        assert stats["failovers"] == 1
+        assert not stats["replicas"][owner]["available"]
+
+    def test_timeout_not_resent(self, cluster):
+        """A replica that got the request may have paid for an LLM call already."""
+        client, gateway, _, transport = cluster
+        owner = gateway.ring.node_for(routing_key("hello there"))
+        transport.slow.add(owner.split("//")[1])
+
+        response = client.post("/analyze", json={"message": "hello there"})
+        assert response.status_code == 504
+        assert transport.received == [owner.split("//")[1]]
+        assert gateway.get_stats()["failovers"] == 0
+
+    def test_read_timeout_follows_budget(self, cluster):
+        client, gateway, _, transport = cluster
+        client.post("/analyze", json={"message": "hello there"})
+        client.post("/analyze", json={"message": "hello there", "budget_ms": 500})
+
+        unbounded, budgeted = (timeout["read"] for timeout in transport.timeouts)
+        assert unbounded == gateway.read_timeout_s
+        assert budgeted == 0.5 + Gateway.BUDGET_SLACK_S
+
+    def test_all_replicas_down(self, cluster):
+        client, _, _, transport = cluster
+        transport.down.update({"replica0", "replica1", "replica2"})
+        assert client.post("/analyze", json={"message": "hi"}).status_code == 503
+
+    def test_replica_leaves(self, cluster):
+        client, gateway, _, _ = cluster
+        owner = gateway.ring.node_for(routing_key("bye"))
+        client.delete("/gateway/replicas", params={"url": owner}, headers=ADMIN)
+
+        response = client.post("/analyze", json={"message": "bye"})
+        assert response.headers["X-Replica"] != owner
+        assert len(client.get("/gateway/stats").json()["replicas"]) == 2
+
+    def test_replica_changes_need_admin_token(self, cluster):
+        client, gateway, _, _ = cluster
+        url = gateway.ring.nodes[0]
+        assert client.delete("/gateway/replicas", params={"url": url}).status_code == 401
+        assert client.post(
+            "/gateway/replicas", params={"url": "http://evil"}, headers={"Authorization": "Bearer wrong"}
+        ).status_code == 401
+        assert len(gateway.ring) == 3
+
+    def test_replica_changes_disabled_without_token(self):
+        client = TestClient(create_gateway_app(Gateway(["http://replica0"])))
+        assert client.post("/gateway/replicas", params={"url": "http://evil"}).status_code == 404
+        assert client.delete("/gateway/replicas", params={"url": "http://replica0"}).status_code == 404
+
+    def test_missing_message(self, cluster):
+        client, _, _, _ = cluster
+        assert client.post("/analyze", json={"text": "hi"}).status_code == 422
@@ -8,12 +8,23 @@ Tests for:
 - Pipeline modes
 """
 
+import os
+import json
 import pytest
 import time
+import random
+import sqlite3
+import threading
 from src.pipeline import MessageProcessor
-from src.models import Classification
-from src.cache import ResponseCache
+from src.models import Classification, ProcessingResult
+from src.cache import (
+    ResponseCache, SQLiteResponseCache, TinyLFUCache, CountMinSketch, CachedResponse, create_cache,
+    TieredCache, InMemoryL2, GreenFingerprintSet, CacheAnalytics, ShardedResponseCache, cache_key
+)
+from src.cache.snapshot import save_snapshot, restore_snapshot
+from src.cache.remote_cache import HAS_REDIS, RedisL2, redact_url
 from src.config import MODEL_CONFIG, get_model_config
+from src.config.model_config import ProductionConfig
 
 
 class TestModelConfig:
@@ -44,13 +55,26 @@ class TestModelConfig:
         # Verify no other LLM providers
         assert "openai" not in feedback
         assert "anthropic" not in feedback
+    
+    def test_single_worker_by_default(self, monkeypatch):
+        """Multi-worker serving splits per-process state, so it is opt-in."""
+        monkeypatch.delenv("WORKERS", raising=False)
+        assert ProductionConfig.from_env().workers == 1
+        monkeypatch.setenv("WORKERS", "4")
+        assert ProductionConfig.from_env().workers == 4
 
 
 class TestResponseCache:
-    """Test response caching."""
+    """Test response caching (every backend has the same interface)."""
     
-    @pytest.fixture
-    def cache(self):
+    @pytest.fixture(params=["memory", "sharded", "sqlite", "tinylfu"])
+    def cache(self, request, tmp_path):
+        if request.param == "sharded":
+            return ShardedResponseCache(max_size=10, ttl_seconds=60, shards=2)
+        if request.param == "sqlite":
+            return SQLiteResponseCache(str(tmp_path / "cache.db"), max_size=10, ttl_seconds=60)
+        if request.param == "tinylfu":
+            return TinyLFUCache(max_size=10, ttl_seconds=60, sweep_interval=0)
         return ResponseCache(max_size=10, ttl_seconds=60)
     
     def test_cache_miss(self, cache):
@@ -84,6 +108,8 @@ class TestResponseCache:
     
     def test_cache_lru_eviction(self, cache):
         """Old entries should be evicted when full."""
+        if isinstance(cache, TinyLFUCache):
+            pytest.skip("admission-controlled; see TestTinyLFUCache")
         # Fill cache
         for i in range(15):
             cache.set(f"message_{i}", {"i": i})
@@ -104,6 +130,384 @@ class TestResponseCache:
         assert stats["misses"] == 2
         assert stats["hits"] == 2
         assert stats["hit_rate_percent"] == 50.0
+    
+    def test_namespace_switch(self, cache):
+        """A new namespace hides old entries at once; they are then evicted."""
+        cache.set("hello", {"x": 1})
+        cache.set_namespace("v2", background=False)
+        assert cache.get("hello") is None
+        
+        cache.set("hello", {"x": 2})
+        assert cache.get("hello") == {"x": 2}
+        stats = cache.get_stats()
+        assert stats["size"] == 1
+        assert stats["namespace"] == "v2"
+        assert stats["stale_evicted"] == 1
+    
+    def test_background_eviction(self, cache):
+        for i in range(5):
+            cache.set(f"message_{i}", {"i": i})
+        cache.set_namespace("v2")
+        
+        deadline = time.time() + 5
+        while cache.get_stats()["size"] and time.time() < deadline:
+            time.sleep(0.01)
+        assert cache.get_stats()["size"] == 0
+
+
+class TestShardedResponseCache:
+    def test_entries_spread_over_shards(self):
+        cache = ShardedResponseCache(max_size=1000, shards=8)
+        for i in range(400):
+            cache.set(f"message_{i}", {"i": i})
+        
+        stats = cache.get_stats()
+        assert stats["size"] == 400
+        assert stats["largest_shard"] < 100
+        assert all(cache.get(f"message_{i}") == {"i": i} for i in range(400))
+    
+    def test_concurrent_access(self):
+        cache = ShardedResponseCache(max_size=100, shards=4)
+        
+        def worker(n):
+            for i in range(500):
+                if cache.get(f"message_{i % 150}") is None:
+                    cache.set(f"message_{i % 150}", {"i": i})
+        
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        stats = cache.get_stats()
+        assert stats["hits"] + stats["misses"] == 8 * 500
+        assert stats["size"] <= 100
+    
+    def test_factory(self, monkeypatch):
+        monkeypatch.setenv("CACHE_BACKEND", "sharded")
+        cache = create_cache(MODEL_CONFIG["cache"])
+        assert cache.get_stats()["shards"] == MODEL_CONFIG["cache"]["shards"]
+
+
+class TestTinyLFUCache:
+    """Frequency-aware admission, byte budget and background expiry."""
+    
+    def test_spam_burst_keeps_common_messages(self):
+        cache = TinyLFUCache(max_size=20, sweep_interval=0)
+        common = [f"common {i}" for i in range(10)]
+        for _ in range(5):
+            for message in common:
+                if cache.get(message) is None:
+                    cache.set(message, {"m": message})
+        
+        for i in range(200):
+            cache.get(f"spam {i}")
+            cache.set(f"spam {i}", {"m": i})
+        
+        assert all(cache.get(message) is not None for message in common)
+        assert cache.get_stats()["rejected"] > 0
+    
+    def test_spam_burst_flushes_lru(self):
+        """The same traffic through plain LRU loses the common messages."""
+        cache = ResponseCache(max_size=20)
+        for message in (f"common {i}" for i in range(10)):
+            cache.set(message, {"m": message})
+        for i in range(200):
+            cache.set(f"spam {i}", {"m": i})
+        
+        assert cache.get("common 0") is None
+    
+    def test_byte_budget(self):
+        cache = TinyLFUCache(max_bytes=20_000, sweep_interval=0)
+        for i in range(100):
+            cache.get(f"message {i}")
+            cache.set(f"message {i}", {"text": "x" * (50 if i % 2 else 1500)})
+        
+        stats = cache.get_stats()
+        assert 0 < stats["bytes"] <= stats["max_bytes"]
+        assert stats["bytes"] == sum(s["bytes"] for s in stats["segments"].values())
+    
+    def test_oversized_entry_not_cached(self):
+        cache = TinyLFUCache(max_bytes=10_000, sweep_interval=0)
+        cache.set("huge", {"text": "x" * 20_000})
+        cache.set("small", {"text": "ok"})
+        
+        assert cache.get("huge") is None
+        assert cache.get("small") is not None
+    
+    def test_sweeper_removes_expired_entries(self):
+        cache = TinyLFUCache(ttl_seconds=0.05, sweep_interval=0.02)
+        cache.set("old", {"x": 1})
+        
+        deadline = time.time() + 2
+        while cache.get_stats()["size"] and time.time() < deadline:
+            time.sleep(0.02)
+        
+        stats = cache.get_stats()
+        assert stats["size"] == 0
+        assert stats["expired"] == 1
+        assert stats["misses"] == 0  # Removed without being looked up
+        cache.close()
+    
+    def test_cached_response_size_accounting(self):
+        processor = MessageProcessor(use_models=False)
+        entry = CachedResponse.from_result(processor.process("You're stupid", skip_cache=True))
+        cache = TinyLFUCache(sweep_interval=0)
+        cache.set("You're stupid", entry)
+        
+        assert cache.get_stats()["bytes"] >= len(entry)
+        assert cache.get("You're stupid") is entry
+    
+    def test_sketch_frequency_and_aging(self):
+        sketch = CountMinSketch(width=64)
+        key = "0123456789abcdef0123456789abcdef"
+        for _ in range(5):
+            sketch.increment(key)
+        assert sketch.frequency(key) == 5
+        
+        for i in range(sketch.sample_size):
+            sketch.increment(f"{i:032x}")
+        assert sketch.frequency(key) < 5
+    
+    def test_beats_lru_on_recorded_traffic(self):
+        from benchmarks.cache_replay import load_traffic, trace, replay
+        messages = load_traffic()
+        
+        lru = replay(ResponseCache(max_size=50), trace(messages, rounds=3, spam=200))
+        tinylfu = replay(TinyLFUCache(max_size=50, sweep_interval=0), trace(messages, rounds=3, spam=200))
+        assert tinylfu > lru
+    
+    def test_factory_default_is_tinylfu(self):
+        cache = create_cache(MODEL_CONFIG["cache"])
+        assert isinstance(cache, TinyLFUCache)
+        assert cache.max_size is None
+        assert cache.max_bytes == MODEL_CONFIG["cache"]["max_bytes"]
+
+
+class TestSharedCache:
+    """The SQLite backend is shared by every process using the same file."""
+    
+    def test_entries_visible_across_processes(self, tmp_path):
+        path = str(tmp_path / "cache.db")
+        cache = SQLiteResponseCache(path)
+        
+        pid = os.fork()
+        if pid == 0:
+            SQLiteResponseCache(path).set("from child", {"worker": "child"})
+            os._exit(0)
+        os.waitpid(pid, 0)
+        
+        assert cache.get("from child") == {"worker": "child"}
+    
+    def test_ttl_enforced(self, tmp_path):
+        cache = SQLiteResponseCache(str(tmp_path / "cache.db"), ttl_seconds=0)
+        cache.set("old", {"x": 1})
+        assert cache.get("old") is None
+    
+    def test_reads_do_not_need_the_write_lock(self, tmp_path):
+        path = str(tmp_path / "cache.db")
+        cache = SQLiteResponseCache(path, touch_batch=1000)
+        cache.set("hello", {"x": 1})
+        
+        writer = sqlite3.connect(path)
+        writer.execute("BEGIN IMMEDIATE")  # Another worker mid-write
+        try:
+            start = time.time()
+            assert cache.get("hello") == {"x": 1}
+            assert cache.get("missing") is None
+            assert time.time() - start < 1
+        finally:
+            writer.rollback()
+            writer.close()
+        
+        stats = cache.get_stats()
+        assert (stats["hits"], stats["misses"]) == (1, 1)
+    
+    def test_read_error_is_a_miss(self, tmp_path):
+        cache = SQLiteResponseCache(str(tmp_path / "cache.db"))
+        cache.set("hello", {"x": 1})
+        cache._conn().execute("DROP TABLE entries")
+        
+        assert cache.get("hello") is None
+        assert cache._read_errors == 1
+    
+    def test_write_error_drops_the_entry(self, tmp_path):
+        cache = SQLiteResponseCache(str(tmp_path / "cache.db"))
+        cache.set("kept", {"x": 1})
+        cache._conn().execute("PRAGMA query_only = ON")  # Writes fail like a read-only database
+        
+        cache.set("hello", {"x": 2})
+        cache.set_namespace("v2", background=False)  # Stale-entry eviction fails too
+        
+        assert cache.get("hello") is None
+        assert cache.get_stats()["write_errors"] == 2
+    
+    def test_locked_database_does_not_fail_requests(self, tmp_path, monkeypatch):
+        monkeypatch.setitem(MODEL_CONFIG["cache"], "backend", "sqlite")
+        monkeypatch.setitem(MODEL_CONFIG["cache"], "path", str(tmp_path / "cache.db"))
+        processor = MessageProcessor(use_models=False, feedback_mode="template")
+        
+        def locked(*args, **kwargs):
+            raise sqlite3.OperationalError("database is locked")
+        monkeypatch.setattr(processor.cache, "_write_touched", locked)
+        
+        result = processor.process("You're stupid")
+        assert result.success
+        assert processor.get_cache_stats()["response"]["write_errors"] == 1
+    
+    def test_buffered_hits_count_for_eviction(self, tmp_path):
+        cache = SQLiteResponseCache(str(tmp_path / "cache.db"), max_size=2, touch_batch=1000)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        time.sleep(0.01)
+        assert cache.get("a") == 1  # Only buffered so far
+        cache.set("c", 3)
+        
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+    
+    def test_stores_cached_responses(self, tmp_path):
+        processor = MessageProcessor(use_models=False, feedback_mode="template")
+        result = processor.process("You're stupid")
+        
+        cache = SQLiteResponseCache(str(tmp_path / "cache.db"))
+        cache.set("You're stupid", CachedResponse.from_result(result))
+        hit = cache.get("You're stupid").to_result(1, result.metadata.timestamp)
+        assert hit.analysis == result.analysis
+        assert hit.metadata.cache_hit
+    
+    def test_workers_share_hits(self, tmp_path, monkeypatch):
+        monkeypatch.setitem(MODEL_CONFIG["cache"], "backend", "sqlite")
+        monkeypatch.setitem(MODEL_CONFIG["cache"], "path", str(tmp_path / "cache.db"))
+        workers = [MessageProcessor(use_models=False, feedback_mode="template") for _ in range(2)]
+        
+        workers[0].process("You're stupid")
+        assert workers[1].process("You're stupid").metadata.cache_hit
+        assert workers[1].get_system_status()["cache"]["backend"] == "sqlite"
+    
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            create_cache({"backend": "nope", "max_size": 1, "ttl_seconds": 1})
+
+
+class _CountingL2(InMemoryL2):
+    """InMemoryL2 that counts round trips and can be switched off."""
+    
+    def __init__(self):
+        super().__init__()
+        self.calls = {"get_many": 0, "set_many": 0}
+        self.down = False
+    
+    def get_many(self, keys):
+        self.calls["get_many"] += 1
+        if self.down:
+            raise ConnectionError("L2 down")
+        return super().get_many(keys)
+    
+    def set_many(self, items, ttl_seconds):
+        self.calls["set_many"] += 1
+        if self.down:
+            raise ConnectionError("L2 down")
+        super().set_many(items, ttl_seconds)
+
+
+class TestTieredCache:
+    """L1 per node in front of a shared L2."""
+    
+    def test_l2_shared_between_nodes(self):
+        l2 = InMemoryL2()
+        node_a = TieredCache(ResponseCache(), l2)
+        node_b = TieredCache(ResponseCache(), l2)
+        
+        node_a.set("hello", {"classification": "green"})
+        assert node_b.get("hello") == {"classification": "green"}
+        
+        stats = node_b.get_stats()
+        assert stats["l2"]["hits"] == 1
+        assert stats["hits"] == 1 and stats["misses"] == 0
+        assert node_b.l1.get("hello") is not None  # Copied into L1
+    
+    def test_cached_responses_round_trip(self):
+        processor = MessageProcessor(use_models=False, feedback_mode="template")
+        result = processor.process("You're stupid")
+        l2 = InMemoryL2()
+        TieredCache(ResponseCache(), l2).set("You're stupid", CachedResponse.from_result(result))
+        
+        hit = TieredCache(ResponseCache(), l2).get("You're stupid")
+        assert hit.to_result(1, result.metadata.timestamp).analysis == result.analysis
+    
+    def test_l2_failure_degrades_to_l1(self):
+        l2 = _CountingL2()
+        cache = TieredCache(ResponseCache(), l2, retry_interval=60)
+        l2.down = True
+        
+        cache.set("hello", {"x": 1})  # Does not raise
+        assert cache.get("hello") == {"x": 1}
+        assert cache.get("other") is None
+        
+        stats = cache.get_stats()
+        assert stats["l2"]["failures"] == 1
+        assert not stats["l2"]["available"]
+        assert l2.calls["get_many"] == 0  # Skipped until retry_interval passes
+    
+    def test_l2_retried_after_interval(self):
+        l2 = _CountingL2()
+        cache = TieredCache(ResponseCache(), l2, retry_interval=0)
+        l2.down = True
+        assert cache.get("hello") is None
+        
+        l2.down = False
+        TieredCache(ResponseCache(), l2).set("hello", {"x": 1})
+        assert cache.get("hello") == {"x": 1}
+    
+    def test_batch_uses_one_round_trip_each_way(self):
+        l2 = _CountingL2()
+        messages = ["You're stupid", "Hello!", "I hate you", "Nice drawing"]
+        
+        node_a = MessageProcessor(use_models=False, feedback_mode="template")
+        node_a.cache = TieredCache(ResponseCache(), l2)
+        node_a.batch_process(messages)
+        assert l2.calls == {"get_many": 1, "set_many": 1}
+        
+        node_b = MessageProcessor(use_models=False, feedback_mode="template")
+        node_b.cache = TieredCache(ResponseCache(), l2)
+        results = node_b.batch_process(messages + [""])
+        assert all(r.metadata.cache_hit for r in results[:-1])
+        assert not results[-1].success
+        assert l2.calls == {"get_many": 2, "set_many": 1}
+    
+    def test_factory_l2_from_env(self, monkeypatch):
+        monkeypatch.setenv("CACHE_L2", "memory")
+        cache = create_cache(MODEL_CONFIG["cache"])
+        assert isinstance(cache, TieredCache)
+        assert cache.get_stats()["backend"] == "tinylfu+memory"
+    
+    @pytest.mark.skipif(HAS_REDIS, reason="redis package installed")
+    def test_factory_without_redis_package(self, monkeypatch):
+        monkeypatch.setenv("CACHE_L2", "redis")
+        assert isinstance(create_cache(MODEL_CONFIG["cache"]), TinyLFUCache)
+    
+    def test_redis_password_not_in_stats(self):
+        l2 = object.__new__(RedisL2)  # No server (or redis package) needed for stats
+        l2.url, l2.prefix = "redis://:s3cret@cache.internal:6380/2?password=s3cret", "kid-safety:"
+        stats = TieredCache(ResponseCache(), l2).get_stats()
+        
+        assert "s3cret" not in json.dumps(stats)
+        assert stats["l2"]["url"] == "redis://cache.internal:6380/2"
+        assert redact_url("redis://user:pw@host/0") == "redis://host/0"
+        assert redact_url("redis://localhost:6379/0") == "redis://localhost:6379/0"
+        assert redact_url("redis://host/0?password=pw") == "redis://host/0"
+    
+    def test_namespace_applies_to_l2(self):
+        l2 = InMemoryL2()
+        old = TieredCache(ResponseCache(), l2)
+        old.set("hello", {"x": 1})
+        
+        new = TieredCache(ResponseCache(), l2)
+        new.set_namespace("v2", background=False)
+        assert new.get("hello") is None
+        assert old.get("hello") == {"x": 1}  # Left to expire, not deleted
 
 
 class TestPipelineCaching:
@@ -147,6 +551,29 @@ class TestPipelineCaching:
         result = processor.process(message, skip_cache=True)
         assert result.success
     
+    def test_cache_hit_marked_in_metadata(self, processor):
+        """Hits are flagged and don't alter the stored entry."""
+        first = processor.process("You're stupid")
+        assert not first.metadata.cache_hit
+        
+        for _ in range(2):
+            hit = processor.process("You're stupid")
+            assert hit.metadata.cache_hit
+            assert hit.metadata.processing_time_ms < 5
+            assert hit.analysis == first.analysis
+            assert hit.feedback == first.feedback
+    
+    def test_cached_response_bytes(self, processor):
+        """cached_response() serves stored JSON without going through the pipeline."""
+        assert processor.cached_response("You're stupid") is None
+        fresh = processor.process("You're stupid")
+        
+        body = processor.cached_response("You're stupid")
+        result = ProcessingResult.model_validate_json(body)
+        assert result.metadata.cache_hit
+        assert result.model_dump(exclude={"metadata"}) == fresh.model_dump(exclude={"metadata"})
+        assert result.metadata.model_versions == fresh.metadata.model_versions
+    
     def test_clear_cache(self, processor):
         """clear_cache should empty the cache."""
         processor.process("message 1")
@@ -157,6 +584,359 @@ class TestPipelineCaching:
         processor.clear_cache()
         
         assert processor.cache.get_stats()["size"] == 0
+    
+    def test_namespace_follows_versions(self, processor):
+        """Results are not reused across feedback modes."""
+        other = MessageProcessor(use_models=False, feedback_mode="template")
+        assert processor.cache_namespace != other.cache_namespace
+        assert processor.cache.get_stats()["namespace"] == processor.cache_namespace
+    
+    def test_rule_change_switches_namespace(self, processor, monkeypatch):
+        processor.process("You're stupid")
+        old = processor.cache_namespace
+        
+        monkeypatch.setattr("src.pipeline.rules_version", lambda classes: "edited")
+        assert processor.refresh_cache_namespace() != old
+        
+        result = processor.process("You're stupid")
+        assert not result.metadata.cache_hit
+        assert result.metadata.model_versions["rules"] == "edited"
+    
+    def test_feedback_sources_are_rule_packs(self, processor):
+        """Editing templates or prompts must invalidate cached feedback too."""
+        modules = {cls.__module__ for cls in processor.RULE_PACKS}
+        assert {"src.feedback.templates", "src.feedback.hf_llm_generator"} <= modules
+    
+    def test_namespace_change_clears_feedback_caches(self, processor, monkeypatch):
+        processor.process("You're stupid")
+        feedback_cache = processor.feedback_generator.feedback_cache
+        assert feedback_cache.get_stats()["size"] > 0
+        
+        monkeypatch.setattr("src.pipeline.rules_version", lambda classes: "edited")
+        processor.refresh_cache_namespace()
+        assert feedback_cache.get_stats()["size"] == 0
+
+
+class TestCacheLayers:
+    """Analysis and feedback cache layers below the response cache."""
+    
+    @pytest.fixture
+    def processor(self):
+        return MessageProcessor(use_models=False, cache_enabled=True)
+    
+    def test_classify_hits_analysis_layer(self, processor):
+        """quick_classify reuses the analysis computed by process()."""
+        processor.process("You're stupid")
+        before = processor.get_cache_stats()["analysis"]["hits"]
+        
+        assert processor.quick_classify("You're stupid") == Classification.RED
+        assert processor.get_cache_stats()["analysis"]["hits"] == before + 1
+    
+    def test_analysis_layer_ignores_age(self, processor):
+        """A response miss for another age range still reuses the analysis."""
+        processor.process("You're stupid", age_range="8-10")
+        processor.process("You're stupid", age_range="11-13")
+        
+        stats = processor.get_cache_stats()
+        assert stats["response"]["hits"] == 0
+        assert stats["analysis"]["hits"] == 1
+    
+    def test_differently_worded_messages_share_feedback(self, processor):
+        """Messages with the same feedback signature share one entry."""
+        first = processor.process("You're stupid")
+        second = processor.process("You are so dumb")
+        
+        stats = processor.get_cache_stats()["feedback"]
+        assert stats["size"] == 1
+        assert stats["hits"] == 1
+        assert second.feedback.main_message == first.feedback.main_message
+    
+    def test_topic_is_part_of_signature(self, processor):
+        processor.process("You're stupid")
+        result = processor.process("Your drawing is ugly")
+        
+        assert processor.get_cache_stats()["feedback"]["size"] == 2
+        assert "drawing" in result.feedback.main_message
+    
+    def test_alternatives_filtered_per_message(self, processor):
+        """Shared entries are not narrowed by the message that created them."""
+        generator = processor.feedback_generator
+        analysis = processor.process("You're stupid").analysis
+        
+        echoed = "I'm feeling really upset right now"
+        feedback, _ = generator._template_feedback(echoed, Classification.RED, analysis, "8-10")
+        assert echoed not in feedback.suggested_alternatives
+        
+        feedback, _ = generator._template_feedback("You're stupid", Classification.RED, analysis, "8-10")
+        assert echoed in feedback.suggested_alternatives
+    
+    def test_clear_cache_clears_all_layers(self, processor):
+        processor.process("You're stupid")
+        processor.clear_cache()
+        
+        for stats in processor.get_cache_stats().values():
+            assert stats["size"] == 0
+
+
+class TestCacheAnalytics:
+    """Reuse-distance sampling predicts hit rates for other sizes/TTLs."""
+    
+    def _trace(self, n=5000):
+        rng = random.Random(0)
+        return [str(int(rng.paretovariate(1.0) * 10)) for _ in range(n)]
+    
+    def test_prediction_matches_lru(self):
+        analytics = CacheAnalytics(sample_rate=1.0, sizes=[10, 50], ttls=[3600])
+        caches = {size: ResponseCache(max_size=size) for size in (10, 50)}
+        for message in self._trace():
+            analytics.record(cache_key(message))
+            for cache in caches.values():
+                if cache.get(message) is None:
+                    cache.set(message, {})
+        
+        predicted = analytics.predicted_hit_rates()
+        for size, cache in caches.items():
+            actual = cache.get_stats()["hit_rate_percent"]
+            assert abs(predicted[str(size)]["3600"] - actual) < 1
+    
+    def test_ttl_limits_hits(self):
+        analytics = CacheAnalytics(sample_rate=1.0, sizes=[100], ttls=[10, 100])
+        for t in range(0, 200, 50):
+            analytics.record(cache_key("hello"), now=t)
+        
+        # Every reuse came 50s later: misses with a 10s TTL, hits with 100s
+        assert analytics.predicted_hit_rates()["100"] == {"10": 0.0, "100": 75.0}
+    
+    def test_sampling(self):
+        analytics = CacheAnalytics(sample_rate=0.25, sizes=[100], ttls=[3600])
+        messages = [f"message {i}" for i in range(1000)]
+        for message in messages:
+            analytics.record(cache_key(message))
+        
+        sampled = analytics.get_stats()["sampled_lookups"]
+        assert 150 < sampled < 350
+        assert sum(analytics.sampled(cache_key(m)) for m in messages) == sampled
+    
+    def test_pipeline_records_lookups(self, monkeypatch):
+        monkeypatch.setenv("CACHE_ANALYTICS", "1")
+        monkeypatch.setitem(MODEL_CONFIG["cache_analytics"], "sample_rate", 1.0)
+        processor = MessageProcessor(use_models=False, feedback_mode="template")
+        processor.process("You're stupid")
+        processor.process("You're stupid")
+        
+        stats = processor.get_system_status()["cache_analytics"]
+        assert stats["sampled_lookups"] == 2
+        assert stats["first_seen"] == 1
+    
+    def test_startup_traffic_not_recorded(self, tmp_path, monkeypatch):
+        """Snapshot restore and warm start aren't user lookups."""
+        monkeypatch.setenv("CACHE_ANALYTICS", "1")
+        monkeypatch.setenv("CACHE_SNAPSHOT_PATH", str(tmp_path / "cache.snap"))
+        monkeypatch.setitem(MODEL_CONFIG["cache_analytics"], "sample_rate", 1.0)
+        before = MessageProcessor(use_models=False, feedback_mode="template")
+        before.process("You're stupid")
+        before.save_cache_snapshot()
+        export = tmp_path / "export.csv"
+        export.write_text("text\nYou're stupid\nHello!\nNice drawing\n")
+        
+        processor = MessageProcessor(use_models=False, feedback_mode="template")
+        processor.restore_cache_snapshot()
+        processor.warm_start([str(export)])
+        assert processor.get_system_status()["cache_analytics"]["sampled_lookups"] == 0
+        
+        processor.process("Hello!")
+        assert processor.get_system_status()["cache_analytics"]["sampled_lookups"] == 1
+
+
+class TestCacheSnapshot:
+    """Snapshot the hottest cache entries on shutdown, restore on startup."""
+    
+    @pytest.fixture(params=["memory", "tinylfu"])
+    def make_cache(self, request):
+        def make(ttl_seconds=60):
+            if request.param == "tinylfu":
+                return TinyLFUCache(max_size=100, ttl_seconds=ttl_seconds, sweep_interval=0)
+            return ResponseCache(max_size=100, ttl_seconds=ttl_seconds)
+        return make
+    
+    @pytest.fixture
+    def snapshot(self, make_cache, tmp_path):
+        cache = make_cache()
+        for i in range(10):
+            cache.set(f"message_{i}", {"i": i})
+        for _ in range(3):
+            cache.get("message_0")
+        path = str(tmp_path / "cache.snap")
+        assert save_snapshot(cache, path) == 10
+        return path
+    
+    def test_round_trip(self, make_cache, snapshot):
+        cache = make_cache()
+        stats = restore_snapshot(cache, snapshot, time_budget_s=5)
+        
+        assert stats["restored"] == 10
+        assert cache.get("message_0") == {"i": 0}
+        assert cache.get("message_9") == {"i": 9}
+        if isinstance(cache, TinyLFUCache):
+            assert cache.sketch.frequency(cache._make_key("message_0")) >= 3
+    
+    def test_other_namespace_ignored(self, make_cache, snapshot):
+        cache = make_cache()
+        cache.set_namespace("v2", background=False)
+        stats = restore_snapshot(cache, snapshot, time_budget_s=5)
+        
+        assert stats["version_mismatch"]
+        assert cache.get_stats()["size"] == 0
+    
+    def test_expired_entries_skipped(self, make_cache, snapshot):
+        cache = make_cache(ttl_seconds=0)
+        stats = restore_snapshot(cache, snapshot, time_budget_s=5)
+        assert stats["expired"] == 10 and stats["restored"] == 0
+    
+    def test_time_budget(self, make_cache, snapshot):
+        stats = restore_snapshot(make_cache(), snapshot, time_budget_s=0)
+        assert stats["budget_exhausted"] and stats["restored"] == 0
+    
+    def test_pipeline_restart(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("CACHE_SNAPSHOT_PATH", str(tmp_path / "cache.snap"))
+        before = MessageProcessor(use_models=False, feedback_mode="template")
+        before.process("You're stupid")
+        assert before.save_cache_snapshot() == 1
+        
+        after = MessageProcessor(use_models=False, feedback_mode="template")
+        assert after.restore_cache_snapshot()["restored"] == 1
+        assert after.process("You're stupid").metadata.cache_hit
+        assert after.get_system_status()["cache_snapshot"]["restored"] == 1
+
+
+class TestKnownGreen:
+    """Known-GREEN fingerprint set in front of the response cache."""
+    
+    def test_membership_is_normalized(self):
+        green = GreenFingerprintSet(capacity=1000)
+        green.add("Hello!")
+        
+        assert "hello!" in green
+        assert "  HELLO!  " in green
+        assert "hello" not in green
+        assert len(green) == 1
+    
+    def test_compact_for_many_entries(self):
+        green = GreenFingerprintSet(capacity=100_000)
+        for i in range(100_000):
+            green.add(f"message {i}")
+        
+        assert all(f"message {i}" in green for i in range(0, 100_000, 997))
+        assert "message -1" not in green
+        # ~9 bytes per entry, i.e. about 9 MB per million
+        assert green.get_stats()["memory_bytes"] < 100_000 * 10
+    
+    def test_persistence_and_version_invalidation(self, tmp_path):
+        path = str(tmp_path / "green.bin")
+        green = GreenFingerprintSet(capacity=1000, version="v1")
+        green.add("gg")
+        green.save(path)
+        
+        same = GreenFingerprintSet(capacity=1000, version="v1")
+        assert same.load(path)
+        assert "gg" in same
+        
+        other = GreenFingerprintSet(capacity=1000, version="v2")
+        assert not other.load(path)
+        assert "gg" not in other
+        
+        same.set_version("v2")
+        assert len(same) == 0
+    
+    def test_pipeline_serves_canned_green(self, monkeypatch):
+        processor = MessageProcessor(use_models=False, feedback_mode="template")
+        monkeypatch.setattr(processor.analyzer, "stage_uses_model", lambda stage: True)
+        first = processor.process("how are you")
+        assert not first.metadata.known_green
+        
+        monkeypatch.setattr(processor, "_run", lambda *args: pytest.fail("pipeline ran"))
+        second = processor.process("How are you")
+        assert second.metadata.known_green
+        assert second.classification == Classification.GREEN
+        assert second.feedback is None
+        assert processor.quick_classify("how are you") == Classification.GREEN
+        assert processor.get_cache_stats()["known_green"]["hits"] >= 2
+    
+    def test_keyword_only_verdicts_not_admitted(self):
+        """Without a confident toxicity model nothing becomes known-GREEN."""
+        processor = MessageProcessor(use_models=False, feedback_mode="template")
+        processor.process("Your idea is bad")
+        # Whitelisted by the rules with 0.95 confidence, but no model confirmed it
+        result = processor.process("how are you")
+        assert result.classification == Classification.GREEN
+        assert result.metadata.fallback_used
+        assert processor.get_cache_stats()["known_green"]["size"] == 0
+
+
+class TestWarmStart:
+    """Cache warm start from classification exports."""
+    
+    @pytest.fixture
+    def export(self, tmp_path):
+        path = tmp_path / "kidClassification.csv"
+        rows = ["text,classification"]
+        rows += ["You're stupid,red"] * 3 + ["Hello!,green"] * 2 + ["Nice drawing,green"]
+        path.write_text("\n".join(rows) + "\n")
+        return str(path)
+    
+    def test_loads_most_frequent_messages(self, export):
+        processor = MessageProcessor(use_models=False, feedback_mode="template")
+        stats = processor.warm_start([export], max_entries=2)
+        
+        assert stats["candidates"] == 3
+        assert stats["loaded"] == 2
+        assert processor.cached_response("You're stupid") is not None
+        assert processor.cached_response("Hello!") is not None
+        assert processor.cached_response("Nice drawing") is None
+        assert processor.get_system_status()["warm_start"] == stats
+    
+    def test_never_calls_llm(self, export):
+        processor = MessageProcessor(use_models=False, feedback_mode="hf_llm", hf_api_key="test")
+        processor.feedback_generator.hf_llm.generate = lambda *a, **k: pytest.fail("LLM called")
+        stats = processor.warm_start([export])
+        
+        assert stats["loaded"] == 3
+        assert stats["analysis_only"] == 1
+        assert processor.cached_response("Hello!") is not None
+        # Needs LLM feedback: only the analysis is warm
+        assert processor.cached_response("You're stupid") is None
+        memo_hits = processor.analyzer.graph.memo.get_stats()["hits"]
+        processor.analyzer.analyze(processor.preprocessor.process("You're stupid")[0])
+        assert processor.analyzer.graph.memo.get_stats()["hits"] == memo_hits + 1
+    
+    def test_skips_cached_messages(self, export, monkeypatch):
+        processor = MessageProcessor(use_models=False, feedback_mode="template")
+        processor.process("You're stupid")
+        monkeypatch.setattr(processor, "_run", lambda *args: pytest.fail("cached message recomputed"))
+        assert processor.warm_start([export], max_entries=1)["loaded"] == 1
+    
+    def test_time_budget(self, export):
+        processor = MessageProcessor(use_models=False, feedback_mode="template")
+        stats = processor.warm_start([export], time_budget_s=0)
+        
+        assert stats["loaded"] == 0
+        assert stats["budget_exhausted"]
+    
+    def test_only_text_is_read(self, tmp_path):
+        """Verdict columns are ignored; messages are re-run on the current models."""
+        path = tmp_path / "export.csv"
+        path.write_text('text,classification,model_versions\nhi there,red,"{bad json"\nbye now,,\n')
+        
+        processor = MessageProcessor(use_models=False, feedback_mode="template")
+        stats = processor.warm_start([str(path)])
+        assert stats["loaded"] == 2
+        assert processor.cached_response("bye now") is not None
+    
+    def test_repository_exports(self):
+        """The bundled web/data exports are found by the default config."""
+        processor = MessageProcessor(use_models=False, feedback_mode="template")
+        stats = processor.warm_start(max_entries=20)
+        assert stats["loaded"] == 20
 
 
 class TestPipelineModes:
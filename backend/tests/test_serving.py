@@ -0,0 +1,779 @@
+"""
+Serving Tests
+
+Tests for:
+- Per-request latency budgets
+- Load-adaptive degradation
+- Priority lanes
+- Pre-fork workers
+- Dedicated inference process
+- Single-flight request coalescing
+- LLM circuit breaker
+"""
+
+import os
+import sys
+import asyncio
+import time
+import signal
+import socket
+import threading
+import tempfile
+import subprocess
+import urllib.request
+import pytest
+from src.pipeline import MessageProcessor
+from src.models import Classification, ToxicityResult, Feedback
+from src.config import MODEL_CONFIG
+from src.analyzer.toxicity import ToxicityAnalyzer
+from src.analyzer.emotion import EmotionAnalyzer
+from src.analyzer.hate_speech import HateSpeechAnalyzer
+from src.serving import (
+    Deadline, StageCostModel, LoadController, DegradationMode, PriorityScheduler, Lane,
+    process_memory, InferenceServer, RemoteInferenceClient, InferenceUnavailable, SingleFlight,
+    CircuitBreaker, BreakerState
+)
+
+
+class TestDeadline:
+    """Test the per-request deadline."""
+
+    def test_unbounded_deadline_never_expires(self):
+        deadline = Deadline()
+        assert not deadline.bounded
+        assert not deadline.expired()
+        assert deadline.allows(10_000_000)
+
+    def test_budget_counts_down(self):
+        deadline = Deadline(budget_ms=50)
+        assert deadline.allows(10)
+        time.sleep(0.06)
+        assert deadline.expired()
+        assert not deadline.allows(1)
+
+    def test_timeout_capped_by_budget(self):
+        deadline = Deadline(budget_ms=500)
+        assert deadline.timeout_s(30) <= 0.5
+        assert Deadline().timeout_s(30) == 30
+
+    def test_degrade_records_once(self):
+        deadline = Deadline(budget_ms=1)
+        deadline.degrade("emotion")
+        deadline.degrade("emotion")
+        assert deadline.degraded == ["emotion"]
+
+    def test_cost_model_tracks_observations(self):
+        costs = StageCostModel({"toxicity": 100}, alpha=0.5)
+        costs.observe("toxicity", 20)
+        assert costs.estimate("toxicity") == 60
+        assert costs.estimate("unknown") == 0
+    
+    def test_cost_estimate_decays_to_default(self):
+        costs = StageCostModel({"feedback_llm": 2000}, half_life_s=0.05)
+        costs.observe("feedback_llm", 50_000)  # e.g. a cold first call
+        assert not Deadline(budget_ms=3000).allows(costs.estimate("feedback_llm"))
+        
+        time.sleep(0.5)
+        assert costs.estimate("feedback_llm") == pytest.approx(2000, rel=0.05)
+        assert Deadline(budget_ms=3000).allows(costs.estimate("feedback_llm"))
+    
+    def test_warm_up_not_counted(self):
+        processor = MessageProcessor(use_models=False, feedback_mode="templates")
+        processor.analyzer.stage_costs.observe("toxicity", 5000)
+        processor.warm_up()
+        assert processor.analyzer.stage_costs.estimate("toxicity") == MODEL_CONFIG["deadlines"]["stage_cost_ms"]["toxicity"]
+
+
+class TestDeadlineDegradation:
+    """Pipeline stages should fall back to cheap paths when out of budget."""
+
+    @pytest.fixture
+    def processor(self):
+        processor = MessageProcessor(use_models=False, feedback_mode="templates")
+
+        # Pretend the toxicity model is loaded but make it fail if called
+        toxicity = processor.analyzer.toxicity_analyzer
+        toxicity.model_loaded = True
+        toxicity._analyze_batch_with_model = lambda texts: pytest.fail("model should be skipped")
+        return processor
+
+    def test_model_stage_skipped_when_over_budget(self, processor):
+        processor.analyzer.stage_costs.observe("toxicity", 10_000)
+        result = processor.process("You're stupid", budget_ms=50)
+
+        assert result.classification == Classification.RED
+        assert "toxicity" in result.metadata.degraded_stages
+        assert result.metadata.fallback_used
+
+    def test_degraded_results_not_cached(self, processor):
+        processor.analyzer.stage_costs.observe("toxicity", 10_000)
+        processor.process("You're stupid", budget_ms=50)
+        assert processor.cache.get_stats()["size"] == 0
+
+    def test_llm_skipped_when_over_budget(self):
+        processor = MessageProcessor(use_models=False, feedback_mode="hf_llm", hf_api_key="test")
+        hf_llm = processor.feedback_generator.hf_llm
+        hf_llm.generate = lambda *args, **kwargs: pytest.fail("LLM should be skipped")
+
+        result = processor.process("You're stupid", budget_ms=80)
+
+        assert result.feedback is not None
+        assert not result.metadata.used_llm
+        assert result.metadata.degraded_stages == ["feedback_llm"]
+
+    def test_no_budget_no_degradation(self):
+        processor = MessageProcessor(use_models=False, feedback_mode="templates")
+        result = processor.process("You're stupid")
+        assert result.metadata.degraded_stages == []
+
+
+class TestLoadController:
+    """Test load-adaptive mode switching."""
+
+    @pytest.fixture
+    def controller(self):
+        return LoadController(
+            max_in_flight=2,
+            max_queue_wait_ms=1000,
+            max_p95_ms=10_000,
+            cooldown_seconds=0.05,
+            min_window_samples=1,
+            eval_interval_seconds=0
+        )
+
+    def test_starts_in_full_mode(self, controller):
+        assert controller.mode == DegradationMode.FULL
+        assert controller.disabled_stages() == frozenset()
+
+    def test_steps_up_one_level_at_a_time(self, controller):
+        with controller.track(), controller.track():
+            assert controller.mode == DegradationMode.SKIP_EMOTION
+            with controller.track():
+                assert controller.mode == DegradationMode.SKIP_HATE_SPEECH
+                assert "hate_speech" in controller.disabled_stages()
+
+    def test_queue_wait_raises_pressure(self, controller):
+        with controller.track(queue_wait_ms=5000):
+            pass
+        assert controller.mode >= DegradationMode.SKIP_EMOTION
+
+    def test_hysteresis_and_recovery(self, controller):
+        with controller.track(), controller.track():
+            pass
+        assert controller.mode == DegradationMode.SKIP_EMOTION
+
+        # Low pressure, but not for long enough
+        controller.evaluate()
+        assert controller.mode == DegradationMode.SKIP_EMOTION
+
+        time.sleep(0.06)
+        controller.evaluate()
+        assert controller.mode == DegradationMode.FULL
+
+    def test_latency_counts_model_stage_only(self, controller):
+        controller.max_p95_ms = 50
+        with controller.track():
+            with controller.measure():
+                pass
+            time.sleep(0.1)  # e.g. the LLM feedback call
+        assert controller.mode == DegradationMode.FULL
+
+        with controller.track(), controller.measure():
+            time.sleep(0.1)
+        assert controller.mode == DegradationMode.SKIP_EMOTION
+
+    def test_slow_window_steps_up_once(self):
+        controller = LoadController(
+            max_p95_ms=50, min_window_samples=5, cooldown_seconds=60, eval_interval_seconds=0
+        )
+        for _ in range(5):
+            with controller.track(), controller.measure():
+                time.sleep(0.08)
+        assert controller.mode == DegradationMode.SKIP_EMOTION
+
+        # Re-evaluating the same slow window doesn't escalate further
+        for _ in range(10):
+            controller.evaluate()
+        assert controller.mode == DegradationMode.SKIP_EMOTION
+
+        # A fresh window that is still slow does
+        for _ in range(5):
+            with controller.track(), controller.measure():
+                time.sleep(0.08)
+        assert controller.mode == DegradationMode.SKIP_HATE_SPEECH
+
+    def test_disabled_controller_stays_full(self):
+        controller = LoadController(enabled=False, max_in_flight=1, eval_interval_seconds=0)
+        with controller.track(), controller.track():
+            assert controller.mode == DegradationMode.FULL
+
+    def test_status(self, controller):
+        status = controller.get_status()
+        assert status["mode"] == "full"
+        assert status["in_flight"] == 0
+
+
+class TestLoadDegradedPipeline:
+    """The processor should follow the controller's mode."""
+
+    def test_template_only_mode_skips_llm(self):
+        processor = MessageProcessor(use_models=False, feedback_mode="hf_llm", hf_api_key="test")
+        processor.feedback_generator.hf_llm.generate = lambda *a, **k: pytest.fail("LLM should be skipped")
+        processor.load_controller._mode = DegradationMode.TEMPLATE_ONLY
+        processor.load_controller.enabled = False  # Pin the mode
+
+        result = processor.process("You're stupid")
+
+        assert result.feedback is not None
+        assert "feedback_llm" in result.metadata.degraded_stages
+
+    def test_slow_llm_at_low_concurrency_stays_full(self):
+        processor = MessageProcessor(use_models=False, feedback_mode="hf_llm", hf_api_key="test")
+        controller = processor.load_controller
+        controller.min_window_samples = 3
+        controller.eval_interval = 0
+        controller.max_p95_ms = 50
+
+        processor.feedback_generator.llm_feedback_cache = None
+        feedback = Feedback(
+            main_message="Try saying it more kindly.",
+            suggested_alternatives=["I don't agree with you"]
+        )
+
+        def slow_llm(*args, **kwargs):
+            time.sleep(0.1)  # Twice the latency limit
+            return feedback
+        processor.feedback_generator.hf_llm.generate = slow_llm
+
+        for i in range(8):
+            result = processor.process("You're stupid", skip_cache=True)
+            assert result.metadata.used_llm
+        assert controller.mode == DegradationMode.FULL
+        assert controller.get_status()["transitions"] == 0
+
+    def test_mode_in_system_status(self):
+        processor = MessageProcessor(use_models=False)
+        assert processor.get_system_status()["load"]["mode"] == "full"
+
+
+class TestPriorityScheduler:
+    """Test priority lanes in front of the model stage."""
+
+    @pytest.fixture
+    def scheduler(self):
+        return PriorityScheduler(capacity=2, reserved_critical=1)
+
+    def _hold(self, scheduler, lane, release, entered=None, order=None):
+        def run():
+            with scheduler.slot(lane):
+                if order is not None:
+                    order.append(lane)
+                if entered is not None:
+                    entered.set()
+                release.wait(5)
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def _wait_for_queue(self, scheduler, lane, depth):
+        for _ in range(500):
+            if scheduler.get_stats()["lanes"][lane]["queue_depth"] >= depth:
+                return
+            time.sleep(0.002)
+        pytest.fail(f"{lane} queue never reached {depth}")
+
+    def test_reserved_slot_for_critical(self, scheduler):
+        release = threading.Event()
+        entered = threading.Event()
+        holder = self._hold(scheduler, Lane.INTERACTIVE, release, entered)
+        entered.wait(5)
+
+        # Shared capacity is used up, but critical work still gets in
+        critical_entered = threading.Event()
+        critical = self._hold(scheduler, Lane.CRITICAL, threading.Event(), critical_entered)
+        assert critical_entered.wait(1)
+
+        release.set()
+        holder.join()
+        critical.join(timeout=0)
+
+    def test_higher_lane_admitted_first(self, scheduler):
+        release_first = threading.Event()
+        release_rest = threading.Event()
+        entered = threading.Event()
+        order = []
+
+        first = self._hold(scheduler, Lane.INTERACTIVE, release_first, entered)
+        entered.wait(5)
+        batch = self._hold(scheduler, Lane.BATCH, release_rest, order=order)
+        self._wait_for_queue(scheduler, "batch", 1)
+        interactive = self._hold(scheduler, Lane.INTERACTIVE, release_rest, order=order)
+        self._wait_for_queue(scheduler, "interactive", 1)
+
+        release_first.set()
+        first.join()
+        for _ in range(500):
+            if order:
+                break
+            time.sleep(0.002)
+        release_rest.set()
+        batch.join()
+        interactive.join()
+
+        assert order == [Lane.INTERACTIVE, Lane.BATCH]
+
+    def test_should_shed_when_saturated(self, scheduler):
+        assert not scheduler.should_shed(Lane.INTERACTIVE)
+        with scheduler.slot(Lane.INTERACTIVE):
+            assert scheduler.should_shed(Lane.INTERACTIVE)
+            assert not scheduler.should_shed(Lane.CRITICAL)
+
+    def test_lane_stats(self, scheduler):
+        with scheduler.slot(Lane.BATCH):
+            pass
+        lanes = scheduler.get_stats()["lanes"]
+        assert lanes["batch"]["admitted"] == 1
+        assert lanes["batch"]["queue_depth"] == 0
+        assert set(lanes) == {"critical", "interactive", "batch"}
+
+    def test_wait_bounded_by_deadline(self, scheduler):
+        release = threading.Event()
+        entered = threading.Event()
+        holder = self._hold(scheduler, Lane.INTERACTIVE, release, entered)
+        entered.wait(5)
+
+        start = time.perf_counter()
+        with scheduler.slot(Lane.INTERACTIVE, Deadline(budget_ms=50)) as admitted:
+            assert not admitted
+        assert time.perf_counter() - start < 1
+
+        stats = scheduler.get_stats()["lanes"]["interactive"]
+        assert (stats["timed_out"], stats["queue_depth"]) == (1, 0)
+
+        release.set()
+        holder.join()
+        with scheduler.slot(Lane.INTERACTIVE, Deadline(budget_ms=50)) as admitted:
+            assert admitted
+
+    def test_reserved_must_leave_shared_capacity(self):
+        with pytest.raises(ValueError):
+            PriorityScheduler(capacity=1, reserved_critical=1)
+
+
+class TestPriorityPipeline:
+    """The processor should route messages into lanes."""
+
+    @pytest.fixture
+    def processor(self):
+        processor = MessageProcessor(use_models=False, feedback_mode="templates")
+        processor.scheduler.enabled = True
+        return processor
+
+    def test_self_harm_goes_to_critical_lane(self, processor):
+        processor.process("I want to kill myself")
+        lanes = processor.get_system_status()["scheduler"]["lanes"]
+        assert lanes["critical"]["admitted"] == 1
+
+    def test_batch_uses_batch_lane(self, processor):
+        processor.batch_process(["Hello!", "Nice shot"])
+        lanes = processor.get_system_status()["scheduler"]["lanes"]
+        assert lanes["batch"]["admitted"] == 2
+
+    def test_slot_timeout_falls_back_to_rules(self, processor):
+        processor.analyzer.stage_uses_model = lambda stage: True  # Model path is never reached
+        processor.scheduler.max_wait_ms = 20
+        release = threading.Event()
+
+        def hold():
+            with processor.scheduler.slot(Lane.INTERACTIVE):
+                release.wait(5)
+        holders = [threading.Thread(target=hold) for _ in range(3)]
+        for thread in holders:
+            thread.start()
+        for _ in range(500):
+            if processor.scheduler.get_stats()["active"] == 3:
+                break
+            time.sleep(0.002)
+
+        result = processor.process("You're stupid", skip_cache=True)
+        release.set()
+        for thread in holders:
+            thread.join()
+
+        assert result.classification != Classification.GREEN
+        assert result.metadata.fallback_used
+        assert "toxicity" in result.metadata.degraded_stages
+        assert processor.scheduler.get_stats()["lanes"]["interactive"]["timed_out"] == 1
+
+    def test_yellow_llm_feedback_shed_under_load(self):
+        processor = MessageProcessor(use_models=False, feedback_mode="hf_llm", hf_api_key="test")
+        processor.feedback_generator.hf_llm.generate = lambda *a, **k: pytest.fail("LLM should be shed")
+        processor.scheduler.enabled = True
+        processor.scheduler.should_shed = lambda lane: lane != Lane.CRITICAL
+
+        result = processor.process("This is boring")
+
+        assert result.classification == Classification.YELLOW
+        assert "feedback_llm" in result.metadata.degraded_stages
+        assert processor.scheduler.get_stats()["lanes"]["interactive"]["shed"] == 1
+
+
+PREFORK_APP = """
+import os, sys
+sys.path.insert(0, {root!r})
+from src.serving import PreforkServer
+
+async def app(scope, receive, send):
+    if scope["type"] != "http":
+        return
+    await send({{"type": "http.response.start", "status": 200, "headers": []}})
+    await send({{"type": "http.response.body", "body": str(os.getppid()).encode()}})
+
+PreforkServer(app, lambda: None, host="127.0.0.1", port={port}, workers=2,
+              report_interval=0, min_uptime=0, log_level="warning").run()
+"""
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "fork") or not os.path.exists(f"/proc/{os.getpid()}/task"),
+    reason="needs os.fork and Linux /proc"
+)
+class TestPrefork:
+    """Master forks workers, restarts crashed ones and reloads on SIGHUP."""
+    
+    @pytest.fixture
+    def master(self):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        proc = subprocess.Popen([sys.executable, "-c", PREFORK_APP.format(root=root, port=port)])
+        proc.port = port
+        
+        self._wait_for(lambda: len(self._workers(proc)) == 2)
+        yield proc
+        
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=15)
+    
+    @staticmethod
+    def _workers(proc):
+        try:
+            with open(f"/proc/{proc.pid}/task/{proc.pid}/children") as f:
+                return sorted(int(pid) for pid in f.read().split())
+        except OSError:
+            return []
+    
+    @staticmethod
+    def _wait_for(condition, timeout=15):
+        end = time.monotonic() + timeout
+        while time.monotonic() < end:
+            try:
+                if condition():
+                    return
+            except OSError:
+                pass
+            time.sleep(0.1)
+        raise AssertionError("condition not met in time")
+    
+    def _get(self, proc):
+        return urllib.request.urlopen(f"http://127.0.0.1:{proc.port}/", timeout=5).read().decode()
+    
+    def test_workers_serve_from_shared_socket(self, master):
+        self._wait_for(lambda: self._get(master) == str(master.pid))
+    
+    def test_crashed_worker_restarted(self, master):
+        victim = self._workers(master)[0]
+        os.kill(victim, signal.SIGKILL)
+        self._wait_for(lambda: victim not in self._workers(master) and len(self._workers(master)) == 2)
+        assert self._get(master) == str(master.pid)
+    
+    def test_reload_replaces_workers(self, master):
+        old = set(self._workers(master))
+        master.send_signal(signal.SIGHUP)
+        self._wait_for(lambda: len(self._workers(master)) == 2 and not old & set(self._workers(master)))
+        assert self._get(master) == str(master.pid)
+    
+    def test_process_memory(self):
+        usage = process_memory()
+        assert usage["rss_mb"] > 0
+        assert usage["rss_mb"] >= usage["shared_mb"]
+
+
+class _RecordingToxicity(ToxicityAnalyzer):
+    """Rule-based toxicity that records batch sizes and labels its results."""
+    
+    def __init__(self, delay=0.0):
+        super().__init__(use_model=False)
+        self.delay = delay
+        self.batch_sizes = []
+    
+    def analyze_batch(self, texts, use_model=True):
+        self.batch_sizes.append(len(texts))
+        time.sleep(self.delay)
+        return [r.model_copy(update={"label": "remote"}) for r in super().analyze_batch(texts)]
+
+
+class TestInferenceServer:
+    """Models served from one process to many clients, batched."""
+    
+    @pytest.fixture
+    def socket_path(self):
+        path = os.path.join(tempfile.mkdtemp(), "inference.sock")
+        yield path
+        if os.path.exists(path):
+            os.unlink(path)
+    
+    def _serve(self, socket_path, toxicity, max_wait_ms=5):
+        server = InferenceServer(
+            socket_path,
+            analyzers={
+                "toxicity": toxicity,
+                "emotion": EmotionAnalyzer(use_model=False),
+                "hate_speech": HateSpeechAnalyzer(use_model=False),
+            },
+            max_wait_ms=max_wait_ms
+        )
+        server.start()
+        return server
+    
+    def test_round_trip(self, socket_path):
+        server = self._serve(socket_path, _RecordingToxicity())
+        client = RemoteInferenceClient(socket_path)
+        try:
+            result = client.infer("toxicity", "You're stupid")
+            assert isinstance(result, ToxicityResult)
+            assert result.label == "remote"
+            assert result.score == ToxicityAnalyzer(use_model=False).analyze("You're stupid").score
+            assert client.infer("emotion", "I'm so happy").primary_emotion.value == "joy"
+            assert client.infer("hate_speech", "Hello")["hate_speech_detected"] is False
+        finally:
+            server.stop()
+    
+    def test_requests_from_many_clients_batched(self, socket_path):
+        toxicity = _RecordingToxicity(delay=0.02)
+        server = self._serve(socket_path, toxicity, max_wait_ms=20)
+        clients = [RemoteInferenceClient(socket_path, timeout_ms=2000) for _ in range(4)]
+        try:
+            threads = [
+                threading.Thread(target=clients[i % 4].infer, args=("toxicity", f"message {i}"))
+                for i in range(16)
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            
+            assert sum(toxicity.batch_sizes) == 16
+            assert max(toxicity.batch_sizes) > 1
+            assert server.get_stats()["avg_batch_size"] > 1
+        finally:
+            server.stop()
+    
+    def test_timeout_raises(self, socket_path):
+        server = self._serve(socket_path, _RecordingToxicity(delay=0.3))
+        client = RemoteInferenceClient(socket_path)
+        try:
+            with pytest.raises(InferenceUnavailable):
+                client.infer("toxicity", "hello", timeout=0.05)
+        finally:
+            server.stop()
+    
+    def test_server_down_fails_fast(self, socket_path):
+        client = RemoteInferenceClient(socket_path, retry_interval=60)
+        with pytest.raises(InferenceUnavailable):
+            client.infer("toxicity", "hello")
+        start = time.perf_counter()
+        with pytest.raises(InferenceUnavailable):
+            client.infer("toxicity", "hello")
+        assert time.perf_counter() - start < 0.01
+    
+    def test_pipeline_uses_remote_models(self, socket_path):
+        server = self._serve(socket_path, _RecordingToxicity())
+        try:
+            processor = MessageProcessor(
+                use_models=True, feedback_mode="template", inference_socket=socket_path
+            )
+            result = processor.process("You're stupid")
+            assert result.analysis.toxicity.label == "remote"
+            assert not result.metadata.fallback_used
+        finally:
+            server.stop()
+    
+    def test_pipeline_falls_back_to_rules(self, socket_path):
+        processor = MessageProcessor(
+            use_models=True, feedback_mode="template", inference_socket=socket_path
+        )
+        result = processor.process("You're stupid")
+        
+        assert result.classification == Classification.RED
+        assert "toxicity" in result.metadata.degraded_stages
+        assert result.metadata.fallback_used
+
+
+class TestSingleFlight:
+    """Concurrent calls with the same key run once."""
+    
+    def _slow(self, calls, release, value="result"):
+        def fn():
+            calls.append(1)
+            release.wait(5)
+            return value
+        return fn
+    
+    def test_threads_share_one_call(self):
+        flight = SingleFlight()
+        calls, release = [], threading.Event()
+        outcomes = []
+        
+        threads = [
+            threading.Thread(target=lambda: outcomes.append(flight.do("k", self._slow(calls, release))))
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        while flight.get_stats()["coalesced"] < 7:
+            time.sleep(0.01)
+        release.set()
+        for t in threads:
+            t.join()
+        
+        assert len(calls) == 1
+        assert sorted(shared for _, shared in outcomes) == [False] + [True] * 7
+        assert all(result == "result" for result, _ in outcomes)
+        assert flight.get_stats() == {"in_flight": 0, "leaders": 1, "coalesced": 7, "timed_out": 0}
+    
+    def test_async_and_sync_callers_coalesce(self):
+        flight = SingleFlight()
+        calls, release = [], threading.Event()
+        
+        async def main():
+            tasks = [asyncio.create_task(flight.do_async("k", self._slow(calls, release))) for _ in range(5)]
+            sync = asyncio.get_running_loop().run_in_executor(None, flight.do, "k", self._slow(calls, release))
+            while flight.get_stats()["coalesced"] < 5:
+                await asyncio.sleep(0.01)
+            release.set()
+            return await asyncio.gather(*tasks, sync)
+        
+        outcomes = asyncio.run(main())
+        assert len(calls) == 1
+        assert [result for result, _ in outcomes] == ["result"] * 6
+    
+    def test_errors_reach_every_caller(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        errors = []
+        
+        def boom():
+            release.wait(5)
+            raise ValueError("boom")
+        
+        def call():
+            try:
+                flight.do("k", boom)
+            except ValueError as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for t in threads:
+            t.start()
+        while flight.get_stats()["coalesced"] < 2:
+            time.sleep(0.01)
+        release.set()
+        for t in threads:
+            t.join()
+        
+        assert len(errors) == 3
+        assert flight.get_stats()["in_flight"] == 0
+    
+    def test_waiter_computes_itself_after_timeout(self):
+        flight = SingleFlight()
+        calls, release = [], threading.Event()
+        leader = threading.Thread(target=flight.do, args=("k", self._slow(calls, release, "leader")))
+        leader.start()
+        while flight.get_stats()["in_flight"] < 1:
+            time.sleep(0.01)
+        
+        start = time.perf_counter()
+        assert flight.do("k", lambda: "own", timeout=0.05) == ("own", False)
+        assert time.perf_counter() - start < 1
+        
+        async def waiter():
+            return await flight.do_async("k", lambda: "own async", timeout=0.05)
+        assert asyncio.run(waiter()) == ("own async", False)
+        assert flight.get_stats()["timed_out"] == 2
+        
+        release.set()
+        leader.join()
+        assert len(calls) == 1
+    
+    def test_cancelled_leader_does_not_cancel_followers(self):
+        flight = SingleFlight()
+        calls, release = [], threading.Event()
+        
+        async def main():
+            leader = asyncio.create_task(flight.do_async("k", self._slow(calls, release)))
+            while flight.get_stats()["in_flight"] < 1:
+                await asyncio.sleep(0.01)
+            follower = asyncio.get_running_loop().run_in_executor(None, flight.do, "k", lambda: "own")
+            while flight.get_stats()["coalesced"] < 1:
+                await asyncio.sleep(0.01)
+            
+            leader.cancel()  # e.g. the client disconnected
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            release.set()
+            return await follower
+        
+        assert asyncio.run(main()) == ("result", True)
+        assert len(calls) == 1
+        assert flight.get_stats()["in_flight"] == 0
+    
+    def test_key_released_after_completion(self):
+        flight = SingleFlight()
+        assert flight.do("k", lambda: 1) == (1, False)
+        assert flight.do("k", lambda: 2) == (2, False)
+
+
+
+class TestCircuitBreaker:
+    """Test opening on failures, half-open probing and closing."""
+    
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker("llm", failure_threshold=3, open_seconds=60)
+        for success in (False, False, True, False, False):
+            assert breaker.allow()
+            breaker.record(success)
+        assert breaker.state == BreakerState.CLOSED  # The success reset the run
+        
+        breaker.allow()
+        breaker.record(False)
+        assert breaker.state == BreakerState.OPEN
+        assert not breaker.allow()
+        assert breaker.get_stats()["rejected"] == 1
+    
+    def test_slow_calls_count_as_failures(self):
+        breaker = CircuitBreaker("llm", failure_threshold=2, latency_threshold_ms=100)
+        for _ in range(2):
+            breaker.allow()
+            breaker.record(True, latency_ms=500)
+        assert breaker.state == BreakerState.OPEN
+        assert breaker.get_stats()["slow_calls"] == 2
+    
+    def test_half_open_probe(self):
+        breaker = CircuitBreaker("llm", failure_threshold=1, open_seconds=0.05, half_open_probes=1)
+        breaker.allow()
+        breaker.record(False)
+        time.sleep(0.06)
+        
+        assert breaker.state == BreakerState.HALF_OPEN
+        assert breaker.allow()
+        assert not breaker.allow()  # Only one probe at a time
+        breaker.record(False)
+        assert breaker.state == BreakerState.OPEN
+        
+        time.sleep(0.06)
+        assert breaker.allow()
+        breaker.record(True)
+        assert breaker.state == BreakerState.CLOSED
+        assert breaker.get_stats()["times_opened"] == 2